@@ -0,0 +1,288 @@
+import argparse
+import io
+import time
+
+import numpy as np
+import pandas as pd
+
+from db import get_db_connection
+
+# COPY BINARY çıktısında her satır sabit genişlikte olsun diye tüm kolonlar 8 baytlık tiplere çevrilir
+BAR_COLUMNS = ['open', 'high', 'low', 'close', 'upvolume', 'downvolume']
+
+_FIELDS = [('field_count', '>i2')]
+for _name in ['time'] + BAR_COLUMNS:
+    _FIELDS += [(f'{_name}_len', '>i4'), (_name, '>i8' if _name == 'time' else '>f8')]
+ROW_DTYPE = np.dtype(_FIELDS)
+
+PGCOPY_SIGNATURE = b'PGCOPY\n\xff\r\n\x00'
+# PostgreSQL zaman damgaları 2000-01-01'den itibaren mikrosaniye olarak gelir
+PG_EPOCH_US = 946684800 * 1_000_000
+
+CHUNK_ROWS = 250_000
+
+
+def _bars_query(cursor, symbol, interval, start=None, end=None, binary=True):
+    """Verilen sembol ve interval için COPY sorgusunu hazırlar."""
+    # Önce float8'e çevrilir; aksi halde 'NaN' sabiti kolonun tipini (ör. INTEGER) alır
+    columns = ", ".join(f"COALESCE({column}::float8, 'NaN')" for column in BAR_COLUMNS)
+    conditions = ["symbol = %s", "interval = %s"]
+    params = [symbol, interval]
+    if start is not None:
+        conditions.append("time >= %s")
+        params.append(start)
+    if end is not None:
+        conditions.append("time < %s")
+        params.append(end)
+    select = cursor.mogrify(
+        f"SELECT time, {columns} FROM mt5_db WHERE {' AND '.join(conditions)} ORDER BY time ASC",
+        params
+    ).decode()
+    return f"COPY ({select}) TO STDOUT WITH (FORMAT {'binary' if binary else 'csv'})"
+
+
+class BinaryCopySink:
+    """
+    COPY BINARY akışını parça parça NumPy dizilerine çevirir.
+    copy_expert bu nesnenin write metodunu çağırır; her CHUNK_ROWS satırda bir
+    on_chunk(dict) çağrılır, böylece bellek kullanımı sabit kalır.
+    """
+
+    def __init__(self, on_chunk, chunk_rows=CHUNK_ROWS):
+        self.on_chunk = on_chunk
+        self.chunk_rows = chunk_rows
+        self.rows = 0
+        self._buffer = bytearray()
+        self._header_done = False
+
+    def write(self, data):
+        self._buffer += data
+        if not self._header_done:
+            if len(self._buffer) < 19:
+                return len(data)
+            if bytes(self._buffer[:11]) != PGCOPY_SIGNATURE:
+                raise ValueError("Beklenmeyen COPY BINARY başlığı")
+            extension_len = int.from_bytes(self._buffer[15:19], 'big')
+            if len(self._buffer) < 19 + extension_len:
+                return len(data)
+            del self._buffer[:19 + extension_len]
+            self._header_done = True
+        while len(self._buffer) >= self.chunk_rows * ROW_DTYPE.itemsize:
+            self._emit(self.chunk_rows)
+        return len(data)
+
+    def _emit(self, max_rows=None):
+        rows = len(self._buffer) // ROW_DTYPE.itemsize
+        if max_rows is not None:
+            rows = min(rows, max_rows)
+        if rows == 0:
+            return
+        size = rows * ROW_DTYPE.itemsize
+        records = np.frombuffer(bytes(self._buffer[:size]), dtype=ROW_DTYPE)
+        del self._buffer[:size]
+        self.rows += rows
+        chunk = {'time': ((records['time'] + PG_EPOCH_US) * 1000).astype('datetime64[ns]')}
+        for column in BAR_COLUMNS:
+            chunk[column] = records[column].astype(np.float64)
+        self.on_chunk(chunk)
+
+    def close(self):
+        """Akış bittiğinde kalan satırları işler (2 baytlık -1 sonlandırıcı atlanır)."""
+        if len(self._buffer) % ROW_DTYPE.itemsize == 2 and self._buffer[-2:] == b'\xff\xff':
+            del self._buffer[-2:]
+        self._emit()
+        if self._buffer:
+            raise ValueError("COPY BINARY akışında eksik satır kaldı")
+
+
+def stream_bars(symbol, interval, on_chunk, start=None, end=None, conn=None, chunk_rows=CHUNK_ROWS):
+    """Barları COPY BINARY ile okuyup her parça için on_chunk çağırır, satır sayısını döndürür."""
+    own_conn = conn is None
+    conn = conn or get_db_connection()
+    try:
+        cursor = conn.cursor()
+        sink = BinaryCopySink(on_chunk, chunk_rows)
+        cursor.copy_expert(_bars_query(cursor, symbol, interval, start, end), sink)
+        sink.close()
+        cursor.close()
+        return sink.rows
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def _chunk_to_frame(chunk, symbol, interval):
+    df = pd.DataFrame(chunk)
+    df['symbol'] = symbol
+    df['interval'] = interval
+    return df
+
+
+def read_bars(symbol, interval, start=None, end=None, binary=True, conn=None):
+    """
+    mt5_db'den barları load_from_postgresql ile aynı biçimde, ama satır satır Python
+    nesnesi oluşturmadan okur. binary=False ise COPY CSV kullanılır.
+    """
+    own_conn = conn is None
+    conn = conn or get_db_connection()
+    try:
+        if binary:
+            chunks = []
+            stream_bars(symbol, interval, chunks.append, start, end, conn=conn)
+            columns = {'time': np.array([], dtype='datetime64[ns]')}
+            columns.update({column: np.array([], dtype=np.float64) for column in BAR_COLUMNS})
+            for name in columns:
+                columns[name] = np.concatenate([columns[name]] + [chunk[name] for chunk in chunks])
+            df = _chunk_to_frame(columns, symbol, interval)
+        else:
+            cursor = conn.cursor()
+            buffer = io.StringIO()
+            cursor.copy_expert(_bars_query(cursor, symbol, interval, start, end, binary=False), buffer)
+            cursor.close()
+            buffer.seek(0)
+            df = pd.read_csv(buffer, names=['time'] + BAR_COLUMNS, parse_dates=['time'],
+                             dtype={column: np.float64 for column in BAR_COLUMNS})
+            df['symbol'] = symbol
+            df['interval'] = interval
+    finally:
+        if own_conn:
+            conn.close()
+    df.set_index('time', inplace=True)
+    return df
+
+
+def read_bars_arrow(symbol, interval, start=None, end=None):
+    """Barları pyarrow.Table olarak döndürür."""
+    import pyarrow as pa
+
+    return pa.Table.from_pandas(read_bars(symbol, interval, start, end))
+
+
+def export_bars(symbols, intervals, path, fmt="parquet", start=None, end=None, chunk_rows=CHUNK_ROWS):
+    """
+    Seçilen (sembol, interval, tarih aralığı) verisini parça parça Parquet ya da CSV
+    dosyasına yazar. Bellekte aynı anda en fazla bir parça tutulur.
+    """
+    conn = get_db_connection()
+    writer = None
+    total = 0
+
+    def write_chunk(chunk, symbol, interval):
+        nonlocal writer
+        df = _chunk_to_frame(chunk, symbol, interval)
+        if fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+        else:
+            df.to_csv(path, mode="w" if writer is None else "a", header=writer is None, index=False)
+            writer = writer or True
+
+    try:
+        for symbol in symbols:
+            for interval in intervals:
+                total += stream_bars(
+                    symbol, interval,
+                    lambda chunk: write_chunk(chunk, symbol, interval),
+                    start, end, conn=conn, chunk_rows=chunk_rows
+                )
+    finally:
+        conn.close()
+        if fmt == "parquet" and writer is not None:
+            writer.close()
+    return total
+
+
+def _read_bars_sql(symbol, interval):
+    """Karşılaştırma için mevcut pd.read_sql_query yolu (load_from_postgresql ile aynı)."""
+    conn = get_db_connection()
+    query = """
+        SELECT time, open, high, low, close, upvolume, downvolume, symbol, interval
+        FROM mt5_db
+        WHERE symbol = %s AND interval = %s
+        ORDER BY time ASC;
+    """
+    df = pd.read_sql_query(query, conn, params=(symbol, interval))
+    conn.close()
+    df.set_index('time', inplace=True)
+    return df
+
+
+READERS = ("read_sql_query", "copy_csv", "copy_binary")
+
+
+def benchmark(row_counts=(1_000_000, 10_000_000), symbol="BENCH", interval="1 minute", readers=READERS):
+    """
+    Sentetik barlar yükleyip read_sql_query, COPY CSV ve COPY BINARY okumalarını karşılaştırır.
+    read_sql_query her satır için Python nesneleri oluşturduğundan 10M satırda birkaç GB
+    bellek ister; readers ile yalnızca istenen okuyucular çalıştırılabilir.
+    """
+    results = []
+    for rows in row_counts:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM mt5_db WHERE symbol = %s", (symbol,))
+        close = 2000 + np.cumsum(np.random.normal(0, 0.5, rows))
+        synthetic = pd.DataFrame({
+            'time': pd.date_range("2000-01-01", periods=rows, freq="1min"),
+            'open': close, 'high': close + 0.3, 'low': close - 0.3, 'close': close,
+            'upvolume': np.random.randint(1, 500, rows), 'downvolume': np.zeros(rows),
+            'symbol': symbol, 'interval': interval
+        })
+        buffer = io.StringIO()
+        synthetic.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        cursor.copy_expert(
+            "COPY mt5_db (time, open, high, low, close, upvolume, downvolume, symbol, interval) FROM STDIN WITH CSV",
+            buffer
+        )
+        conn.commit()
+        del synthetic, buffer
+
+        for name, reader in [
+            ("read_sql_query", lambda: _read_bars_sql(symbol, interval)),
+            ("copy_csv", lambda: read_bars(symbol, interval, binary=False)),
+            ("copy_binary", lambda: read_bars(symbol, interval)),
+        ]:
+            if name not in readers:
+                continue
+            started = time.perf_counter()
+            df = reader()
+            elapsed = time.perf_counter() - started
+            results.append({'rows': rows, 'reader': name, 'seconds': elapsed,
+                            'rows_per_sec': len(df) / elapsed})
+            del df
+
+        cursor.execute("DELETE FROM mt5_db WHERE symbol = %s", (symbol,))
+        conn.commit()
+        cursor.close()
+        conn.close()
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="mt5_db toplu okuma/dışa aktarma araçları")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Barları Parquet/CSV dosyasına aktar")
+    export_parser.add_argument("--symbols", nargs="+", required=True)
+    export_parser.add_argument("--intervals", nargs="+", required=True)
+    export_parser.add_argument("--start")
+    export_parser.add_argument("--end")
+    export_parser.add_argument("--format", choices=["parquet", "csv"], default="parquet")
+    export_parser.add_argument("--out", required=True)
+
+    bench_parser = commands.add_parser("bench", help="Okuma yollarını karşılaştır")
+    bench_parser.add_argument("--rows", nargs="+", type=int, default=[1_000_000, 10_000_000])
+    bench_parser.add_argument("--readers", nargs="+", choices=READERS, default=list(READERS))
+
+    args = parser.parse_args()
+    if args.command == "export":
+        count = export_bars(args.symbols, args.intervals, args.out, args.format, args.start, args.end)
+        print(f"{count} satır {args.out} dosyasına yazıldı")
+    else:
+        print(benchmark(args.rows, readers=args.readers).to_string(index=False))
@@ -0,0 +1,210 @@
+# Süreç genelinde istek birleştirme (single-flight).
+# Streamlit her oturum için betiği yeniden çalıştırır ama içe aktarılan modüller süreç
+# boyunca tek kopyadır; bu yüzden buradaki nesneler aynı sembole bakan tüm oturumlar
+# arasında paylaşılır.
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+
+
+class SingleFlight:
+    """Aynı anahtarla eşzamanlı gelen çağrılardan yalnızca birini çalıştırır, sonucu paylaştırır."""
+
+    def __init__(self, name):
+        self.name = name
+        self.counters = {'issued': 0, 'coalesced': 0}
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+    def begin(self, key):
+        """
+        (future, leader) döndürür. leader True ise işi çağıran yapar ve finish ile
+        sonucu bildirir; değilse future'ın sonucunu bekler.
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.counters['coalesced'] += 1
+                return future, False
+            future = Future()
+            self._in_flight[key] = future
+            self.counters['issued'] += 1
+            return future, True
+
+    def finish(self, key, future, result=None, error=None):
+        with self._lock:
+            self._in_flight.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, fn, *args, **kwargs):
+        """fn(*args, **kwargs) sonucunu döndürür; aynı anahtar zaten çalışıyorsa onu bekler."""
+        future, leader = self.begin(key)
+        if not leader:
+            return future.result()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self.finish(key, future, error=e)
+            raise
+        self.finish(key, future, result)
+        return result
+
+
+class WriteGenerations:
+    """
+    (symbol, interval) başına yerel yazma sayacı. Okuma anahtarlarına eklenir; böylece bir
+    yazma bittikten sonra başlayan okuma, yazmadan önce başlamış bir okumanın sonucunu
+    paylaşmaz ve az önce yazılan barları görür (read-your-writes).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def get(self, symbol, interval):
+        with self._lock:
+            return self._values.get((symbol, interval), 0)
+
+    def bump(self, symbol, interval):
+        with self._lock:
+            self._values[(symbol, interval)] = self._values.get((symbol, interval), 0) + 1
+
+
+# Broker sunucu saati UTC'den en fazla bu kadar ileride ya da geride olabilir
+SERVER_TIME_MARGIN = 14 * 3600
+
+
+def _epoch(value):
+    """datetime değerini MT5 bar zamanlarıyla aynı birimde (UTC saniye) döndürür."""
+    return int(pd.Timestamp(value).timestamp())
+
+
+def _timeframe_seconds(timeframe):
+    """
+    MT5 TIMEFRAME_* sabitinin bar süresi (saniye). Sabitler dakika, 0x4000 | saat,
+    0x8000 | hafta ve 0xC000 | ay olarak kodlanır.
+    """
+    unit, count = timeframe & 0xC000, timeframe & 0x3FFF
+    return count * {0: 60, 0x4000: 3600, 0x8000: 7 * 86400, 0xC000: 31 * 86400}[unit]
+
+
+class RangeCoalescer:
+    """
+    copy_rates_range çağrılarını (symbol, timeframe) bazında birleştirir.
+
+    İstenen [start, end] aralığı, devam eden ve önbellekteki isteklerin birleşimiyle
+    karşılanır; yalnızca hiçbirinin kapsamadığı boşluklar için yeni çağrı yapılır.
+    Tamamlanan aralıklar ttl saniye boyunca önbellekte tutulur. Henüz kapanmamış olabilecek
+    son bar (sunucu saati bilinmediğinden SERVER_TIME_MARGIN payıyla) önbelleğe alınmaz.
+    """
+
+    def __init__(self, name, ttl=60):
+        self.name = name
+        self.ttl = ttl
+        self.counters = {'requests': 0, 'issued': 0, 'coalesced': 0, 'cache_hits': 0}
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def _prune(self, entries, now):
+        entries[:] = [
+            entry for entry in entries
+            if not entry['future'].done() or now - entry['finished'] < self.ttl
+        ]
+
+    def get(self, fetch, symbol, timeframe, start, end):
+        """fetch(symbol, timeframe, start, end) ile aynı sonucu (bar dizisi ya da None) döndürür."""
+        start_ts, end_ts = _epoch(start), _epoch(end)
+        own = []
+        with self._lock:
+            self.counters['requests'] += 1
+            entries = self._entries.setdefault((symbol, timeframe), [])
+            self._prune(entries, time.monotonic())
+
+            used = sorted(
+                (entry for entry in entries if entry['start'] <= end_ts and entry['end'] >= start_ts),
+                key=lambda entry: entry['start']
+            )
+            # Mevcut girdilerin kapsamadığı boşlukları bul
+            gaps = []
+            cursor = start_ts
+            for entry in used:
+                if entry['start'] > cursor:
+                    gaps.append((cursor, entry['start']))
+                cursor = max(cursor, entry['end'])
+            if cursor < end_ts or not used:
+                gaps.append((cursor, end_ts))
+
+            for gap_start, gap_end in gaps:
+                entry = {'start': gap_start, 'end': gap_end, 'future': Future(), 'finished': 0.0}
+                entries.append(entry)
+                own.append(entry)
+
+            self.counters['issued'] += len(own)
+            if used and not own:
+                if any(not entry['future'].done() for entry in used):
+                    self.counters['coalesced'] += 1
+                else:
+                    self.counters['cache_hits'] += 1
+            elif used:
+                self.counters['coalesced'] += 1
+
+        for index, entry in enumerate(own):
+            try:
+                rates = fetch(symbol, timeframe,
+                              pd.Timestamp(entry['start'], unit='s').to_pydatetime(),
+                              pd.Timestamp(entry['end'], unit='s').to_pydatetime())
+            except Exception as e:
+                # Bekleyen diğer oturumlar takılı kalmasın diye kalan girdileri de hatayla kapat
+                with self._lock:
+                    for failed in own[index:]:
+                        self._entries[(symbol, timeframe)].remove(failed)
+                for failed in own[index:]:
+                    failed['future'].set_exception(e)
+                raise
+            entry['finished'] = time.monotonic()
+            open_from = int(time.time()) - SERVER_TIME_MARGIN - _timeframe_seconds(timeframe)
+            with self._lock:
+                if rates is None or entry['start'] >= open_from:
+                    # Hatalı sonuçlar ve açık bar içeren aralıklar önbelleğe alınmaz
+                    self._entries[(symbol, timeframe)].remove(entry)
+                elif entry['end'] > open_from:
+                    entry['end'] = open_from
+            entry['future'].set_result(rates)
+
+        parts = [entry['future'].result() for entry in used + own]
+        if any(part is None for part in parts):
+            return None
+        non_empty = [part for part in parts if len(part)]
+        if not non_empty:
+            return parts[0]
+
+        rates = np.concatenate(non_empty)
+        _, first = np.unique(rates['time'], return_index=True)
+        rates = rates[first]
+        return rates[(rates['time'] >= start_ts) & (rates['time'] <= end_ts)]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Süreç genelindeki paylaşılan birleştiriciler
+mt5_rates = RangeCoalescer("mt5_rates")
+db_writes = SingleFlight("db_writes")
+db_loads = SingleFlight("db_loads")
+# db_loads anahtarlarına eklenen bar yazma sayaçları
+bar_writes = WriteGenerations()
+
+
+def coalescing_stats():
+    """Tüm birleştiricilerin sayaçlarını tablo olarak döndürür."""
+    return pd.DataFrame([
+        {'layer': layer.name, **layer.counters}
+        for layer in (mt5_rates, db_writes, db_loads)
+    ]).fillna(0)
@@ -0,0 +1,270 @@
+import argparse
+import time
+from functools import lru_cache
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from bulk_io import read_bars
+from db import get_db_connection
+from session_calendar import align_symbols, get_session_index
+
+# Bir parça (çift grubu) için ayrılan yaklaşık bellek; çift başına ~10 adet T uzunluğunda dizi tutulur
+MAX_CHUNK_BYTES = 16 * 1024 * 1024
+ARRAYS_PER_PAIR = 10
+
+# Engle-Granger (2 değişkenli) ADF kritik değerleri, MacKinnon (2010)
+COINT_CRITICAL = {"1%": -3.90, "5%": -3.34, "10%": -3.04}
+
+# Grafik için saklanan kayan seriler en fazla bu kadar noktaya seyreltilir
+MAX_SERIES_POINTS = 2000
+
+
+def load_log_prices(symbols, interval, start=None, end=None):
+    """
+    Sembollerin kapanış fiyatlarını mt5_db'den okuyup tüm sembollerin seansta olduğu
+    ortak takvime hizalar ve logaritmasını döndürür. Piyasa kapanışları takvimde yer
+    almadığından fiyat kapanışlar boyunca taşınmaz; yalnızca seans içindeki eksik barlarda
+    son fiyat kullanılır.
+    """
+    frames = {symbol: read_bars(symbol, interval, start, end) for symbol in symbols}
+    times = [df.index for df in frames.values() if len(df)]
+    if not times:
+        return pd.DataFrame(columns=list(symbols), dtype=np.float64)
+    range_start = start if start is not None else min(index[0] for index in times)
+    range_end = end if end is not None else max(index[-1] for index in times) + pd.Timedelta(1, 'ns')
+    calendar = None
+    for symbol in symbols:
+        session = get_session_index(symbol, interval, range_start, range_end)
+        calendar = session if calendar is None else calendar.intersection(session)
+    aligned = align_symbols(frames, calendar)
+    return np.log(aligned.ffill().dropna())
+
+
+def _check_window(n_rows, window):
+    """Kayan pencere için yeterli getiri olup olmadığını denetler."""
+    if window < 2 or n_rows < window:
+        raise ValueError(f"{window} barlık pencere için en az {window + 1} ortak bar gerekir, {n_rows + 1} bar var")
+
+
+def _rolling_sum(values, window, inplace=False):
+    """
+    Kümülatif toplam farkıyla O(T) kayan toplam (zaman ekseni son eksen); ilk window-1
+    değer NaN olur. inplace=True ise values geçici dizi olarak kullanılır.
+    """
+    cumulative = np.cumsum(values, axis=-1, out=values if inplace else None)
+    result = np.empty_like(cumulative)
+    result[..., :window - 1] = np.nan
+    result[..., window - 1] = cumulative[..., window - 1]
+    np.subtract(cumulative[..., window:], cumulative[..., :-window], out=result[..., window:])
+    return result
+
+
+def _rolling_mean_var(values, window):
+    """Her satır (sembol) için kayan ortalama ve varyans."""
+    mean = _rolling_sum(values, window)
+    mean /= window
+    var = _rolling_sum(values * values, window, inplace=True)
+    var /= window
+    var -= mean * mean
+    return mean, var
+
+
+def _pair_chunks(n_symbols, n_rows, max_bytes=MAX_CHUNK_BYTES):
+    """Tüm sembol çiftlerini bellek sınırına sığacak gruplara böler."""
+    pairs = np.array(list(combinations(range(n_symbols), 2)), dtype=np.intp).reshape(-1, 2)
+    chunk = max(1, int(max_bytes // (n_rows * 8 * ARRAYS_PER_PAIR)))
+    for offset in range(0, len(pairs), chunk):
+        yield pairs[offset:offset + chunk]
+
+
+def rolling_pair_stats(log_prices, window, max_bytes=MAX_CHUNK_BYTES):
+    """
+    Her sembol çifti için kayan korelasyon, beta, hedge oranı ve z-skorlu spread hesaplar.
+
+    Tek sembole ait kayan ortalama/varyanslar bir kez hesaplanır; çift başına yalnızca
+    çapraz çarpımın kayan toplamı gerekir. Çiftler bellek sınırına göre gruplanır ve her
+    grup için (pairs, stats) döndürülür; stats içindeki diziler len(pairs) x T-1
+    boyutundadır (getirilerle hizalı). Korelasyon ve beta log getiriler üzerinden, hedge
+    oranı ve spread log fiyatlar üzerinden hesaplanır.
+    """
+    # Satırlar sembol, kolonlar zaman; çift satırları bellekte bitişik okunur.
+    # Sayısal kararlılık için seriler ortalamadan arındırılır.
+    prices = log_prices.to_numpy(dtype=np.float64).T
+    prices = np.ascontiguousarray(prices - prices.mean(axis=1, keepdims=True))
+    returns = np.diff(prices, axis=1)
+    prices = np.ascontiguousarray(prices[:, 1:])
+    n_rows = returns.shape[1]
+    _check_window(n_rows, window)
+
+    return_mean, return_var = _rolling_mean_var(returns, window)
+    price_mean, price_var = _rolling_mean_var(prices, window)
+    return_std = np.sqrt(return_var)
+
+    for pairs in _pair_chunks(len(prices), n_rows, max_bytes):
+        a, b = pairs[:, 0], pairs[:, 1]
+
+        cov = _rolling_sum(returns[a] * returns[b], window, inplace=True)
+        cov /= window
+        cov -= return_mean[a] * return_mean[b]
+        correlation = cov / (return_std[a] * return_std[b])
+        beta = np.divide(cov, return_var[a], out=cov)
+
+        hedge_ratio = _rolling_sum(prices[a] * prices[b], window, inplace=True)
+        hedge_ratio /= window
+        hedge_ratio -= price_mean[a] * price_mean[b]
+        hedge_ratio /= price_var[a]
+        spread = prices[b] - hedge_ratio * prices[a]
+
+        # Spread ilk window-1 değerde NaN olduğundan kayan toplamdan önce sıfırlanır
+        np.nan_to_num(spread, copy=False, nan=0.0)
+        spread_mean, spread_var = _rolling_mean_var(spread, window)
+        zscore = np.subtract(spread, spread_mean, out=spread)
+        zscore /= np.sqrt(np.maximum(spread_var, 0, out=spread_var), out=spread_var)
+        zscore[:, :min(2 * window - 2, n_rows)] = np.nan
+
+        yield pairs, {
+            'correlation': correlation,
+            'beta': beta,
+            'hedge_ratio': hedge_ratio,
+            'zscore': zscore,
+        }
+
+
+def cointegration(log_prices, max_bytes=MAX_CHUNK_BYTES):
+    """
+    Tüm çiftler için Engle-Granger testi: b'nin a'ya OLS regresyonunun kalıntılarına
+    gecikmesiz ADF uygulanır. (pairs, t_istatistiği, yarı_ömür) döndürür.
+    """
+    prices = log_prices.to_numpy(dtype=np.float64).T
+    prices = np.ascontiguousarray(prices - prices.mean(axis=1, keepdims=True))
+    n_rows = prices.shape[1]
+    sum_squares = np.einsum('ij,ij->i', prices, prices)
+    results = []
+    for pairs in _pair_chunks(len(prices), n_rows, max_bytes):
+        x, y = prices[pairs[:, 0]], prices[pairs[:, 1]]
+        slope = np.einsum('ij,ij->i', x, y) / sum_squares[pairs[:, 0]]
+        residual = y - slope[:, None] * x
+        lagged = residual[:, :-1]
+        change = np.diff(residual, axis=1)
+        lagged_squares = np.einsum('ij,ij->i', lagged, lagged)
+        gamma = np.einsum('ij,ij->i', lagged, change) / lagged_squares
+        error = change - gamma[:, None] * lagged
+        sigma2 = np.einsum('ij,ij->i', error, error) / (n_rows - 2)
+        t_stat = gamma / np.sqrt(sigma2 / lagged_squares)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            half_life = np.where(gamma < 0, -np.log(2) / np.log1p(gamma), np.inf)
+        results.append((pairs, t_stat, half_life))
+    if not results:
+        return np.empty((0, 2), dtype=np.intp), np.empty(0), np.empty(0)
+    return tuple(np.concatenate(parts) for parts in zip(*results))
+
+
+def analyze_prices(log_prices, window, max_series_pairs=10, max_bytes=MAX_CHUNK_BYTES):
+    """
+    Hizalanmış log fiyatlardan çift özet tablosu, korelasyon matrisleri ve ilk
+    max_series_pairs çift için grafiğe uygun (seyreltilmiş) kayan serileri üretir.
+    Pencereyi dolduracak kadar bar yoksa ValueError yükseltir.
+    """
+    _check_window(len(log_prices) - 1, window)
+    symbols = list(log_prices.columns)
+    index = log_prices.index[1:]
+    returns = np.diff(log_prices.to_numpy(dtype=np.float64), axis=0)
+    step = max(1, len(index) // MAX_SERIES_POINTS)
+
+    summary = []
+    series = {}
+    for pairs, stats in rolling_pair_stats(log_prices, window, max_bytes):
+        for column, (a, b) in enumerate(pairs):
+            summary.append({
+                'symbol_a': symbols[a],
+                'symbol_b': symbols[b],
+                'rolling_corr': stats['correlation'][column, -1],
+                'beta': stats['beta'][column, -1],
+                'hedge_ratio': stats['hedge_ratio'][column, -1],
+                'zscore': stats['zscore'][column, -1],
+            })
+            if len(series) < max_series_pairs:
+                series[f"{symbols[a]}/{symbols[b]}"] = pd.DataFrame(
+                    {name: values[column, ::step] for name, values in stats.items()},
+                    index=index[::step]
+                )
+
+    summary = pd.DataFrame(summary)
+    pairs, t_stat, half_life = cointegration(log_prices, max_bytes)
+    if len(summary):
+        summary['coint_t'] = t_stat
+        summary['cointegrated'] = t_stat < COINT_CRITICAL["5%"]
+        summary['half_life_bars'] = half_life
+
+    return {
+        'summary': summary,
+        'correlation': pd.DataFrame(np.corrcoef(returns.T), index=symbols, columns=symbols),
+        'rolling_correlation': pd.DataFrame(np.corrcoef(returns[-window:].T), index=symbols, columns=symbols),
+        'series': series,
+    }
+
+
+def data_version(symbols, interval, start=None, end=None):
+    """
+    Aralıktaki barların sembol başına (son bar zamanı, bar sayısı) özeti. Sona eklenen
+    barlar kadar aralığın içine geriye dönük eklenen barlar da özeti değiştirir.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT symbol, max(time), count(*) FROM mt5_db
+        WHERE symbol = ANY(%s) AND interval = %s
+          AND time >= COALESCE(%s, '-infinity'::timestamp)
+          AND time < COALESCE(%s, 'infinity'::timestamp)
+        GROUP BY symbol
+        ORDER BY symbol;
+    """, (list(symbols), interval, start, end))
+    version = tuple(cursor.fetchall())
+    cursor.close()
+    conn.close()
+    return version
+
+
+def analyze(symbols, interval, start=None, end=None, window=100):
+    """
+    mt5_db'deki barlardan çapraz sembol analizini yapar; symbols bir tuple olmalıdır.
+    Sonuçlar (semboller, interval, aralık, pencere) ve aralıktaki verinin data_version
+    özetiyle önbellekte tutulur; yeni bar gelince eski sonuç kullanılmaz.
+    """
+    return _analyze(symbols, interval, start, end, window, data_version(symbols, interval, start, end))
+
+
+@lru_cache(maxsize=32)
+def _analyze(symbols, interval, start, end, window, version):
+    return analyze_prices(load_log_prices(symbols, interval, start, end), window)
+
+
+def synthetic_log_prices(n_symbols=50, n_rows=75_000, seed=0):
+    """Ölçüm için ortak faktörlü sentetik log fiyat serileri üretir."""
+    rng = np.random.default_rng(seed)
+    factor = rng.normal(0, 1e-4, n_rows)
+    loadings = rng.uniform(0.2, 1.2, n_symbols)
+    noise = rng.normal(0, 1e-4, (n_rows, n_symbols))
+    prices = 7.5 + np.cumsum(factor[:, None] * loadings + noise, axis=0)
+    return pd.DataFrame(
+        prices,
+        index=pd.date_range("2024-01-01", periods=n_rows, freq="5min"),
+        columns=[f"SYM{i:02d}" for i in range(n_symbols)]
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Çapraz sembol korelasyon motoru ölçümü")
+    parser.add_argument("--symbols", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=75_000, help="1 yıl M5 ~ 75.000 bar")
+    parser.add_argument("--window", type=int, default=288)
+    args = parser.parse_args()
+
+    log_prices = synthetic_log_prices(args.symbols, args.rows)
+    started = time.perf_counter()
+    result = analyze_prices(log_prices, args.window)
+    elapsed = time.perf_counter() - started
+    print(f"{args.symbols} sembol, {len(result['summary'])} çift, {args.rows} bar: {elapsed:.2f}s")
+    print(result['summary'].head().to_string(index=False))
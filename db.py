@@ -0,0 +1,65 @@
+from lazy_imports import lazy_import
+
+# İlk bağlantıya kadar yüklenmez
+psycopg2 = lazy_import("psycopg2")
+
+# PostgreSQL bağlantı bilgileri
+DB_CONFIG = {
+    "dbname": "mt5_db",
+    "user": "postgres",
+    "password": "123",
+    "host": "localhost",
+    "port": "5432",
+}
+
+def get_db_connection():
+    """PostgreSQL veritabanına bağlantı sağlar."""
+    return psycopg2.connect(**DB_CONFIG)
+
+def get_db_dsn():
+    """Asenkron sürücüler (asyncpg) için bağlantı adresini döndürür."""
+    return "postgresql://{user}:{password}@{host}:{port}/{dbname}".format(**DB_CONFIG)
+
+# Tablo başına (symbol, interval) değişiklik sayacı. Satır ekleyen, değiştiren ya da silen her
+# ifade tetikleyiciyle sayacı artırır; okuma servisi ETag'i sayım yapmadan bu değerden türetir.
+CREATE_DATA_VERSIONS = """
+    CREATE TABLE IF NOT EXISTS mt5_data_versions (
+        table_name TEXT NOT NULL,
+        symbol VARCHAR(10) NOT NULL,
+        interval VARCHAR(20) NOT NULL,
+        version BIGINT NOT NULL DEFAULT 1,
+        updated_at TIMESTAMP NOT NULL DEFAULT now(),
+        PRIMARY KEY (table_name, symbol, interval)
+    );
+
+    CREATE OR REPLACE FUNCTION mt5_bump_data_version() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO mt5_data_versions (table_name, symbol, interval)
+        SELECT DISTINCT TG_TABLE_NAME, symbol, interval FROM changed_rows
+        ORDER BY 2, 3
+        ON CONFLICT (table_name, symbol, interval)
+        DO UPDATE SET version = mt5_data_versions.version + 1, updated_at = now();
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+VERSION_TRIGGERS = {
+    "insert": "AFTER INSERT ON {table} REFERENCING NEW TABLE AS changed_rows",
+    "update": "AFTER UPDATE ON {table} REFERENCING NEW TABLE AS changed_rows",
+    "delete": "AFTER DELETE ON {table} REFERENCING OLD TABLE AS changed_rows",
+}
+
+def ensure_data_versions(conn, table):
+    """table'a yazan her ifadenin mt5_data_versions sayacını artırmasını sağlar (tablo var olmalı)."""
+    cursor = conn.cursor()
+    # Tetikleyici DDL'i eşzamanlı çalıştırılırsa katalogda çakışabilir
+    cursor.execute("SELECT pg_advisory_xact_lock(hashtext('mt5_data_versions:ddl'));")
+    cursor.execute(CREATE_DATA_VERSIONS)
+    for event, clause in VERSION_TRIGGERS.items():
+        cursor.execute(f"""
+            CREATE OR REPLACE TRIGGER {table}_version_{event} {clause.format(table=table)}
+            FOR EACH STATEMENT EXECUTE FUNCTION mt5_bump_data_version();
+        """)
+    conn.commit()
+    cursor.close()
@@ -0,0 +1,392 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from db import get_db_connection
+from indicator_store import update_indicators
+from mt5_session import TIMEFRAMES, load_backend
+from pipeline import rates_to_dataframe, dataframe_to_records
+from session_calendar import find_gaps, get_session_index
+
+CHUNK_SIZES = {"day": timedelta(days=1), "week": timedelta(weeks=1)}
+
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 30
+# Bu süreden uzun "running" kalan iş, çöken bir worker'dan kaldığı varsayılıp yeniden alınır
+LEASE_SECONDS = 600
+# Çalışan worker işin süresini bu aralıkla uzatır
+HEARTBEAT_SECONDS = LEASE_SECONDS / 3
+
+logger = logging.getLogger(__name__)
+
+CREATE_JOB_TABLES = """
+    CREATE TABLE IF NOT EXISTS mt5_fetch_jobs (
+        id SERIAL PRIMARY KEY,
+        symbol VARCHAR(10) NOT NULL,
+        interval VARCHAR(20) NOT NULL,
+        chunk_start TIMESTAMP NOT NULL,
+        chunk_end TIMESTAMP NOT NULL,
+        status VARCHAR(10) NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at TIMESTAMP NOT NULL DEFAULT now(),
+        worker VARCHAR(64),
+        rows INTEGER,
+        last_error TEXT,
+        updated_at TIMESTAMP NOT NULL DEFAULT now(),
+        UNIQUE (symbol, interval, chunk_start)
+    );
+
+    CREATE INDEX IF NOT EXISTS mt5_fetch_jobs_claim_idx
+        ON mt5_fetch_jobs (status, next_attempt_at);
+
+    CREATE OR REPLACE VIEW mt5_fetch_progress AS
+        SELECT symbol, interval,
+               count(*) AS total,
+               count(*) FILTER (WHERE status = 'done') AS done,
+               count(*) FILTER (WHERE status = 'running') AS running,
+               count(*) FILTER (WHERE status = 'pending') AS pending,
+               count(*) FILTER (WHERE status = 'failed') AS failed,
+               COALESCE(sum(rows), 0) AS rows,
+               min(chunk_start) AS range_start,
+               max(chunk_end) AS range_end
+        FROM mt5_fetch_jobs
+        GROUP BY symbol, interval;
+"""
+
+
+def ensure_job_tables(conn):
+    """İş kuyruğu tablosunu ve ilerleme görünümünü oluşturur."""
+    cursor = conn.cursor()
+    # Aynı anda başlayan worker'ların DDL'i katalogda çakışmasın diye sırayla çalıştırılır
+    cursor.execute("SELECT pg_advisory_xact_lock(hashtext('mt5_fetch_jobs:ddl'));")
+    cursor.execute(CREATE_JOB_TABLES)
+    conn.commit()
+    cursor.close()
+
+
+def split_range(start, end, chunk="day"):
+    """[start, end) aralığını gün ya da hafta boyutunda parçalara böler."""
+    step = CHUNK_SIZES[chunk]
+    chunks = []
+    chunk_start = start
+    while chunk_start < end:
+        chunk_end = min(chunk_start + step, end)
+        chunks.append((chunk_start, chunk_end))
+        chunk_start = chunk_end
+    return chunks
+
+
+def chunks_with_gaps(chunks, gaps):
+    """find_gaps çıktısındaki boşluklardan en az biriyle kesişen parçaları döndürür."""
+    if not gaps:
+        return []
+    firsts = pd.DatetimeIndex([first for first, _, _ in gaps])
+    lasts = pd.DatetimeIndex([last for _, last, _ in gaps])
+    selected = []
+    for chunk_start, chunk_end in chunks:
+        # Sonu parça başından sonra olan ilk boşluk parçanın içinde başlıyorsa kesişir
+        position = lasts.searchsorted(pd.Timestamp(chunk_start))
+        if position < len(gaps) and firsts[position] < pd.Timestamp(chunk_end):
+            selected.append((chunk_start, chunk_end))
+    return selected
+
+
+def plan_chunks(cursor, symbol, interval, start, end, chunk="day"):
+    """
+    Aralığın yalnızca mt5_db'de eksik bar bulunan parçalarını döndürür. Seans takvimine göre
+    bar beklenmeyen (hafta sonu, tatil) ve zaten tamamen dolu olan parçalar atlanır.
+    """
+    cursor.execute("""
+        SELECT time FROM mt5_db
+        WHERE symbol = %s AND interval = %s AND time >= %s AND time < %s
+        ORDER BY time ASC;
+    """, (symbol, interval, start, end))
+    stored = pd.DatetimeIndex([row[0] for row in cursor.fetchall()])
+    gaps = find_gaps(stored, get_session_index(symbol, interval, start, end))
+    return chunks_with_gaps(split_range(start, end, chunk), gaps)
+
+
+def enqueue_backfill(symbols, interval, start, end, chunk="day"):
+    """
+    Her sembol için aralığı parçalara bölüp eksik bar içeren parçaları kuyruğa ekler.
+    Daha önce eklenmiş parçalar (bitmiş olanlar dahil) tekrar eklenmez; eklenen iş sayısını döndürür.
+    """
+    conn = get_db_connection()
+    ensure_job_tables(conn)
+    cursor = conn.cursor()
+    rows = [
+        (symbol, interval, chunk_start, chunk_end)
+        for symbol in symbols
+        for chunk_start, chunk_end in plan_chunks(cursor, symbol, interval, start, end, chunk)
+    ]
+    added = 0
+    if rows:
+        from psycopg2.extras import execute_values
+
+        execute_values(cursor, """
+            INSERT INTO mt5_fetch_jobs (symbol, interval, chunk_start, chunk_end)
+            VALUES %s
+            ON CONFLICT (symbol, interval, chunk_start) DO NOTHING
+        """, rows, page_size=len(rows))
+        added = cursor.rowcount
+    conn.commit()
+    cursor.close()
+    conn.close()
+    return added
+
+
+def claim_job(conn, worker_id):
+    """
+    Sıradaki uygun işi FOR UPDATE SKIP LOCKED ile alır; yoksa None döndürür.
+    Süresi dolan işler deneme hakkı kaldıysa yeniden alınır, kalmadıysa 'failed' yapılır.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE mt5_fetch_jobs
+        SET status = 'failed', last_error = 'lease expired', updated_at = now()
+        WHERE status = 'running' AND attempts >= %s
+          AND updated_at < now() - %s * interval '1 second';
+    """, (MAX_ATTEMPTS, LEASE_SECONDS))
+    cursor.execute("""
+        UPDATE mt5_fetch_jobs
+        SET status = 'running', worker = %s, attempts = attempts + 1, updated_at = now()
+        WHERE id = (
+            SELECT id FROM mt5_fetch_jobs
+            WHERE (status = 'pending' AND next_attempt_at <= now())
+               OR (status = 'running' AND attempts < %s
+                   AND updated_at < now() - %s * interval '1 second')
+            ORDER BY chunk_start
+            FOR UPDATE SKIP LOCKED
+            LIMIT 1
+        )
+        RETURNING id, symbol, interval, chunk_start, chunk_end, attempts, worker;
+    """, (worker_id, MAX_ATTEMPTS, LEASE_SECONDS))
+    row = cursor.fetchone()
+    conn.commit()
+    cursor.close()
+    if row is None:
+        return None
+    return dict(zip(['id', 'symbol', 'interval', 'chunk_start', 'chunk_end', 'attempts', 'worker'], row))
+
+
+def complete_job(conn, job, df):
+    """
+    Parçanın barlarını ve işin durumunu aynı transaction'da kaydeder (checkpoint).
+    Bitişi henüz gelmemiş parça 'done' yapılmaz; gelen barlar yazılır ve iş bitiş zamanında
+    yeniden denenmek üzere bekletilir. İş başka bir worker'a geçtiyse (süresi dolduysa)
+    hiçbir şey yazılmaz ve None döner. Aksi halde yeni eklenen barların zamanlarını
+    (sıralı liste) döndürür.
+    """
+    from psycopg2.extras import execute_values
+
+    remaining = (job['chunk_end'] - datetime.now(timezone.utc).replace(tzinfo=None)).total_seconds()
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE mt5_fetch_jobs
+        SET status = %s, rows = %s, last_error = NULL, updated_at = now(),
+            attempts = CASE WHEN %s THEN 0 ELSE attempts END,
+            next_attempt_at = now() + %s * interval '1 second'
+        WHERE id = %s AND status = 'running' AND worker = %s;
+    """, ('pending' if remaining > 0 else 'done', 0 if df is None else len(df),
+          remaining > 0, max(remaining, 0), job['id'], job['worker']))
+    if cursor.rowcount == 0:
+        conn.rollback()
+        cursor.close()
+        return None
+    inserted = []
+    if df is not None and not df.empty:
+        inserted = execute_values(cursor, """
+            INSERT INTO mt5_db (time, open, high, low, close, upvolume, downvolume, symbol, interval)
+            VALUES %s
+            ON CONFLICT (time, symbol, interval) DO NOTHING
+            RETURNING time
+        """, dataframe_to_records(df), page_size=5000, fetch=True)
+    conn.commit()
+    cursor.close()
+    return sorted(row[0] for row in inserted)
+
+
+class LeaseHeartbeat:
+    """
+    İş sürerken updated_at'i HEARTBEAT_SECONDS aralıkla yeniler; MT5 çağrısı LEASE_SECONDS'tan
+    uzun sürse de iş başka bir worker'a geçip ikinci kez çekilmez. Ana döngünün bağlantısı
+    meşgul olabileceğinden kendi bağlantısını kullanır.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self.interval = HEARTBEAT_SECONDS
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            while not self._stop.wait(self.interval):
+                cursor.execute("""
+                    UPDATE mt5_fetch_jobs SET updated_at = now()
+                    WHERE id = %s AND status = 'running' AND worker = %s;
+                """, (self.job['id'], self.job['worker']))
+                conn.commit()
+        finally:
+            conn.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def fail_job(conn, job, error):
+    """
+    İşi üstel bekleme ile yeniden denemeye bırakır; deneme hakkı bittiyse 'failed' yapar.
+    İş başka bir worker'a geçtiyse dokunulmaz.
+    """
+    conn.rollback()
+    cursor = conn.cursor()
+    status = 'failed' if job['attempts'] >= MAX_ATTEMPTS else 'pending'
+    delay = BACKOFF_SECONDS * 2 ** (job['attempts'] - 1)
+    cursor.execute("""
+        UPDATE mt5_fetch_jobs
+        SET status = %s, last_error = %s, updated_at = now(),
+            next_attempt_at = now() + %s * interval '1 second'
+        WHERE id = %s AND status = 'running' AND worker = %s;
+    """, (status, str(error), delay, job['id'], job['worker']))
+    conn.commit()
+    cursor.close()
+
+
+def refresh_indicators(conn, job, inserted):
+    """
+    Parça geçmişe ait olabilir; indikatörler yalnızca eklenen barların etkilediği aralıkta
+    yenilenir. Barlar zaten kaydedildiğinden hata worker'ı durdurmaz; işin last_error
+    alanına yazılır, aralık update_indicators ile yeniden çalıştırılabilir.
+    """
+    try:
+        update_indicators(job['symbol'], job['interval'], since=inserted[0], until=inserted[-1])
+    except Exception as e:
+        logger.exception("%s %s için indikatörler güncellenemedi (%s - %s)",
+                         job['symbol'], job['interval'], inserted[0], inserted[-1])
+        conn.rollback()
+        cursor = conn.cursor()
+        cursor.execute("UPDATE mt5_fetch_jobs SET last_error = %s WHERE id = %s;",
+                       (f"indicators: {e}", job['id']))
+        conn.commit()
+        cursor.close()
+
+
+def fetch_chunk(mt5, job):
+    """İşin kapsadığı aralığı MT5'ten çeker."""
+    timeframe = getattr(mt5, TIMEFRAMES[job['interval']])
+    # copy_rates_range bitiş zamanını da dahil eder; bir sonraki parçanın ilk barını alma
+    utc_to = job['chunk_end'] - timedelta(seconds=1)
+    rates = mt5.copy_rates_range(job['symbol'], timeframe, job['chunk_start'], utc_to)
+    if rates is None:
+        raise RuntimeError(f"copy_rates_range başarısız: {mt5.last_error()}")
+    if len(rates) == 0:
+        return None
+    return rates_to_dataframe(rates, job['symbol'], job['interval'])
+
+
+def run_worker(worker_id=None, mt5=None, stop_when_empty=True, poll_seconds=5):
+    """
+    Kuyruktan iş alıp tamamlayan worker döngüsü. Her worker kendi MT5 oturumunu açar;
+    test ve yük denemeleri için mt5 yerine aynı arayüze sahip sahte bir modül (ör. mt5_sim)
+    verilebilir; verilmezse MT5_BACKEND ortam değişkenine göre arka uç seçilir.
+    İşlenen iş sayısını döndürür.
+    """
+    if mt5 is None:
+        mt5 = load_backend()
+
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    if not mt5.initialize():
+        raise RuntimeError(f"MetaTrader 5 initialization failed: {mt5.last_error()}")
+
+    conn = get_db_connection()
+    ensure_job_tables(conn)
+    processed = 0
+    try:
+        while True:
+            job = claim_job(conn, worker_id)
+            if job is None:
+                if stop_when_empty:
+                    break
+                time.sleep(poll_seconds)
+                continue
+            try:
+                with LeaseHeartbeat(job):
+                    df = fetch_chunk(mt5, job)
+                    inserted = complete_job(conn, job, df)
+            except Exception as e:
+                fail_job(conn, job, e)
+            else:
+                if inserted:
+                    refresh_indicators(conn, job, inserted)
+            processed += 1
+    finally:
+        conn.close()
+        mt5.shutdown()
+    return processed
+
+
+def load_progress():
+    """mt5_fetch_progress görünümünü DataFrame olarak döndürür."""
+    conn = get_db_connection()
+    ensure_job_tables(conn)
+    df = pd.read_sql_query("SELECT * FROM mt5_fetch_progress ORDER BY symbol, interval;", conn)
+    conn.close()
+    return df
+
+
+def run_workers(count, stop_when_empty=True):
+    """Her biri kendi MT5 oturumuna sahip count adet worker süreci başlatır."""
+    processes = [
+        multiprocessing.Process(target=run_worker, kwargs={'stop_when_empty': stop_when_empty})
+        for _ in range(count)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MT5 veri çekme iş kuyruğu")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue_parser = commands.add_parser("enqueue", help="Geriye dönük veri çekme işlerini kuyruğa ekle")
+    enqueue_parser.add_argument("--symbols", nargs="+", required=True)
+    enqueue_parser.add_argument("--interval", choices=list(TIMEFRAMES), required=True)
+    enqueue_parser.add_argument("--start", required=True, help="YYYY-MM-DD")
+    enqueue_parser.add_argument("--end", required=True, help="YYYY-MM-DD")
+    enqueue_parser.add_argument("--chunk", choices=list(CHUNK_SIZES), default="day")
+
+    work_parser = commands.add_parser("work", help="Kuyruğu boşaltan worker'ları çalıştır")
+    work_parser.add_argument("--workers", type=int, default=1)
+    work_parser.add_argument("--forever", action="store_true", help="Kuyruk boşalınca beklemeye devam et")
+
+    commands.add_parser("progress", help="İlerleme durumunu göster")
+
+    args = parser.parse_args()
+    if args.command == "enqueue":
+        added = enqueue_backfill(
+            args.symbols, args.interval,
+            datetime.strptime(args.start, '%Y-%m-%d'), datetime.strptime(args.end, '%Y-%m-%d'),
+            args.chunk
+        )
+        print(f"{added} iş kuyruğa eklendi")
+    elif args.command == "work":
+        run_workers(args.workers, stop_when_empty=not args.forever)
+    else:
+        print(load_progress().to_string(index=False))
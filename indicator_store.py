@@ -0,0 +1,199 @@
+import pandas as pd
+
+from bulk_io import read_bars
+from db import ensure_data_versions, get_db_connection
+from indicators import INDICATOR_COLUMNS, LOOKBACK, EMA_STATE_COLUMNS, SETTLE_BARS, compute_indicators
+
+# DataFrame kolon adları ile mt5_indicators kolon adları
+DB_COLUMNS = {column: column.lower() for column in INDICATOR_COLUMNS}
+
+CREATE_INDICATOR_TABLE = """
+    CREATE TABLE IF NOT EXISTS mt5_indicators (
+        time TIMESTAMP NOT NULL,
+        symbol VARCHAR(10) NOT NULL,
+        interval VARCHAR(20) NOT NULL,
+        {columns},
+        PRIMARY KEY (time, symbol, interval)
+    );
+""".format(columns=",\n        ".join(f"{column} FLOAT" for column in DB_COLUMNS.values()))
+
+
+def ensure_indicator_table(conn):
+    """mt5_indicators tablosu yoksa değişiklik sayacı tetikleyicileriyle birlikte oluşturur."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT to_regclass('mt5_indicators') IS NULL;")
+    if cursor.fetchone()[0]:
+        # Eşzamanlı CREATE TABLE IF NOT EXISTS çağrıları katalogda çakışabilir; sırayla çalıştırılır
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext('mt5_indicators:ddl'));")
+        cursor.execute(CREATE_INDICATOR_TABLE)
+        ensure_data_versions(conn, "mt5_indicators")
+    conn.commit()
+    cursor.close()
+
+
+def _last_indicator_row(cursor, symbol, interval, before=None):
+    """Saklanan son indikatör satırını (zaman ve EMA durumları) döndürür; before verilirse ondan öncekini."""
+    columns = ", ".join(DB_COLUMNS[column] for column in EMA_STATE_COLUMNS)
+    cursor.execute(f"""
+        SELECT time, {columns} FROM mt5_indicators
+        WHERE symbol = %s AND interval = %s AND time < COALESCE(%s, 'infinity'::timestamp)
+        ORDER BY time DESC LIMIT 1;
+    """, (symbol, interval, before))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return dict(zip(['time'] + EMA_STATE_COLUMNS, row))
+
+
+def _window_start(cursor, symbol, interval, last_time):
+    """Son indikatör zamanından LOOKBACK bar önceki barın zamanını bulur."""
+    cursor.execute("""
+        SELECT min(time) FROM (
+            SELECT time FROM mt5_db
+            WHERE symbol = %s AND interval = %s AND time <= %s
+            ORDER BY time DESC LIMIT %s
+        ) AS window_bars;
+    """, (symbol, interval, last_time, LOOKBACK))
+    return cursor.fetchone()[0]
+
+
+def _last_bar_time(cursor, symbol, interval):
+    """mt5_db'deki son barın zamanı."""
+    cursor.execute("""
+        SELECT max(time) FROM mt5_db WHERE symbol = %s AND interval = %s;
+    """, (symbol, interval))
+    return cursor.fetchone()[0]
+
+
+def _settled_time(cursor, symbol, interval, until):
+    """until'den SETTLE_BARS bar sonraki barın zamanı; geçmiş o kadar uzun değilse None."""
+    cursor.execute("""
+        SELECT time FROM mt5_db
+        WHERE symbol = %s AND interval = %s AND time > %s
+        ORDER BY time ASC OFFSET %s LIMIT 1;
+    """, (symbol, interval, until, SETTLE_BARS))
+    row = cursor.fetchone()
+    return None if row is None else row[0]
+
+
+def _write_indicators(cursor, symbol, interval, values, overwrite=False):
+    """Hesaplanan indikatörleri yazar; overwrite ise var olan satırların üzerine yazılır."""
+    from psycopg2.extras import execute_values
+
+    if values.empty:
+        return 0
+    rows = [
+        (time, symbol, interval, *[None if pd.isna(value) else float(value) for value in row])
+        for time, row in zip(values.index.to_pydatetime(), values.itertuples(index=False))
+    ]
+    columns = [DB_COLUMNS[column] for column in INDICATOR_COLUMNS]
+    conflict = "DO NOTHING"
+    if overwrite:
+        conflict = "DO UPDATE SET " + ", ".join(f"{column} = EXCLUDED.{column}" for column in columns)
+    execute_values(cursor, f"""
+        INSERT INTO mt5_indicators (time, symbol, interval, {", ".join(columns)})
+        VALUES %s
+        ON CONFLICT (time, symbol, interval) {conflict}
+    """, rows, page_size=5000)
+    return len(rows)
+
+
+def update_indicators(symbol, interval, since=None, until=None):
+    """
+    mt5_db'ye yeni gelen barlar için indikatörleri hesaplayıp mt5_indicators'a yazar.
+    Yalnızca her indikatörün ihtiyaç duyduğu son pencere yeniden okunur; EMA tabanlı
+    indikatörler saklanan son değerden devam ettirilir. Yazılan satır sayısını döndürür.
+
+    since ve until, eklenen barların en eskisi ve en yenisidir. Saklanan aralığın içine ya
+    da öncesine bar eklendiyse indikatörler since'ten until'den SETTLE_BARS bar sonrasına
+    kadar yeniden hesaplanır; daha sonraki değerler değişmez. until verilmezse geçmişin
+    sonuna kadar hesaplanır. since verilmezse yalnızca sona eklenen barlar işlenir.
+    """
+    conn = get_db_connection()
+    try:
+        ensure_indicator_table(conn)
+        cursor = conn.cursor()
+        # Aynı sembol için eşzamanlı güncellemeler (ör. fetch_jobs worker'ları) sırayla çalışır
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s));", (f"mt5_indicators:{symbol}:{interval}",))
+
+        written = 0
+        seed = _last_indicator_row(cursor, symbol, interval)
+        if seed is not None and since is not None and since <= seed['time']:
+            # Eklenen barlardan önceki son satırdan devam edilir
+            previous = _last_indicator_row(cursor, symbol, interval, before=since)
+            start = None if previous is None else _window_start(cursor, symbol, interval, previous['time'])
+            end = None if until is None else _settled_time(cursor, symbol, interval, until)
+            bars = read_bars(symbol, interval, start=start, end=end, conn=conn)
+            written += _write_indicators(cursor, symbol, interval,
+                                         compute_indicators(bars['close'], previous), overwrite=True)
+            seed = _last_indicator_row(cursor, symbol, interval)
+
+        # Saklanan son satırdan sonra gelen barlar
+        last_bar = _last_bar_time(cursor, symbol, interval)
+        if last_bar is not None and (seed is None or last_bar > seed['time']):
+            start = None if seed is None else _window_start(cursor, symbol, interval, seed['time'])
+            bars = read_bars(symbol, interval, start=start, conn=conn)
+            written += _write_indicators(cursor, symbol, interval, compute_indicators(bars['close'], seed))
+        conn.commit()
+        return written
+    finally:
+        # Hata durumunda bağlantı kapanınca transaction ve kilit de bırakılır
+        conn.close()
+
+
+def load_indicators(symbol, interval, start=None, end=None, conn=None):
+    """
+    Saklanan indikatörleri [start, end) aralığı için DataFrame olarak yükler (read_bars ile
+    aynı aralık tanımı). Salt okunurdur; tablo update_indicators ile oluşturulur.
+    """
+    own_conn = conn is None
+    conn = conn or get_db_connection()
+    columns = ", ".join(f"{DB_COLUMNS[column]} AS \"{column}\"" for column in INDICATOR_COLUMNS)
+    query = f"""
+        SELECT time, {columns}
+        FROM mt5_indicators
+        WHERE symbol = %s AND interval = %s
+          AND time >= COALESCE(%s, '-infinity'::timestamp)
+          AND time < COALESCE(%s, 'infinity'::timestamp)
+        ORDER BY time ASC;
+    """
+    try:
+        df = pd.read_sql_query(query, conn, params=(symbol, interval, start, end))
+    finally:
+        if own_conn:
+            conn.close()
+    df.set_index('time', inplace=True)
+    return df
+
+
+def get_indicators(df, symbol, interval):
+    """
+    df'deki barlar için indikatörleri döndürür. Tüm barlar için saklanmış değer varsa
+    veritabanından okunur. Yoksa saklanan değerlerle aynı sonucu vermesi için df'ten önceki
+    son indikatör satırından ve mt5_db'deki barlardan devam edilerek hesaplanır (hiç satır
+    yoksa df'ten önceki tüm geçmiş okunur). İkinci değer kaynağı belirtir.
+    """
+    if df.empty:
+        return compute_indicators(df['close']), "computed"
+
+    from psycopg2.errors import UndefinedTable
+
+    conn = get_db_connection()
+    try:
+        try:
+            # Bitiş hariç tutulduğundan son barı da kapsamak için bir mikrosaniye eklenir
+            stored = load_indicators(symbol, interval, df.index[0], df.index[-1] + pd.Timedelta(1, 'us'), conn=conn)
+            if len(stored) >= len(df) and df.index.isin(stored.index).all():
+                return stored.reindex(df.index), "db"
+            seed = _last_indicator_row(conn.cursor(), symbol, interval, before=df.index[0])
+        except UndefinedTable:
+            # Henüz hiç indikatör saklanmamış
+            conn.rollback()
+            seed = None
+        cursor = conn.cursor()
+        start = None if seed is None else _window_start(cursor, symbol, interval, seed['time'])
+        history = read_bars(symbol, interval, start=start, end=df.index[0], conn=conn)['close']
+    finally:
+        conn.close()
+    close = pd.concat([history, df['close']])
+    return compute_indicators(close, seed).reindex(df.index), "computed"
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+# Hesaplanan indikatör kolonları ve bağlı oldukları en uzun pencere
+INDICATOR_COLUMNS = [
+    'MA_20', 'MA_50', 'SMA_30', 'SMA_50', 'EMA_12', 'EMA_26',
+    'WMA_14', 'WMA_30', 'MACD', 'Signal_Line', 'RSI'
+]
+LOOKBACK = 50
+
+# Kaldığı yerden devam ettirilen (özyinelemeli) indikatörler
+EMA_STATE_COLUMNS = ['EMA_12', 'EMA_26', 'Signal_Line']
+
+# Geriye dönük değişen bir barın EMA'lara etkisi her barda en yavaş (1 - 2/27) oranıyla
+# söner (EMA_26; Signal_Line MACD üzerinden bunu izler). Bu kadar bar sonra etki göreli
+# olarak 1e-12'nin altına iner; sonraki saklanan değerlerin yeniden hesaplanması gerekmez.
+SETTLE_BARS = 450
+
+
+def wma(close, window):
+    """Ağırlıklı hareketli ortalama; rolling().apply ile aynı sonucu vektörel hesaplar."""
+    weights = np.arange(window, 0, -1, dtype=float)
+    result = np.full(len(close), np.nan)
+    # Seri pencereden kısaysa np.convolve argümanları yer değiştirip yanlış sonuç döndürür
+    if len(close) >= window:
+        result[window - 1:] = np.convolve(close.to_numpy(dtype=float), weights, mode='valid') / weights.sum()
+    return pd.Series(result, index=close.index)
+
+
+def ema(close, span, seed=None):
+    """Üstel hareketli ortalama. seed verilirse close'un ilk değeri yerine önceki EMA kullanılır."""
+    if seed is not None and len(close):
+        close = close.copy()
+        close.iloc[0] = seed
+    return close.ewm(span=span, adjust=False).mean()
+
+
+def rsi(close, window=14):
+    """Basit ortalamalı RSI (plot_indicators ile aynı tanım)."""
+    delta = close.diff()
+    gain = delta.where(delta > 0, 0).rolling(window=window).mean()
+    loss = -delta.where(delta < 0, 0).rolling(window=window).mean()
+    return 100 - (100 / (1 + gain / loss))
+
+
+def compute_indicators(close, seed=None):
+    """
+    Kapanış fiyatlarından tüm indikatörleri hesaplar.
+
+    seed, daha önce hesaplanmış son satırdır (time ve EMA_STATE_COLUMNS alanları).
+    Verildiğinde close, seed zamanından LOOKBACK bar öncesini de içermelidir; EMA'lar
+    seed değerlerinden devam ettirilir ve yalnızca seed zamanından sonraki satırlar döner.
+    """
+    result = pd.DataFrame(index=close.index)
+    result['MA_20'] = close.rolling(window=20).mean()
+    result['MA_50'] = close.rolling(window=50).mean()
+    result['SMA_30'] = close.rolling(window=30).mean()
+    result['SMA_50'] = close.rolling(window=50).mean()
+    result['WMA_14'] = wma(close, 14)
+    result['WMA_30'] = wma(close, 30)
+    result['RSI'] = rsi(close)
+
+    if seed is None:
+        result['EMA_12'] = ema(close, 12)
+        result['EMA_26'] = ema(close, 26)
+        result['MACD'] = result['EMA_12'] - result['EMA_26']
+        result['Signal_Line'] = ema(result['MACD'], 9)
+        return result[INDICATOR_COLUMNS]
+
+    tail = close.loc[seed['time']:]
+    ema_12 = ema(tail, 12, seed['EMA_12'])
+    ema_26 = ema(tail, 26, seed['EMA_26'])
+    macd = ema_12 - ema_26
+    result['EMA_12'] = ema_12
+    result['EMA_26'] = ema_26
+    result['MACD'] = macd
+    result['Signal_Line'] = ema(macd, 9, seed['Signal_Line'])
+    return result.loc[result.index > seed['time'], INDICATOR_COLUMNS]
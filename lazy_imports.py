@@ -0,0 +1,21 @@
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    """
+    Modülü ilk öznitelik erişimine kadar yüklemeden döndürür. Streamlit her widget
+    değişikliğinde betiği yeniden çalıştırdığı için ağır modüller (plotly, psycopg2)
+    yalnızca gerçekten kullanıldıklarında yüklenir.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named '{name}'")
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
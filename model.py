@@ -1,15 +1,13 @@
-import MetaTrader5 as mt5
 import pandas as pd
 from datetime import datetime
-import psycopg2
 import streamlit as st
-import plotly.graph_objs as go
 
-# MetaTrader 5 terminaline bağlantıyı başlat
-if not mt5.initialize():
-    st.error("MetaTrader 5 initialization failed")
-    mt5.shutdown()
-    exit()
+from lazy_imports import lazy_import
+from mt5_session import TIMEFRAMES, get_mt5
+
+# Ağır modüller ilk kullanımda yüklenir; MT5 bağlantısı mt5_session üzerinden süreç boyunca açık kalır
+psycopg2 = lazy_import("psycopg2")
+go = lazy_import("plotly.graph_objs")
 
 def get_db_connection():
     """PostgreSQL veritabanına bağlantı sağlar."""
@@ -68,18 +66,7 @@ selected_symbols = st.multiselect("Select the symbols:", symbols, default=symbol
 start_date = st.date_input("Enter the start date:", datetime(2024, 7, 27))
 end_date = st.date_input("Enter the end date:", datetime(2024, 7, 28))
 
-intervals = {
-    "1 minute": mt5.TIMEFRAME_M1,
-    "5 minutes": mt5.TIMEFRAME_M5,
-    "15 minutes": mt5.TIMEFRAME_M15,
-    "30 minutes": mt5.TIMEFRAME_M30,
-    "1 hour": mt5.TIMEFRAME_H1,
-    "4 hours": mt5.TIMEFRAME_H4,
-    "1 day": mt5.TIMEFRAME_D1
-}
-
-interval_option = st.selectbox("Select the interval:", list(intervals.keys()))
-timeframe = intervals[interval_option]
+interval_option = st.selectbox("Select the interval:", list(TIMEFRAMES.keys()))
 
 indicators = st.multiselect("Select the indicators to display:", ["MA", "MACD", "RSI", "SMA", "EMA", "WMA"], default=["MA", "MACD", "RSI", "SMA", "EMA", "WMA"])
 
@@ -90,6 +77,13 @@ def get_next_color(colors, index):
     return colors[index % len(colors)]
 
 if st.button("Fetch Data"):
+    try:
+        mt5 = get_mt5()
+    except ConnectionError as e:
+        st.error(str(e))
+        st.stop()
+    timeframe = getattr(mt5, TIMEFRAMES[interval_option])
+
     fig_price = go.Figure()
     fig_macd = go.Figure()
     fig_rsi = go.Figure()
@@ -183,5 +177,3 @@ if st.button("Fetch Data"):
         st.write(f"**{symbol}**")
         df_from_db = load_from_postgresql(symbol, interval_option)
         st.dataframe(df_from_db)
-
-mt5.shutdown()
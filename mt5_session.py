@@ -0,0 +1,98 @@
+import atexit
+import os
+import threading
+import time
+
+# Uygulamadaki interval adlarının MetaTrader5 sabit adları
+TIMEFRAMES = {
+    "1 minute": "TIMEFRAME_M1",
+    "5 minutes": "TIMEFRAME_M5",
+    "15 minutes": "TIMEFRAME_M15",
+    "30 minutes": "TIMEFRAME_M30",
+    "1 hour": "TIMEFRAME_H1",
+    "4 hours": "TIMEFRAME_H4",
+    "1 day": "TIMEFRAME_D1"
+}
+
+
+def load_backend():
+    """
+    MetaTrader5 arayüzünü sağlayan arka ucu döndürür. MT5_BACKEND=sim ise terminal
+    gerektirmeyen simülasyon (mt5_sim, MT5_SIM_* değişkenleriyle ayarlanır), değilse
+    gerçek MetaTrader5 modülü kullanılır.
+    """
+    if os.environ.get("MT5_BACKEND", "").lower() == "sim":
+        from mt5_sim import SimulatedMT5
+
+        return SimulatedMT5.from_env()
+    import MetaTrader5
+
+    return MetaTrader5
+
+
+class MT5Session:
+    """
+    Süreç boyunca açık kalan MetaTrader 5 bağlantısı.
+
+    Streamlit betiği her etkileşimde yeniden çalıştırır; bağlantıyı her seferinde
+    kapatıp açmak yerine bu nesne ilk kullanımda bağlanır, sonraki çağrılarda yalnızca
+    bağlantının canlı olduğunu kontrol eder ve koptuysa yeniden bağlanır.
+    """
+
+    def __init__(self, retries=3, retry_delay=1.0, **init_kwargs):
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.init_kwargs = init_kwargs
+        self.connects = 0
+        self._mt5 = None
+        self._connected = False
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._mt5 is None:
+            self._mt5 = load_backend()
+        for attempt in range(self.retries):
+            if self._connected:
+                self._mt5.shutdown()
+            self._connected = bool(self._mt5.initialize(**self.init_kwargs))
+            if self._connected:
+                self.connects += 1
+                return
+            time.sleep(self.retry_delay * 2 ** attempt)
+        raise ConnectionError(f"MetaTrader 5 initialization failed: {self._mt5.last_error()}")
+
+    def get(self):
+        """Bağlı MetaTrader5 modülünü döndürür; bağlantı yoksa ya da koptuysa yeniden kurar."""
+        with self._lock:
+            if not self._connected or self._mt5.terminal_info() is None:
+                self._connect()
+            return self._mt5
+
+    def timeframe(self, interval):
+        """Uygulamadaki interval adının MT5 sabitini döndürür."""
+        return getattr(self.get(), TIMEFRAMES[interval])
+
+    def shutdown(self):
+        with self._lock:
+            if self._connected:
+                self._mt5.shutdown()
+                self._connected = False
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Süreç genelindeki tek MT5Session nesnesini döndürür."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = MT5Session()
+            atexit.register(_session.shutdown)
+        return _session
+
+
+def get_mt5():
+    """Bağlı MetaTrader5 modülünü döndürür."""
+    return get_session().get()
@@ -0,0 +1,452 @@
+import argparse
+import os
+import threading
+import time
+import zlib
+from collections import namedtuple
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from mt5_session import TIMEFRAMES
+from session_calendar import INTERVAL_FREQ, get_session_index, session_mask
+from ticks import TICK_DTYPE
+
+# MT5 copy_rates_range ile aynı alanlar
+RATES_DTYPE = np.dtype([
+    ('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+    ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8')
+])
+
+# MetaTrader5 paketindeki sabit değerleri
+TIMEFRAME_VALUES = {
+    "TIMEFRAME_M1": 1,
+    "TIMEFRAME_M5": 5,
+    "TIMEFRAME_M15": 15,
+    "TIMEFRAME_M30": 30,
+    "TIMEFRAME_H1": 16385,
+    "TIMEFRAME_H4": 16388,
+    "TIMEFRAME_D1": 16408,
+}
+_INTERVALS = {TIMEFRAME_VALUES[name]: interval for interval, name in TIMEFRAMES.items()}
+
+RES_S_OK = (1, "Success")
+RES_E_INVALID_PARAMS = (-2, "Invalid params")
+RES_E_INTERNAL_FAIL_CONNECT = (-10004, "No IPC connection")
+RES_E_INTERNAL_FAIL_TIMEOUT = (-10005, "IPC timeout")
+
+# Tik bayrakları: bid ve ask değişti
+TICK_FLAGS = 2 | 4
+
+# Bilinen semboller için başlangıç fiyatı ve basamak sayısı; diğerleri sembol adından türetilir
+SYMBOL_DEFAULTS = {
+    "XAUUSD": (2400.0, 2),
+    "XAUEUR": (2200.0, 2),
+    "EURUSD": (1.08, 5),
+    "GBPUSD": (1.27, 5),
+    "USDJPY": (150.0, 3),
+}
+SPREAD_POINTS = 20
+DAILY_VOLATILITY = 0.01
+MINUTES_PER_DAY = 1440
+# Günlük çapa fiyatlarının kapsadığı aralık (1990 - 2099); SYMBOL_DEFAULTS fiyatı ANCHOR_REFERENCE gününe aittir
+ANCHOR_START = datetime(1990, 1, 1)
+ANCHOR_DAYS = 40_000
+ANCHOR_REFERENCE = datetime(2024, 1, 1)
+
+SymbolInfo = namedtuple("SymbolInfo", ["name", "digits", "point", "spread", "visible"])
+TerminalInfo = namedtuple("TerminalInfo", ["connected", "name", "company", "build"])
+
+
+def _seed(symbol, *parts):
+    return [zlib.crc32(symbol.encode()), *parts]
+
+
+def symbol_defaults(symbol):
+    """Sembolün başlangıç fiyatı ve basamak sayısı."""
+    if symbol in SYMBOL_DEFAULTS:
+        return SYMBOL_DEFAULTS[symbol]
+    return 10.0 + zlib.crc32(symbol.encode()) % 1000, 2
+
+
+@lru_cache(maxsize=64)
+def _daily_anchors(symbol):
+    """Sembolün her gün 00:00'daki log fiyatı (deterministik günlük rastgele yürüyüş)."""
+    price, _ = symbol_defaults(symbol)
+    log_prices = np.cumsum(np.random.default_rng(_seed(symbol)).normal(0, DAILY_VOLATILITY, ANCHOR_DAYS))
+    return np.log(price) + log_prices - log_prices[(ANCHOR_REFERENCE - ANCHOR_START).days]
+
+
+@lru_cache(maxsize=1024)
+def _minute_path(symbol, day_index, ticks_per_minute):
+    """
+    Günün dakika sınırlarındaki fiyatları (1441 değer), dakika içi en yüksek/en düşük
+    fiyatları ve dakika başına tik sayılarını üretir. Gün içi yol, günün açılışından ertesi
+    günün açılışına giden bir Brown köprüsüdür; böylece hangi aralık ve interval istenirse
+    istensin barlar aynı fiyat yolundan türetilir.
+    """
+    anchors = _daily_anchors(symbol)
+    rng = np.random.default_rng(_seed(symbol, day_index))
+    minute_volatility = DAILY_VOLATILITY / np.sqrt(MINUTES_PER_DAY)
+    steps = rng.normal(0, minute_volatility, MINUTES_PER_DAY)
+    walk = np.concatenate([[0.0], np.cumsum(steps)])
+    fraction = np.arange(MINUTES_PER_DAY + 1) / MINUTES_PER_DAY
+    drift = anchors[day_index] + fraction * (anchors[day_index + 1] - anchors[day_index])
+    prices = np.exp(drift + walk - fraction * walk[-1])
+    wicks = np.exp(np.abs(rng.normal(0, minute_volatility / 2, (2, MINUTES_PER_DAY))))
+    highs = np.maximum(prices[:-1], prices[1:]) * wicks[0]
+    lows = np.minimum(prices[:-1], prices[1:]) / wicks[1]
+    volumes = rng.poisson(ticks_per_minute, MINUTES_PER_DAY)
+    return prices, highs, lows, volumes
+
+
+def _day_start(day_index):
+    return pd.Timestamp(ANCHOR_START + timedelta(days=day_index))
+
+
+def _active_minutes(symbol, day_start):
+    """Günün hangi dakikalarının seans içinde olduğunu gösteren 1440 uzunluğunda maske."""
+    calendar = get_session_index(symbol, "1 minute", day_start, day_start + pd.Timedelta(days=1))
+    return session_mask(pd.date_range(day_start, periods=MINUTES_PER_DAY, freq="1min"), calendar)
+
+
+def _day_bars(symbol, interval, day_index, ticks_per_minute):
+    """
+    Bir günün sentetik barları. Her interval yalnızca seans içindeki dakikalardan oluşturulur;
+    böylece üst zaman dilimleri M1 barlarının birleşimine eşittir.
+    """
+    prices, highs, lows, volumes = _minute_path(symbol, day_index, ticks_per_minute)
+    _, digits = symbol_defaults(symbol)
+    minutes = int(pd.Timedelta(INTERVAL_FREQ[interval]).total_seconds() // 60)
+    day_start = _day_start(day_index)
+    active = _active_minutes(symbol, day_start).reshape(-1, minutes)
+    offsets = np.arange(0, MINUTES_PER_DAY, minutes)
+    first = offsets + active.argmax(axis=1)
+    last = offsets + minutes - active[:, ::-1].argmax(axis=1)
+
+    bars = np.zeros(len(offsets), dtype=RATES_DTYPE)
+    bars['time'] = day_start.value // 10 ** 9 + offsets * 60
+    bars['open'] = np.round(prices[first], digits)
+    bars['high'] = np.round(np.where(active, highs.reshape(-1, minutes), -np.inf).max(axis=1), digits)
+    bars['low'] = np.round(np.where(active, lows.reshape(-1, minutes), np.inf).min(axis=1), digits)
+    bars['close'] = np.round(prices[last], digits)
+    bars['tick_volume'] = np.where(active, volumes.reshape(-1, minutes), 0).sum(axis=1)
+    bars['spread'] = SPREAD_POINTS
+    return bars[active.any(axis=1)]
+
+
+def _day_ticks(symbol, day_index, ticks_per_minute):
+    """
+    Bir günün seans içindeki sentetik tikleri. Tikler barların fiyat yolu üzerinde yer alır ve
+    dakika başına tik sayısı M1 barının tick_volume değerine eşittir.
+    """
+    prices, _, _, volumes = _minute_path(symbol, day_index, ticks_per_minute)
+    _, digits = symbol_defaults(symbol)
+    rng = np.random.default_rng(_seed(symbol, day_index, 1))
+    minute = np.repeat(np.arange(MINUTES_PER_DAY), volumes)
+    position = np.sort(minute + rng.random(len(minute)))
+
+    day_start = _day_start(day_index)
+    ticks = np.zeros(len(position), dtype=TICK_DTYPE)
+    ticks['time_msc'] = day_start.value // 10 ** 6 + (position * 60_000).astype(np.int64)
+    ticks['time'] = ticks['time_msc'] // 1000
+    ticks['bid'] = np.round(np.interp(position, np.arange(MINUTES_PER_DAY + 1), prices), digits)
+    ticks['ask'] = np.round(ticks['bid'] + SPREAD_POINTS * 10.0 ** -digits, digits)
+    ticks['flags'] = TICK_FLAGS
+    return ticks[_active_minutes(symbol, day_start)[minute]]
+
+
+def _utc_naive(value):
+    """MT5 gibi saat dilimli tarihleri de kabul eder; iç hesaplar saat dilimsiz UTC ile yapılır."""
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert('UTC').tz_localize(None)
+    return timestamp
+
+
+def _rates_from_frame(df):
+    """read_bars çıktısını MT5 bar dizisine çevirir."""
+    rates = np.zeros(len(df), dtype=RATES_DTYPE)
+    rates['time'] = df.index.values.astype('datetime64[s]').astype(np.int64)
+    for column in ['open', 'high', 'low', 'close']:
+        rates[column] = df[column].to_numpy()
+    rates['tick_volume'] = np.nan_to_num(df['upvolume'].to_numpy()).astype(np.uint64)
+    return rates
+
+
+class SimulatedMT5:
+    """
+    MetaTrader5 modülüyle aynı arayüze sahip simülasyon. Terminal olmadan (Linux'ta)
+    çekme, saklama ve dashboard'ları üretim hacminde denemek için kullanılır.
+
+    source="synthetic" her sembol ve aralık için deterministik sentetik bar/tik üretir;
+    source="db" mt5_db ve mt5_tick_blocks'ta kayıtlı verileri sunar.
+    latency her çağrıya eklenen gecikme (saniye), rows_per_sec terminalin saniyede
+    aktarabildiği satır sayısıdır; terminal tek IPC kanalı gibi çağrıları sırayla yanıtlar.
+    failure_rate çağrının None döndürme, disconnect_rate bağlantının kopma olasılığıdır.
+    speed verilirse canlı mod açılır: simülasyon saati live_start'tan itibaren gerçek
+    zamanın speed katı hızla ilerler ve yalnızca tamamlanmış barlar/geçmiş tikler döner.
+    """
+
+    COPY_TICKS_ALL = -1
+    COPY_TICKS_INFO = 1
+    COPY_TICKS_TRADE = 2
+
+    def __init__(self, source="synthetic", latency=0.0, rows_per_sec=None, failure_rate=0.0,
+                 disconnect_rate=0.0, speed=None, live_start=None, ticks_per_minute=100, seed=0):
+        self.source = source
+        self.latency = latency
+        self.rows_per_sec = rows_per_sec
+        self.failure_rate = failure_rate
+        self.disconnect_rate = disconnect_rate
+        self.speed = speed
+        self.live_start = pd.Timestamp(live_start or pd.Timestamp.now(tz='UTC').tz_localize(None)).floor("min")
+        self.ticks_per_minute = ticks_per_minute
+        self.stats = {'calls': 0, 'rows': 0, 'failures': 0, 'disconnects': 0, 'busy_seconds': 0.0}
+        self._rng = np.random.default_rng(seed)
+        self._connected = False
+        self._error = RES_S_OK
+        self._busy_until = 0.0
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, environ=os.environ):
+        """MT5_SIM_* ortam değişkenlerinden ayarlanmış simülasyon oluşturur."""
+        def number(name, default=None):
+            value = environ.get(name)
+            return default if value in (None, "") else float(value)
+
+        return cls(
+            source=environ.get("MT5_SIM_SOURCE", "synthetic"),
+            latency=number("MT5_SIM_LATENCY", 0.0),
+            rows_per_sec=number("MT5_SIM_ROWS_PER_SEC"),
+            failure_rate=number("MT5_SIM_FAILURE_RATE", 0.0),
+            disconnect_rate=number("MT5_SIM_DISCONNECT_RATE", 0.0),
+            speed=number("MT5_SIM_SPEED"),
+            live_start=environ.get("MT5_SIM_LIVE_START") or None,
+            ticks_per_minute=int(number("MT5_SIM_TICKS_PER_MINUTE", 100)),
+        )
+
+    def now(self):
+        """Simülasyon saati; canlı mod kapalıysa None."""
+        if self.speed is None:
+            return None
+        elapsed = (time.monotonic() - self._started) * self.speed
+        return self.live_start + pd.Timedelta(seconds=elapsed)
+
+    def initialize(self, *args, **kwargs):
+        with self._lock:
+            if self._rng.random() < self.failure_rate:
+                self.stats['failures'] += 1
+                self._error = RES_E_INTERNAL_FAIL_CONNECT
+                return False
+            self._connected = True
+            self._error = RES_S_OK
+            return True
+
+    def shutdown(self):
+        self._connected = False
+
+    def last_error(self):
+        return self._error
+
+    def terminal_info(self):
+        if not self._connected:
+            return None
+        return TerminalInfo(True, "Simulated MetaTrader 5", "mt5_sim", 0)
+
+    def symbol_info(self, symbol):
+        if not self._connected:
+            return None
+        _, digits = symbol_defaults(symbol)
+        return SymbolInfo(symbol, digits, 10.0 ** -digits, SPREAD_POINTS, True)
+
+    def copy_rates_range(self, symbol, timeframe, date_from, date_to):
+        """[date_from, date_to] aralığında açılan barlar (MT5 gibi bitiş dahil)."""
+        interval = _INTERVALS.get(timeframe)
+        if interval is None:
+            self._error = RES_E_INVALID_PARAMS
+            return None
+        return self._serve(lambda: self._rates(symbol, interval, _utc_naive(date_from), _utc_naive(date_to)))
+
+    def copy_ticks_range(self, symbol, date_from, date_to, flags=COPY_TICKS_ALL):
+        """[date_from, date_to) aralığındaki tikler."""
+        return self._serve(lambda: self._ticks(symbol, _utc_naive(date_from), _utc_naive(date_to)))
+
+    def _serve(self, produce):
+        """Bağlantı, hata enjeksiyonu, gecikme ve aktarım hızı sınırını uygular."""
+        with self._lock:
+            self.stats['calls'] += 1
+            if not self._connected:
+                self._error = RES_E_INTERNAL_FAIL_CONNECT
+                return None
+            if self._rng.random() < self.disconnect_rate:
+                self._connected = False
+                self.stats['disconnects'] += 1
+                self._error = RES_E_INTERNAL_FAIL_CONNECT
+                return None
+            failed = self._rng.random() < self.failure_rate
+
+        if failed:
+            time.sleep(self.latency)
+            with self._lock:
+                self.stats['failures'] += 1
+                self._error = RES_E_INTERNAL_FAIL_TIMEOUT
+            return None
+
+        result = produce()
+        cost = self.latency + (len(result) / self.rows_per_sec if self.rows_per_sec else 0.0)
+        with self._lock:
+            now = time.monotonic()
+            self._busy_until = max(now, self._busy_until) + cost
+            wait = self._busy_until - now
+            self.stats['rows'] += len(result)
+            self.stats['busy_seconds'] += cost
+            self._error = RES_S_OK
+        if wait > 0:
+            time.sleep(wait)
+        return result
+
+    def _days(self, start, end):
+        first = max((start.normalize() - pd.Timestamp(ANCHOR_START)).days, 0)
+        last = min((end.normalize() - pd.Timestamp(ANCHOR_START)).days, ANCHOR_DAYS - 2)
+        return range(first, last + 1)
+
+    def _rates(self, symbol, interval, start, end):
+        now = self.now()
+        if now is not None:
+            # Canlı modda yalnızca kapanmış barlar döner
+            end = min(end, now - pd.Timedelta(INTERVAL_FREQ[interval]))
+        if end < start:
+            return np.zeros(0, dtype=RATES_DTYPE)
+
+        if self.source == "db":
+            from bulk_io import read_bars
+
+            return _rates_from_frame(read_bars(symbol, interval, start, end + pd.Timedelta(1, 's')))
+
+        days = [_day_bars(symbol, interval, day, self.ticks_per_minute) for day in self._days(start, end)]
+        rates = np.concatenate(days) if days else np.zeros(0, dtype=RATES_DTYPE)
+        times = rates['time']
+        return rates[(times >= start.value // 10 ** 9) & (times <= end.value // 10 ** 9)]
+
+    def _ticks(self, symbol, start, end):
+        now = self.now()
+        if now is not None:
+            end = min(end, now)
+        if end <= start:
+            return np.zeros(0, dtype=TICK_DTYPE)
+
+        if self.source == "db":
+            from db import get_db_connection
+            from ticks import load_ticks
+
+            conn = get_db_connection()
+            try:
+                ticks = load_ticks(conn, symbol, start, end)
+            finally:
+                conn.close()
+        else:
+            days = [_day_ticks(symbol, day, self.ticks_per_minute) for day in self._days(start, end)]
+            ticks = np.concatenate(days) if days else np.zeros(0, dtype=TICK_DTYPE)
+        times = ticks['time_msc']
+        return ticks[(times >= start.value // 10 ** 6) & (times < end.value // 10 ** 6)]
+
+
+# getattr(mt5, "TIMEFRAME_M1") gerçek modüldeki gibi çalışsın
+for _name, _value in TIMEFRAME_VALUES.items():
+    setattr(SimulatedMT5, _name, _value)
+
+
+def benchmark(symbols=10, days=365, interval="1 minute"):
+    """Sentetik bar ve tik üretim hızını ölçer (simülasyonun darboğaz olmadığını görmek için)."""
+    sim = SimulatedMT5()
+    sim.initialize()
+    timeframe = getattr(sim, TIMEFRAMES[interval])
+    end = datetime(2024, 1, 1)
+    start = end - timedelta(days=days)
+
+    started = time.perf_counter()
+    bars = sum(len(sim.copy_rates_range(f"SIM{i:02d}", timeframe, start, end)) for i in range(symbols))
+    bar_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    ticks = len(sim.copy_ticks_range("SIM00", end - timedelta(days=7), end, sim.COPY_TICKS_ALL))
+    tick_seconds = time.perf_counter() - started
+    return {
+        'bars': bars,
+        'bars_per_sec': bars / bar_seconds,
+        'ticks': ticks,
+        'ticks_per_sec': ticks / tick_seconds,
+    }
+
+
+def soak(sim, symbols, interval, history_days=1, poll_seconds=5.0, duration=600.0):
+    """
+    Canlı simülasyondan gelen yeni barları FetchPipeline ile sürekli mt5_db'ye yazar ve
+    indikatörleri günceller; her turda pipeline raporunu ve simülasyon sayaçlarını basar.
+    Başarısız çekimler bir sonraki turda aynı noktadan yeniden denenir.
+    """
+    from indicator_store import update_indicators
+    from pipeline import FetchPipeline
+
+    if not sim.initialize():
+        raise RuntimeError(f"MetaTrader 5 initialization failed: {sim.last_error()}")
+    timeframe = getattr(sim, TIMEFRAMES[interval])
+    since = {symbol: (sim.now() or pd.Timestamp.now(tz='UTC').tz_localize(None)) - pd.Timedelta(days=history_days)
+             for symbol in symbols}
+    deadline = time.monotonic() + duration
+
+    while time.monotonic() < deadline:
+        if sim.terminal_info() is None:
+            sim.initialize()
+        now = sim.now() or pd.Timestamp.now(tz='UTC').tz_localize(None)
+        pipeline = FetchPipeline(
+            fetch=lambda symbol: sim.copy_rates_range(symbol, timeframe, since[symbol], now),
+            interval=interval
+        )
+        rows = 0
+        for _, symbol, df in pipeline.run(symbols):
+            if df is not None:
+                since[symbol] = df.index[-1] + pd.Timedelta(1, 's')
+                rows += len(df)
+        for result in pipeline.store_results:
+            if result['inserted'] is not None:
+                first, last = result['inserted']
+                update_indicators(result['symbol'], interval, since=first, until=last)
+        print(f"{now:%Y-%m-%d %H:%M:%S} | {rows} bar | {pipeline.report()} | {sim.stats}")
+        time.sleep(poll_seconds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simüle MetaTrader 5 arka ucu")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    bench_parser = commands.add_parser("bench", help="Sentetik veri üretim hızını ölç")
+    bench_parser.add_argument("--symbols", type=int, default=10)
+    bench_parser.add_argument("--days", type=int, default=365)
+    bench_parser.add_argument("--interval", choices=list(TIMEFRAMES), default="1 minute")
+
+    soak_parser = commands.add_parser("soak", help="Canlı simülasyonla çekme/saklama döngüsünü sürekli çalıştır")
+    soak_parser.add_argument("--symbols", nargs="+", default=["XAUUSD", "EURUSD"])
+    soak_parser.add_argument("--interval", choices=list(TIMEFRAMES), default="1 minute")
+    soak_parser.add_argument("--speed", type=float, default=60.0, help="Simülasyon saniyesi / gerçek saniye")
+    soak_parser.add_argument("--latency", type=float, default=0.05)
+    soak_parser.add_argument("--rows-per-sec", type=float, default=None)
+    soak_parser.add_argument("--failure-rate", type=float, default=0.0)
+    soak_parser.add_argument("--disconnect-rate", type=float, default=0.0)
+    soak_parser.add_argument("--history-days", type=float, default=1.0)
+    soak_parser.add_argument("--poll", type=float, default=5.0)
+    soak_parser.add_argument("--duration", type=float, default=600.0)
+
+    args = parser.parse_args()
+    if args.command == "bench":
+        for key, value in benchmark(args.symbols, args.days, args.interval).items():
+            print(f"{key}: {value:,.2f}" if isinstance(value, float) else f"{key}: {value:,}")
+    else:
+        sim = SimulatedMT5(latency=args.latency, rows_per_sec=args.rows_per_sec, failure_rate=args.failure_rate,
+                           disconnect_rate=args.disconnect_rate, speed=args.speed)
+        soak(sim, args.symbols, args.interval, args.history_days, args.poll, args.duration)
@@ -0,0 +1,233 @@
+import asyncio
+import queue
+import threading
+import time
+
+import pandas as pd
+
+from coalesce import bar_writes, db_writes
+from db import get_db_dsn
+
+# Aşamalar arasındaki kuyruk boyutu; dolduğunda önceki aşama bekler (backpressure)
+QUEUE_SIZE = 2
+
+_DONE = object()
+
+MT5_COLUMNS = ['time', 'open', 'high', 'low', 'close', 'upvolume', 'downvolume', 'symbol', 'interval']
+
+
+def rates_to_dataframe(rates, symbol, interval):
+    """
+    MT5'ten gelen bar dizisini uygulamanın kullandığı DataFrame biçimine çevirir.
+
+    MT5 barlarında alış/satış hacmi ayrımı yoktur: upvolume tick_volume'dür, downvolume ise
+    uygulamanın ilk sürümünden kalan upvolume - ortalama(upvolume) farkıdır ve gerçek bir satış
+    hacmi değildir. Mevcut kayıtlarla uyum için korunur; gerçek ayrım gereken yerlerde barlar
+    tiklerden oluşturulur (ticks.aggregate_ticks). Diğer modüller bu değeri yeniden üretmez,
+    bu fonksiyonu kullanır.
+    """
+    df = pd.DataFrame(rates)
+    df['time'] = pd.to_datetime(df['time'], unit='s')
+    df.set_index('time', inplace=True)
+    df = df[['open', 'high', 'low', 'close', 'tick_volume']]
+    df.rename(columns={'tick_volume': 'upvolume'}, inplace=True)
+    df['downvolume'] = df['upvolume'] - df['upvolume'].mean()
+    df['symbol'] = symbol
+    df['interval'] = interval
+    return df
+
+
+def dataframe_to_records(df):
+    """DataFrame'i asyncpg'nin kabul ettiği Python tiplerinde satırlara çevirir."""
+    columns = [df.index.to_pydatetime().tolist()]
+    columns += [df[column].tolist() for column in MT5_COLUMNS[1:]]
+    return list(zip(*columns))
+
+
+async def save_records_async(pool, records, symbol, interval):
+    """
+    Satırları asenkron olarak mt5_db'ye yazar. Daha önce var olan satır sayısını ve
+    yeni eklenen barların ilk ve son zamanını (eklenen yoksa None) döndürür.
+    """
+    times = [record[0] for record in records]
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            existing = await conn.fetch("""
+                SELECT time FROM mt5_db
+                WHERE symbol = $1 AND interval = $2 AND time = ANY($3::timestamp[])
+            """, symbol, interval, times)
+            await conn.executemany("""
+                INSERT INTO mt5_db (time, open, high, low, close, upvolume, downvolume, symbol, interval)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+                ON CONFLICT (time, symbol, interval) DO NOTHING
+            """, records)
+    existing = {row['time'] for row in existing}
+    inserted = [time for time in times if time not in existing]
+    return len(existing), (min(inserted), max(inserted)) if inserted else None
+
+
+class FetchPipeline:
+    """
+    Sembol bazında çekme -> dönüştürme -> kaydetme aşamalarını örtüştürür.
+
+    Çekme ayrı bir iş parçacığında, kaydetme asyncpg ile ayrı bir olay döngüsünde
+    çalışır. Dönüştürme ve indikatör hesapları çağıran iş parçacığında kalır; böylece
+    Streamlit çağrıları güvenle yapılabilir. N. sembol yazılırken N+1. sembol çekilir
+    ve indikatörleri hesaplanır.
+    """
+
+    def __init__(self, fetch, interval, transform=rates_to_dataframe, queue_size=QUEUE_SIZE, writers=2, dsn=None):
+        self.fetch = fetch
+        self.transform = transform
+        self.interval = interval
+        self.queue_size = queue_size
+        self.writers = writers
+        self.dsn = dsn or get_db_dsn()
+        self.busy = {'fetch': 0.0, 'transform': 0.0, 'store': 0.0}
+        self.wall_time = 0.0
+        self.store_results = []
+        self._errors = []
+        self._store_done = False
+        self._lock = threading.Lock()
+
+    def _add_busy(self, stage, seconds):
+        with self._lock:
+            self.busy[stage] += seconds
+
+    def _fetch_worker(self, symbols, out_queue):
+        try:
+            for symbol_index, symbol in enumerate(symbols):
+                started = time.perf_counter()
+                rates = self.fetch(symbol)
+                self._add_busy('fetch', time.perf_counter() - started)
+                out_queue.put((symbol_index, symbol, rates))
+        except Exception as e:
+            self._errors.append(e)
+        finally:
+            out_queue.put(_DONE)
+
+    async def _store_loop(self, in_queue):
+        import asyncpg
+
+        loop = asyncio.get_running_loop()
+        async with asyncpg.create_pool(self.dsn, min_size=1, max_size=self.writers) as pool:
+            slots = asyncio.Semaphore(self.writers)
+            tasks = []
+
+            async def store(symbol, records):
+                try:
+                    started = time.perf_counter()
+                    # Başka bir oturum aynı barları yazıyorsa onun sonucunu bekle
+                    key = (symbol, self.interval, records[0][0], records[-1][0], len(records))
+                    future, leader = db_writes.begin(key)
+                    if leader:
+                        try:
+                            result = await save_records_async(pool, records, symbol, self.interval)
+                        except Exception as e:
+                            db_writes.finish(key, future, error=e)
+                            raise
+                        # Bundan sonra başlayan DB okumaları yeni barları görsün
+                        bar_writes.bump(symbol, self.interval)
+                        db_writes.finish(key, future, result)
+                    else:
+                        result = await asyncio.wrap_future(future)
+                    self._add_busy('store', time.perf_counter() - started)
+                    existing, inserted = result
+                    # Bekleyen oturum satırları kendisi eklemedi; indikatör güncellemesini lider yapar
+                    self.store_results.append({
+                        'symbol': symbol,
+                        'rows': len(records),
+                        'existing': existing,
+                        'inserted': inserted if leader else None,
+                    })
+                finally:
+                    slots.release()
+
+            while True:
+                item = await loop.run_in_executor(None, in_queue.get)
+                if item is _DONE:
+                    self._store_done = True
+                    break
+                await slots.acquire()
+                tasks.append(asyncio.create_task(store(*item)))
+            await asyncio.gather(*tasks)
+
+    def _store_worker(self, in_queue):
+        try:
+            asyncio.run(self._store_loop(in_queue))
+        except Exception as e:
+            self._errors.append(e)
+            # Üretici tarafı bloke kalmasın diye kuyruğu boşalt; _DONE zaten alındıysa
+            # (hata gather'dan geldiyse) kuyrukta beklenecek bir şey kalmamıştır
+            if not self._store_done:
+                while in_queue.get() is not _DONE:
+                    pass
+
+    def run(self, symbols):
+        """
+        Sembolleri işler ve her biri için (symbol_index, symbol, df) döndürür.
+        Veri bulunamayan semboller için df None'dır. Çağıranın döngü gövdesinde
+        geçen süre dönüştürme aşamasına sayılır.
+        """
+        fetched = queue.Queue(maxsize=self.queue_size)
+        to_store = queue.Queue(maxsize=self.queue_size)
+        fetcher = threading.Thread(target=self._fetch_worker, args=(symbols, fetched), daemon=True)
+        storer = threading.Thread(target=self._store_worker, args=(to_store,), daemon=True)
+
+        started = time.perf_counter()
+        fetcher.start()
+        storer.start()
+        item = None
+        try:
+            while True:
+                item = fetched.get()
+                if item is _DONE:
+                    break
+                symbol_index, symbol, rates = item
+
+                if rates is None or len(rates) == 0:
+                    yield symbol_index, symbol, None
+                    continue
+
+                transform_started = time.perf_counter()
+                df = self.transform(rates, symbol, self.interval)
+                to_store.put((symbol, dataframe_to_records(df)))
+                self._add_busy('transform', time.perf_counter() - transform_started)
+
+                consumer_started = time.perf_counter()
+                yield symbol_index, symbol, df
+                self._add_busy('transform', time.perf_counter() - consumer_started)
+        finally:
+            # Döngü erken bırakılırsa çekme iş parçacığı dolu kuyrukta kalmasın
+            while item is not _DONE:
+                item = fetched.get()
+            to_store.put(_DONE)
+            fetcher.join()
+            storer.join()
+            self.wall_time = time.perf_counter() - started
+
+        if self._errors:
+            raise self._errors[0]
+
+    def utilization(self):
+        """Her aşamanın toplam süre içindeki meşguliyet oranını döndürür."""
+        if self.wall_time == 0:
+            return {stage: 0.0 for stage in self.busy}
+        return {stage: busy / self.wall_time for stage, busy in self.busy.items()}
+
+    def sequential_time(self):
+        """
+        Aşama meşguliyet sürelerinin toplamı. Aynı işin sıralı döngüde alacağı sürenin
+        tahminidir; sıralı çalıştırma ölçülmez (örtüşme olmadan bekleme süreleri farklı olabilir).
+        """
+        return sum(self.busy.values())
+
+    def report(self):
+        """Aşama kullanımını ve aşama sürelerinin toplamına göre tahmini kazancı özetler."""
+        utilization = ", ".join(
+            f"{stage}: {ratio:.0%}" for stage, ratio in self.utilization().items()
+        )
+        sequential = self.sequential_time()
+        speedup = sequential / self.wall_time if self.wall_time else 0.0
+        return (f"Pipeline {self.wall_time:.2f}s | aşama süreleri toplamı {sequential:.2f}s "
+                f"(sıralı çalıştırma tahmini, ölçülmedi; x{speedup:.2f}) | kullanım: {utilization}")
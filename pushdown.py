@@ -0,0 +1,267 @@
+import argparse
+import io
+import time
+
+import numpy as np
+import pandas as pd
+
+from db import get_db_connection
+from indicators import wma
+
+# Veritabanında pencere fonksiyonlarıyla hesaplanabilen hareketli ortalamalar: kolon -> (tür, pencere).
+# EMA/MACD özyinelemeli olduğundan pencere çerçevesiyle ifade edilemez; istemcide kalır.
+MOVING_AVERAGES = {
+    'MA_20': ('sma', 20),
+    'MA_50': ('sma', 50),
+    'SMA_30': ('sma', 30),
+    'SMA_50': ('sma', 50),
+    'WMA_14': ('wma', 14),
+    'WMA_30': ('wma', 30),
+}
+
+# plot_indicators'taki kesişim çiftleri (crossover_dates_tb'deki intersecting_indicators adlarıyla)
+CROSSOVER_PAIRS = {
+    'MA20/MA50': ('MA_20', 'MA_50'),
+    'SMA30/SMA50': ('SMA_30', 'SMA_50'),
+    'WMA14/WMA30': ('WMA_14', 'WMA_30'),
+}
+
+MAX_SERIES_POINTS = 2000
+
+
+def _average_sql(column):
+    """
+    Hareketli ortalamanın SQL ifadesi; pencere dolmadan NULL döner.
+
+    WMA, pencere içindeki her barın LAG ile alınıp göreli ağırlığıyla (en yeni bar n, en
+    eski 1) çarpılmasıyla hesaplanır. Satır numarasıyla ağırlıklı kayan toplamların farkı
+    uzun geçmişte büyük sayıları çıkardığı için hassasiyet kaybettirirdi.
+    """
+    kind, window = MOVING_AVERAGES[column]
+    if kind == 'sma':
+        value = f"AVG(close) OVER w{window}"
+    else:
+        terms = [f"{window} * close"] + [
+            f"{window - lag} * LAG(close, {lag}) OVER bars_by_time" for lag in range(1, window)
+        ]
+        value = f"({' + '.join(terms)}) / {window * (window + 1) / 2}"
+    return f"CASE WHEN rn >= {window} THEN {value} END AS {column.lower()}"
+
+
+def _averages_cte(columns):
+    """Barları ve istenen hareketli ortalamaları hesaplayan WITH bloğu."""
+    windows = sorted({MOVING_AVERAGES[column][1] for column in columns if MOVING_AVERAGES[column][0] == 'sma'})
+    frames = ", ".join(
+        ["bars_by_time AS (ORDER BY time)"] +
+        [f"w{window} AS (ORDER BY time ROWS BETWEEN {window - 1} PRECEDING AND CURRENT ROW)" for window in windows]
+    )
+    averages = ",\n               ".join(_average_sql(column) for column in columns)
+    return f"""
+        WITH bars AS (
+            SELECT time, close, row_number() OVER (ORDER BY time) AS rn, count(*) OVER () AS total
+            FROM mt5_db
+            WHERE symbol = %(symbol)s AND interval = %(interval)s
+              AND time >= COALESCE(%(start)s, '-infinity'::timestamp)
+              AND time < COALESCE(%(end)s, 'infinity'::timestamp)
+        ),
+        averages AS (
+            SELECT time, close, rn, total,
+               {averages}
+            FROM bars
+            WINDOW {frames}
+        )"""
+
+
+def crossovers_query(pairs=tuple(CROSSOVER_PAIRS)):
+    """
+    Kesişim satırlarını döndüren sorgu. find_crossovers ile aynı tanım kullanılır: her iki
+    ortalamanın da tanımlı olduğu barlarda sign(hızlı - yavaş) bir önceki bardan farklıysa kesişimdir.
+    """
+    columns = sorted({column for pair in pairs for column in CROSSOVER_PAIRS[pair]})
+    selects = []
+    for pair in pairs:
+        fast, slow = (column.lower() for column in CROSSOVER_PAIRS[pair])
+        selects.append(f"""
+        SELECT time, '{pair}' AS intersecting_indicators,
+               CASE WHEN {fast} > {slow} THEN 'Buy' ELSE 'Sell' END AS signal, close AS price
+        FROM (
+            SELECT time, close, {fast}, {slow}, sign({fast} - {slow}) AS side,
+                   LAG(sign({fast} - {slow})) OVER (ORDER BY time) AS previous_side
+            FROM averages
+            WHERE {fast} IS NOT NULL AND {slow} IS NOT NULL
+        ) AS sides
+        WHERE side <> previous_side""")
+    return _averages_cte(columns) + "\n        UNION ALL".join(selects) + "\n        ORDER BY time ASC"
+
+
+def series_query(columns, max_points=MAX_SERIES_POINTS):
+    """Kapanış ve hareketli ortalamaları her step'inci barda seyrelterek döndüren sorgu."""
+    selected = ", ".join(column.lower() for column in columns)
+    return _averages_cte(columns) + f"""
+        SELECT time, close, {selected}
+        FROM averages
+        WHERE (rn - 1) %% GREATEST(1, total / {int(max_points)}) = 0
+        ORDER BY time ASC"""
+
+
+def _run(query, symbol, interval, start, end, conn):
+    own_conn = conn is None
+    conn = conn or get_db_connection()
+    try:
+        df = pd.read_sql_query(query, conn, params={
+            'symbol': symbol, 'interval': interval, 'start': start, 'end': end
+        })
+    finally:
+        if own_conn:
+            conn.close()
+    df.set_index('time', inplace=True)
+    return df
+
+
+def find_crossovers_sql(symbol, interval, start=None, end=None, pairs=tuple(CROSSOVER_PAIRS), conn=None):
+    """
+    Hareketli ortalama kesişimlerini PostgreSQL'de hesaplar; istemciye yalnızca kesişim
+    satırları gelir. Kolonlar crossover_dates_tb ile aynıdır (intersecting_indicators, signal, price).
+    """
+    return _run(crossovers_query(pairs), symbol, interval, start, end, conn)
+
+
+def load_series_sql(symbol, interval, columns, start=None, end=None, max_points=MAX_SERIES_POINTS, conn=None):
+    """Grafik için kapanış ve hareketli ortalamaları veritabanında hesaplayıp seyreltilmiş döndürür."""
+    return _run(series_query(columns, max_points), symbol, interval, start, end, conn)
+
+
+def to_crossover_records(crossovers, symbol, interval):
+    """SQL kesişimlerini insert_crossover_dates'in beklediği sözlüklere çevirir."""
+    return [{
+        'Symbol': symbol,
+        'Date': time,
+        'Intersecting Indicators': row.intersecting_indicators,
+        'Signal': row.signal,
+        'Price': row.price,
+        'interval': interval
+    } for time, row in zip(crossovers.index, crossovers.itertuples(index=False))]
+
+
+def client_crossovers(bars, pairs=tuple(CROSSOVER_PAIRS)):
+    """İstemci tarafı karşılığı: bütün barlar okunduktan sonra pandas ile aynı kesişimleri bulur."""
+    close = bars['close']
+    averages = {}
+    for column in {column for pair in pairs for column in CROSSOVER_PAIRS[pair]}:
+        kind, window = MOVING_AVERAGES[column]
+        averages[column] = close.rolling(window=window).mean() if kind == 'sma' else wma(close, window)
+
+    frames = []
+    for pair in pairs:
+        fast, slow = CROSSOVER_PAIRS[pair]
+        valid = pd.DataFrame({'fast': averages[fast], 'slow': averages[slow], 'price': close}).dropna()
+        crossings = valid.iloc[np.where(np.diff(np.sign(valid['fast'] - valid['slow'])))[0] + 1]
+        frames.append(pd.DataFrame({
+            'intersecting_indicators': pair,
+            'signal': np.where(crossings['fast'] > crossings['slow'], 'Buy', 'Sell'),
+            'price': crossings['price'],
+        }, index=crossings.index))
+    return pd.concat(frames).sort_index(kind='stable')
+
+
+class _ByteCounter(io.RawIOBase):
+    """copy_expert çıktısını saklamadan boyutunu sayar."""
+
+    def __init__(self):
+        self.bytes = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.bytes += len(data)
+        return len(data)
+
+
+def _transferred_bytes(cursor, query, params):
+    """Sorgu sonucunun COPY BINARY olarak istemciye taşıdığı bayt sayısı."""
+    counter = _ByteCounter()
+    cursor.copy_expert(f"COPY ({cursor.mogrify(query, params).decode()}) TO STDOUT WITH BINARY", counter)
+    return counter.bytes
+
+
+def benchmark(rows=525_600, symbol="BENCH", interval="1 minute", pairs=tuple(CROSSOVER_PAIRS)):
+    """
+    Sentetik barlar yükleyip (varsayılan 1 yıl M1) kesişim taramasını istemci tarafında
+    (COPY BINARY ile tüm barlar + pandas) ve SQL pushdown ile karşılaştırır.
+    Süre, taşınan bayt, dönen satır ve iki yolun aynı kesişimleri bulup bulmadığı raporlanır.
+    """
+    from bulk_io import _bars_query, read_bars
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM mt5_db WHERE symbol = %s", (symbol,))
+    close = 2000 + np.cumsum(np.random.normal(0, 0.5, rows))
+    synthetic = pd.DataFrame({
+        'time': pd.date_range("2000-01-01", periods=rows, freq="1min"),
+        'open': close, 'high': close + 0.3, 'low': close - 0.3, 'close': close,
+        'upvolume': np.random.randint(1, 500, rows), 'downvolume': np.zeros(rows),
+        'symbol': symbol, 'interval': interval
+    })
+    buffer = io.StringIO()
+    synthetic.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    cursor.copy_expert(
+        "COPY mt5_db (time, open, high, low, close, upvolume, downvolume, symbol, interval) FROM STDIN WITH CSV",
+        buffer
+    )
+    conn.commit()
+    del synthetic, buffer
+
+    params = {'symbol': symbol, 'interval': interval, 'start': None, 'end': None}
+    series_columns = sorted({column for pair in pairs for column in CROSSOVER_PAIRS[pair]})
+    results = []
+    try:
+        started = time.perf_counter()
+        client = client_crossovers(read_bars(symbol, interval, conn=conn), pairs)
+        elapsed = time.perf_counter() - started
+        counter = _ByteCounter()
+        cursor.copy_expert(_bars_query(cursor, symbol, interval), counter)
+        results.append({'path': 'client', 'seconds': elapsed, 'bytes': counter.bytes, 'rows': rows})
+
+        started = time.perf_counter()
+        pushed = find_crossovers_sql(symbol, interval, pairs=pairs, conn=conn)
+        elapsed = time.perf_counter() - started
+        results.append({'path': 'pushdown_crossovers', 'seconds': elapsed, 'rows': len(pushed),
+                        'bytes': _transferred_bytes(cursor, crossovers_query(pairs), params)})
+
+        started = time.perf_counter()
+        series = load_series_sql(symbol, interval, series_columns, conn=conn)
+        elapsed = time.perf_counter() - started
+        results.append({'path': 'pushdown_series', 'seconds': elapsed, 'rows': len(series),
+                        'bytes': _transferred_bytes(cursor, series_query(series_columns), params)})
+
+        # Toplama sırası farklı olduğundan eşiğe çok yakın barlarda tek tük ayrım olabilir
+        mismatched = len(client.index.symmetric_difference(pushed.index))
+        print(f"Kesişim: istemci {len(client)}, pushdown {len(pushed)}, farklı zaman {mismatched}")
+    finally:
+        cursor.execute("DELETE FROM mt5_db WHERE symbol = %s", (symbol,))
+        conn.commit()
+        cursor.close()
+        conn.close()
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hareketli ortalama kesişimleri için SQL pushdown")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scan_parser = commands.add_parser("scan", help="mt5_db'deki kesişimleri veritabanında bul")
+    scan_parser.add_argument("--symbol", required=True)
+    scan_parser.add_argument("--interval", required=True)
+    scan_parser.add_argument("--start")
+    scan_parser.add_argument("--end")
+
+    bench_parser = commands.add_parser("bench", help="İstemci tarafı ve pushdown yollarını karşılaştır")
+    bench_parser.add_argument("--rows", type=int, default=525_600, help="1 yıl M1 ~ 525.600 bar")
+
+    args = parser.parse_args()
+    if args.command == "scan":
+        print(find_crossovers_sql(args.symbol, args.interval, args.start, args.end).to_string())
+    else:
+        print(benchmark(args.rows).to_string(index=False))
@@ -0,0 +1,344 @@
+import argparse
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import numpy as np
+import pandas as pd
+
+from bulk_io import read_bars
+from coalesce import SingleFlight
+from db import DB_CONFIG, ensure_data_versions
+from indicator_store import load_indicators
+
+DEFAULT_PORT = 8765
+CACHE_BYTES = 256 * 1024 * 1024
+# Veri sürümü (ETag) sorgusunun sonucu bu süre kadar tekrar kullanılır
+VERSION_TTL = 1.0
+# Sürüm tablosu bu kadar anahtarı aşınca süresi dolan kayıtlar atılır
+MAX_VERSION_KEYS = 10_000
+
+# Uç nokta -> (tablo, zaman kolonu)
+TABLES = {
+    "bars": ("mt5_db", "time"),
+    "indicators": ("mt5_indicators", "time"),
+    "signals": ("crossover_dates_tb", "date"),
+}
+
+ARROW_TYPE = "application/vnd.apache.arrow.stream"
+
+
+class LRUCache:
+    """Toplam bayt boyutuyla sınırlı, iş parçacığı güvenli LRU önbellek."""
+
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.counters['misses'] += 1
+                return None
+            self._items.move_to_end(key)
+            self.counters['hits'] += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            if key in self._items:
+                self.size -= len(self._items.pop(key))
+            self._items[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes and len(self._items) > 1:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+                self.counters['evictions'] += 1
+
+
+class ReadService:
+    """
+    mt5_db, mt5_indicators ve crossover_dates_tb için aralık sorgularını sunan okuma katmanı.
+    Bağlantılar havuzdan alınır, kodlanmış yanıtlar sıcak aralık önbelleğinde tutulur ve
+    aynı anda gelen özdeş önbellek kaçırmaları tek sorguda birleştirilir.
+
+    Başlangıçta var olan tablolara mt5_data_versions tetikleyicileri eklenir; sonradan
+    oluşturulan tablolar için servis yeniden başlatılmalıdır (mt5_indicators tetikleyicileriyle
+    birlikte oluşturulur).
+    """
+
+    def __init__(self, pool_size=8, cache_bytes=CACHE_BYTES):
+        from psycopg2.pool import ThreadedConnectionPool
+
+        self.pool = ThreadedConnectionPool(1, pool_size, **DB_CONFIG)
+        # Havuz boşken getconn beklemez, PoolError verir; bağlantı bekleyen istekler burada sıraya girer
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self.cache = LRUCache(cache_bytes)
+        self.loads = SingleFlight("read_api")
+        self._versions = {}
+        self._lock = threading.Lock()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            for table, _ in TABLES.values():
+                cursor.execute("SELECT to_regclass(%s) IS NOT NULL;", (table,))
+                if cursor.fetchone()[0]:
+                    ensure_data_versions(conn, table)
+            cursor.close()
+
+    @contextmanager
+    def connection(self):
+        with self._slots:
+            conn = self.pool.getconn()
+            try:
+                yield conn
+            finally:
+                conn.rollback()
+                self.pool.putconn(conn)
+
+    def data_version(self, kind, symbol, interval):
+        """
+        Uç noktanın okuduğu tablonun (symbol, interval) değişiklik sayacı; ETag ve önbellek
+        anahtarı bu değerden türetilir. Tetikleyiciler her yazma ifadesinde sayacı artırdığından
+        aynı satırların silinip yeniden yazılması da sürümü değiştirir. Kayıt yoksa 0 döner.
+        """
+        from psycopg2.errors import UndefinedTable
+
+        key = (kind, symbol, interval)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._versions.get(key)
+            if cached and now - cached[0] < VERSION_TTL:
+                return cached[1]
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("""
+                    SELECT version FROM mt5_data_versions
+                    WHERE table_name = %s AND symbol = %s AND interval = %s;
+                """, (TABLES[kind][0], symbol, interval))
+                row = cursor.fetchone()
+                version = 0 if row is None else row[0]
+            except UndefinedTable:
+                version = 0
+            cursor.close()
+        with self._lock:
+            if len(self._versions) >= MAX_VERSION_KEYS:
+                self._versions = {
+                    cached_key: cached for cached_key, cached in self._versions.items()
+                    if now - cached[0] < VERSION_TTL
+                }
+            self._versions[key] = (now, version)
+        return version
+
+    def query(self, kind, symbol, interval, start, end):
+        """İstenen veri türünü DataFrame olarak okur."""
+        with self.connection() as conn:
+            if kind == "bars":
+                return read_bars(symbol, interval, start, end, conn=conn)
+            if kind == "indicators":
+                return load_indicators(symbol, interval, start, end, conn=conn)
+            return pd.read_sql_query("""
+                SELECT date AS time, symbol, intersecting_indicators, signal, price, interval
+                FROM crossover_dates_tb
+                WHERE symbol = %s AND interval = %s
+                  AND date >= COALESCE(%s, '-infinity'::timestamp)
+                  AND date < COALESCE(%s, 'infinity'::timestamp)
+                ORDER BY date ASC;
+            """, conn, params=(symbol, interval, start, end)).set_index('time')
+
+    def describe(self, kind, symbol, interval, start=None, end=None, fmt="json"):
+        """İsteğin önbellek anahtarını ve ETag'ini döndürür; veri okunmaz."""
+        key = (kind, symbol, interval, start, end, fmt, self.data_version(kind, symbol, interval))
+        etag = '"' + hashlib.sha1(repr(key).encode()).hexdigest()[:20] + '"'
+        return key, etag
+
+    def body(self, key):
+        """Kodlanmış yanıtı önbellekten ya da veritabanından döndürür."""
+        body = self.cache.get(key)
+        if body is None:
+            kind, symbol, interval, start, end, fmt, _ = key
+            body = self.loads.do(key, lambda: encode(self.query(kind, symbol, interval, start, end), fmt))
+            self.cache.put(key, body)
+        return body
+
+
+def parse_time(value):
+    """Sorgu parametresindeki zamanı naive UTC datetime'a çevirir; geçersizse ValueError verir."""
+    if value is None:
+        return None
+    timestamp = pd.Timestamp(value)
+    if timestamp is pd.NaT:
+        raise ValueError(f"Geçersiz zaman: {value}")
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert("UTC").tz_localize(None)
+    return timestamp.to_pydatetime()
+
+
+def encode(df, fmt):
+    """DataFrame'i Arrow IPC akışı ya da gzip'li JSON olarak kodlar."""
+    if fmt == "arrow":
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(df.reset_index(), preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    payload = df.reset_index().to_json(orient="split", date_format="iso", index=False)
+    return gzip.compress(payload.encode(), compresslevel=5)
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, body=b"", content_type="application/json", headers=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            kind = url.path.strip("/")
+            if kind == "stats":
+                body = json.dumps({'cache': service.cache.counters, 'cache_bytes': service.cache.size,
+                                   'coalescing': service.loads.counters}).encode()
+                return self._send(200, body)
+            if kind not in ("bars", "indicators", "signals"):
+                return self._send(404, b'{"error": "unknown endpoint"}')
+
+            params = {name: values[0] for name, values in parse_qs(url.query).items()}
+            if "symbol" not in params or "interval" not in params:
+                return self._send(400, b'{"error": "symbol and interval are required"}')
+            fmt = params.get("format", "json")
+            if fmt not in ("json", "arrow"):
+                return self._send(400, b'{"error": "format must be json or arrow"}')
+
+            try:
+                start, end = (parse_time(params.get(name)) for name in ("start", "end"))
+            except ValueError:
+                return self._send(400, b'{"error": "start and end must be ISO timestamps"}')
+
+            try:
+                key, etag = service.describe(kind, params["symbol"], params["interval"], start, end, fmt)
+                headers = {"ETag": etag, "Cache-Control": "no-cache"}
+                if fmt == "json":
+                    # Aynı adres gzip'li ya da açık gövde döndürebilir
+                    headers["Vary"] = "Accept-Encoding"
+                # Veri değişmediyse veri okunmadan 304 döner
+                if self.headers.get("If-None-Match") == etag:
+                    return self._send(304, headers=headers)
+                body = service.body(key)
+            except Exception:
+                return self._send(500, b'{"error": "query failed"}')
+
+            content_type = ARROW_TYPE if fmt == "arrow" else "application/json"
+            if fmt == "json":
+                # JSON gövdesi gzip'li saklanır; istemci desteklemiyorsa açılarak gönderilir
+                if "gzip" in self.headers.get("Accept-Encoding", ""):
+                    headers["Content-Encoding"] = "gzip"
+                else:
+                    body = gzip.decompress(body)
+            self._send(200, body, content_type, headers)
+
+    return Handler
+
+
+def serve(port=DEFAULT_PORT, pool_size=8):
+    """Okuma servisini localhost üzerinde başlatır."""
+    service = ReadService(pool_size)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(service))
+    print(f"Read API http://127.0.0.1:{port} (bars, indicators, signals, stats)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.pool.closeall()
+
+
+def load_test(url, total=2000, concurrency=16, conditional=False):
+    """
+    Verilen adrese eşzamanlı istekler gönderip saniyedeki istek sayısını ve gecikme
+    yüzdeliklerini ölçer. conditional=True ise ilk yanıtın ETag'i If-None-Match ile gönderilir.
+    """
+    headers = {"Accept-Encoding": "gzip"}
+    if conditional:
+        with urlopen(Request(url, headers=headers)) as response:
+            response.read()
+            headers["If-None-Match"] = response.headers["ETag"]
+
+    def one(_):
+        started = time.perf_counter()
+        try:
+            with urlopen(Request(url, headers=headers)) as response:
+                response.read()
+                status = response.status
+        except HTTPError as e:
+            status = e.code
+        return time.perf_counter() - started, status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = list(executor.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies = np.array([latency for latency, _ in results]) * 1000
+    statuses = pd.Series([status for _, status in results]).value_counts().to_dict()
+    return {
+        'requests': total,
+        'concurrency': concurrency,
+        'requests_per_sec': total / elapsed,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'statuses': statuses,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="mt5_db okuma servisi")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="Servisi başlat")
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument("--pool-size", type=int, default=8)
+
+    load_parser = commands.add_parser("loadtest", help="Çalışan servise yük testi uygula")
+    load_parser.add_argument("--symbol", default="XAUUSD")
+    load_parser.add_argument("--interval", default="1 minute")
+    load_parser.add_argument("--kind", choices=["bars", "indicators", "signals"], default="bars")
+    load_parser.add_argument("--format", choices=["json", "arrow"], default="json")
+    load_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    load_parser.add_argument("--requests", type=int, default=2000)
+    load_parser.add_argument("--concurrency", type=int, default=16)
+    load_parser.add_argument("--conditional", action="store_true", help="If-None-Match ile 304 yolunu ölç")
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        serve(args.port, args.pool_size)
+    else:
+        query = urlencode({'symbol': args.symbol, 'interval': args.interval, 'format': args.format})
+        url = f"http://127.0.0.1:{args.port}/{args.kind}?{query}"
+        for key, value in load_test(url, args.requests, args.concurrency, args.conditional).items():
+            print(f"{key}: {value:,.2f}" if isinstance(value, float) else f"{key}: {value}")
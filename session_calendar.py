@@ -0,0 +1,130 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Uygulamadaki interval adlarının pandas frekans karşılıkları
+INTERVAL_FREQ = {
+    "1 minute": "1min",
+    "5 minutes": "5min",
+    "15 minutes": "15min",
+    "30 minutes": "30min",
+    "1 hour": "1h",
+    "4 hours": "4h",
+    "1 day": "1D"
+}
+
+# Broker sunucu saatine göre işlem seansları.
+# days: işlem yapılan haftanın günleri (0: Pazartesi), breaks: günlük aralar (HH:MM),
+# holidays: piyasanın tamamen kapalı olduğu günler (MM-DD)
+DEFAULT_SESSION = {
+    "days": (0, 1, 2, 3, 4),
+    "breaks": (),
+    "holidays": ("01-01", "12-25")
+}
+
+SYMBOL_SESSIONS = {
+    "XAUUSD": {**DEFAULT_SESSION, "breaks": (("00:00", "01:00"),)},
+    "XAUEUR": {**DEFAULT_SESSION, "breaks": (("00:00", "01:00"),)}
+}
+
+
+def get_session(symbol):
+    """Sembolün seans tanımını döndürür."""
+    return SYMBOL_SESSIONS.get(symbol, DEFAULT_SESSION)
+
+
+def _minutes(hhmm):
+    hours, minutes = hhmm.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+@lru_cache(maxsize=128)
+def _year_calendar(symbol, interval, year):
+    """Bir yıl için beklenen bar zamanlarını hesaplar (önbellekli)."""
+    session = get_session(symbol)
+    freq = pd.Timedelta(INTERVAL_FREQ[interval])
+    stamps = pd.date_range(f"{year}-01-01", f"{year + 1}-01-01", freq=freq, inclusive="left")
+
+    keep = np.isin(stamps.dayofweek, session["days"])
+    if session["holidays"]:
+        holidays = [int(month) * 100 + int(day) for month, day in
+                    (holiday.split("-") for holiday in session["holidays"])]
+        keep &= ~np.isin(stamps.month * 100 + stamps.day, holidays)
+
+    # Barın tamamı günlük aranın içinde kalıyorsa bar oluşmaz
+    bar_start = stamps.hour * 60 + stamps.minute
+    bar_end = bar_start + freq.total_seconds() / 60
+    for start, end in session["breaks"]:
+        keep &= ~((bar_start >= _minutes(start)) & (bar_end <= _minutes(end)))
+
+    return stamps[keep]
+
+
+def get_session_index(symbol, interval, start, end):
+    """
+    [start, end) aralığındaki beklenen bar zamanlarını sıralı DatetimeIndex olarak döndürür.
+    Yıllık takvimler önbellekte tutulur, aralık bunlardan dilimlenir.
+    """
+    start = pd.Timestamp(start)
+    end = pd.Timestamp(end)
+    if start > end:
+        raise ValueError(f"Başlangıç ({start}) bitişten ({end}) sonra olamaz")
+    years = [_year_calendar(symbol, interval, year) for year in range(start.year, end.year + 1)]
+    calendar = years[0] if len(years) == 1 else years[0].append(years[1:])
+    # Sınırlar takvimden ince çözünürlükte olabilir (ör. "+1ns" ile verilen dışlayıcı bitiş);
+    # yukarı yuvarlamak [start, end) anlamını korur
+    unit = calendar.unit
+    left, right = calendar.searchsorted([start.ceil(unit).as_unit(unit), end.ceil(unit).as_unit(unit)])
+    return calendar[left:right]
+
+
+def session_mask(index, calendar):
+    """index içindeki barlardan seans takviminde yer alanlar için True döndürür."""
+    if len(calendar) == 0:
+        return np.zeros(len(index), dtype=bool)
+    positions = np.minimum(calendar.searchsorted(index), len(calendar) - 1)
+    return np.asarray(calendar[positions] == index)
+
+
+def filter_to_session(df, calendar):
+    """
+    Seans dışındaki barları ayıklar. Tüm barlar seans içindeyse (MT5'ten gelen
+    verilerde genelde öyledir) kopya oluşturmadan aynı DataFrame döndürülür.
+    """
+    mask = session_mask(df.index, calendar)
+    if mask.all():
+        return df
+    return df[mask]
+
+
+def find_gaps(index, calendar):
+    """
+    Takvimde beklenip veride bulunmayan barları ardışık aralıklar halinde döndürür.
+    Piyasa kapanışları takvimde olmadığı için gerçek veri boşluklarını verir.
+    Her eleman (ilk_eksik_bar, son_eksik_bar, bar_sayısı) şeklindedir.
+    """
+    missing = ~session_mask(calendar, index)
+    if not missing.any():
+        return []
+
+    # Eksik bar dizilerinin başlangıç ve bitiş konumları
+    edges = np.diff(np.concatenate(([0], missing.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1) - 1
+    return [(calendar[s], calendar[e], e - s + 1) for s, e in zip(starts, ends)]
+
+
+def align_symbols(frames, calendar, column="close"):
+    """
+    Birden fazla sembolün verisini ortak seans takvimine hizalar.
+    frames: {sembol: DataFrame}. Eksik barlar NaN olarak kalır.
+    """
+    aligned = {}
+    for symbol, df in frames.items():
+        values = np.full(len(calendar), np.nan)
+        positions = calendar.get_indexer(df.index)
+        found = positions >= 0
+        values[positions[found]] = df[column].to_numpy()[found]
+        aligned[symbol] = values
+    return pd.DataFrame(aligned, index=calendar)
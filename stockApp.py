@@ -1,83 +1,40 @@
-import MetaTrader5 as mt5
+from time import perf_counter
+rerun_started = perf_counter()
+
 import pandas as pd
 from datetime import datetime, timedelta
-import psycopg2
 import streamlit as st
-import plotly.graph_objs as go
 import numpy as np
 
-# MetaTrader 5 terminaline bağlantıyı başlat
-if not mt5.initialize():
-    st.error("MetaTrader 5 initialization failed")
-    mt5.shutdown()
-    exit()
-
-def get_db_connection():
-    """PostgreSQL veritabanına bağlantı sağlar."""
-    return psycopg2.connect(
-        dbname="mt5_db",
-        user="postgres",
-        password="123",
-        host="localhost",
-        port="5432"
-    )
+# MT5 bağlantısı mt5_session üzerinden süreç boyunca açık kalır
+from db import get_db_connection
+from mt5_session import TIMEFRAMES, get_mt5
+
+# plotly ve çekme/saklama/analiz modülleri yalnızca ilgili düğmeye basılınca, kullanıldıkları yerde
+# içe aktarılır. LazyLoader burada işe yaramaz: Streamlit ilk elemanı yazarken inspect.stack()
+# çağırır ve bu sys.modules'teki her tembel modülün __file__'ına erişip onu yükler.
 
 def load_from_postgresql(symbol, interval):
-    """PostgreSQL veritabanından verileri yükler."""
-    conn = get_db_connection()
-    query = """
-        SELECT time, open, high, low, close, upvolume, downvolume, symbol, interval 
-        FROM mt5_db 
-        WHERE symbol = %s AND interval = %s
-        ORDER BY time ASC;
     """
-    df = pd.read_sql_query(query, conn, params=(symbol, interval))
-    conn.close()
-    df.set_index('time', inplace=True)
-    return df
-
-def save_to_postgresql(df, interval, symbol, start_date, end_date):
-    """Verileri PostgreSQL veritabanına kaydeder, varsa mevcut kayıtları kontrol eder"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    data_exists = False
- 
-    for index, row in df.iterrows():
-        cursor.execute("""
-            SELECT EXISTS (
-                SELECT 1 FROM mt5_db 
-                WHERE time = %s AND symbol = %s AND interval = %s
-            );
-        """, (index, row['symbol'], interval))
-        exists = cursor.fetchone()[0]
-
-        if exists:
-            data_exists = True
-        else:
-            cursor.execute("""
-                INSERT INTO mt5_db (time, open, high, low, close, upvolume, downvolume, symbol, interval)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (index, row['open'], row['high'], row['low'], row['close'], row['upvolume'], row['downvolume'], row['symbol'], row['interval']))
-
-    conn.commit()
-    cursor.close()
-    conn.close()
+    PostgreSQL veritabanından verileri COPY BINARY ile yükler; eşzamanlı aynı istekler
+    birleştirilir. Yazma sayacı anahtarda olduğundan bu süreçte yazılan barlar hep görülür.
+    """
+    from bulk_io import read_bars
+    from coalesce import bar_writes, db_loads
 
-    if data_exists:
-        st.error(f"DB'de {symbol} sembolü, {interval_option} intervali ve {start_date} - {end_date} tarih aralığı için veri bulunuyor")
-    else:
-        st.success(f"DB'de {symbol} sembolü, {interval_option} intervali ve {start_date} - {end_date} tarih aralığı için veri bulunmuyor")
+    return db_loads.do((symbol, interval, bar_writes.get(symbol, interval)), read_bars, symbol, interval)
 
 def insert_crossover_dates(crossover_dates):
     """Crossover tarihlerini PostgreSQL veritabanına ekler."""
     conn = get_db_connection()
     cursor = conn.cursor()
     for record in crossover_dates:
+        # numpy 2 skalerleri SQL'e repr ile (np.float64(...)) geçer; düz float'a çevrilir
         cursor.execute("""
             INSERT INTO crossover_dates_tb (symbol, date, intersecting_indicators, Signal, Price, interval) 
             VALUES (%s, %s, %s, %s, %s, %s)
             ON CONFLICT (symbol, date) DO NOTHING;
-        """, (record['Symbol'], record['Date'], record['Intersecting Indicators'], record['Signal'], record['Price'], record['interval']))
+        """, (record['Symbol'], record['Date'], record['Intersecting Indicators'], record['Signal'], float(record['Price']), record['interval']))
     conn.commit()
     cursor.close()
     conn.close()
@@ -106,21 +63,32 @@ def remove_duplicate_crossovers(crossover_dates, time_threshold=timedelta(minute
 
 def plot_indicators(df, indicators, fig, symbol_index, colors):
     """İndikatörleri hesaplar ve grafiğe ekler, kesişim noktalarını bulur ve veritabanına ekler."""
+    import plotly.graph_objs as go
+    from indicator_store import get_indicators
+    from session_calendar import get_session_index, filter_to_session
+
     crossover_dates = []
-    
-     # Hafta sonları kapalı olan günleri hariç tutma
-    df = df[df.index.to_series().dt.dayofweek < 5]  # 0: Pazartesi, ..., 4: Cuma
+    symbol = df['symbol'].iloc[0]
+    # Tiklerden oluşturulan barların interval etiketi farklıdır (ör. '1 minute (ticks)')
+    interval = df['interval'].iloc[0]
+
+    # Seans dışındaki barları (hafta sonu, tatil, günlük ara) hariç tutma
+    calendar = get_session_index(symbol, interval_option, df.index[0], df.index[-1] + pd.Timedelta(1, 'ns'))
+    df = filter_to_session(df, calendar)
+
+    # Saklanmış indikatörler varsa DB'den okunur, yoksa anında hesaplanır
+    indicator_values, _ = get_indicators(df, symbol, interval)
     
     # MA20 hesaplama ve grafiğe ekleme
     if "MA20" in indicators:
-        df['MA_20'] = df['close'].rolling(window=20).mean()
-        fig.add_trace(go.Scatter(x=df.index, y=df['MA_20'], mode='lines', name=f'{df.symbol[0]} MA 20',
+        df['MA_20'] = indicator_values['MA_20']
+        fig.add_trace(go.Scatter(x=df.index, y=df['MA_20'], mode='lines', name=f'{symbol} MA 20',
             line=dict(color=get_next_color(colors, symbol_index + 10))))
         
     # MA50 hesaplama ve grafiğe ekleme
     if "MA50" in indicators:
-        df['MA_50'] = df['close'].rolling(window=50).mean()
-        fig.add_trace(go.Scatter(x=df.index, y=df['MA_50'], mode='lines', name=f'{df.symbol[0]} MA 50',
+        df['MA_50'] = indicator_values['MA_50']
+        fig.add_trace(go.Scatter(x=df.index, y=df['MA_50'], mode='lines', name=f'{symbol} MA 50',
             line=dict(color=get_next_color(colors, symbol_index + 11))))
 
         # MA20 ve MA50'nin aynı anda mevcut olduğu tarihlerde crossover analizi
@@ -140,27 +108,27 @@ def plot_indicators(df, indicators, fig, symbol_index, colors):
                 y=df['MA_20'].reindex(ma_crossover_times),
                 mode='markers',
                 marker=dict(symbol='x', color='green', size=10),
-                name=f'{df.symbol[0]} MA20/MA50 Crossovers'
+                name=f'{symbol} MA20/MA50 Crossovers'
             ))
 
             crossover_dates.extend({
-                'Symbol': df.symbol[0],
+                'Symbol': symbol,
                 'Date': time,
                 'Intersecting Indicators': 'MA20/MA50',
                 'Signal': 'Buy' if df['MA_20'].loc[time] > df['MA_50'].loc[time] else 'Sell',
                 'Price': df['close'].loc[time],
-                'interval': interval_option
+                'interval': interval
             } for time in ma_crossover_times)
 
     
     if "SMA30" in indicators:
-        df['SMA_30'] = df['close'].rolling(window=30).mean()
-        fig.add_trace(go.Scatter(x=df.index, y=df['SMA_30'], mode='lines', name=f'{df.symbol[0]} SMA 30',
+        df['SMA_30'] = indicator_values['SMA_30']
+        fig.add_trace(go.Scatter(x=df.index, y=df['SMA_30'], mode='lines', name=f'{symbol} SMA 30',
         line=dict(color=get_next_color(colors, symbol_index + 1))))
 
     if "SMA50" in indicators:
-        df['SMA_50'] = df['close'].rolling(window=50).mean()
-        fig.add_trace(go.Scatter(x=df.index, y=df['SMA_50'], mode='lines', name=f'{df.symbol[0]} SMA 50',
+        df['SMA_50'] = indicator_values['SMA_50']
+        fig.add_trace(go.Scatter(x=df.index, y=df['SMA_50'], mode='lines', name=f'{symbol} SMA 50',
         line=dict(color=get_next_color(colors, symbol_index + 2))))
 
         if "SMA30" in indicators:
@@ -179,44 +147,44 @@ def plot_indicators(df, indicators, fig, symbol_index, colors):
                 y=df['SMA_30'].reindex(sma_crossover_times),
                 mode='markers',
                 marker=dict(symbol='x', color='blue', size=10),
-                name=f'{df.symbol[0]} SMA30/SMA50 Crossovers'
+                name=f'{symbol} SMA30/SMA50 Crossovers'
             ))
 
             # Crossover tarihleri ve ilgili bilgileri crossover_dates listesine ekleyin
             for time in sma_crossover_times:
                 price_at_crossover = df['close'].loc[time]
                 crossover_dates.append({
-                    'Symbol': df.symbol[0],
+                    'Symbol': symbol,
                     'Date': time,
                     'Intersecting Indicators': 'SMA30/SMA50',
                     'Signal': 'Buy' if df['SMA_30'].loc[time] > df['SMA_50'].loc[time] else 'Sell',
                     'Price': price_at_crossover,
-                    'interval': interval_option
+                    'interval': interval
                 })
 
 
         # # Kesişim yorumlarını ekle
         # for time in sma_crossover_times:
         #     if df['SMA_30'].loc[time] > df['SMA_50'].loc[time]:
-        #         st.write(f"**{df.symbol[0]} {time} tarihinde SMA30, SMA50'yi aşağıdan yukarıya kesti (Golden Cross).**")
+        #         st.write(f"**{symbol} {time} tarihinde SMA30, SMA50'yi aşağıdan yukarıya kesti (Golden Cross).**")
         #         st.write("Yorum: Bu durum genellikle yükseliş trendinin başladığını veya güçlendiğini gösterir. SMA30'un daha kısa dönemli olması nedeniyle, fiyatların SMA50'nin üzerinde olduğuna işaret eder ve bu durum, genellikle alım sinyali olarak değerlendirilir.")
         #         st.write("Eylem: Traderlar, alım pozisyonları açabilirler veya mevcut uzun pozisyonlarını koruyabilirler.")
         #     elif df['SMA_30'].loc[time] < df['SMA_50'].loc[time]:
-        #         st.write(f"**{df.symbol[0]} {time} tarihinde SMA30, SMA50'yi yukarıdan aşağıya kesti (Death Cross).**")
+        #         st.write(f"**{symbol} {time} tarihinde SMA30, SMA50'yi yukarıdan aşağıya kesti (Death Cross).**")
         #         st.write("Yorum: Bu kesişim, genellikle düşüş trendinin başladığını veya güçlendiğini gösterir. SMA30'un SMA50'yi aşağıdan yukarıya kesmesi, fiyatların daha düşük bir trendde olduğunu ve bu durumun genellikle satış sinyali olarak değerlendirilmesine yol açabilir.")
         #         st.write("Eylem: Traderlar, satış pozisyonları açabilirler veya mevcut uzun pozisyonlarını kapatabilirler.")
 
         # EMA12 hesaplama ve grafiğe ekleme
   # EMA12 hesaplama ve grafiğe ekleme
     if "EMA12" in indicators:
-        df['EMA_12'] = df['close'].ewm(span=12, adjust=False).mean()
-        fig.add_trace(go.Scatter(x=df.index, y=df['EMA_12'], mode='lines', name=f'{df.symbol[0]} EMA 12',
+        df['EMA_12'] = indicator_values['EMA_12']
+        fig.add_trace(go.Scatter(x=df.index, y=df['EMA_12'], mode='lines', name=f'{symbol} EMA 12',
             line=dict(color=get_next_color(colors, symbol_index + 3))))
 
     # EMA26 hesaplama ve grafiğe ekleme
     if "EMA26" in indicators:
-        df['EMA_26'] = df['close'].ewm(span=26, adjust=False).mean()
-        fig.add_trace(go.Scatter(x=df.index, y=df['EMA_26'], mode='lines', name=f'{df.symbol[0]} EMA 26',
+        df['EMA_26'] = indicator_values['EMA_26']
+        fig.add_trace(go.Scatter(x=df.index, y=df['EMA_26'], mode='lines', name=f'{symbol} EMA 26',
             line=dict(color=get_next_color(colors, symbol_index + 4))))
 
         # EMA12 ve EMA26 crossover analizi
@@ -234,28 +202,28 @@ def plot_indicators(df, indicators, fig, symbol_index, colors):
                 y=df['EMA_12'].reindex(ema_crossover_times),
                 mode='markers',
                 marker=dict(symbol='x', color='orange', size=10),
-                name=f'{df.symbol[0]} EMA12/EMA26 Crossovers'
+                name=f'{symbol} EMA12/EMA26 Crossovers'
             ))
 
             crossover_dates.extend({
-                'Symbol': df.symbol[0],
+                'Symbol': symbol,
                 'Date': time,
                 'Intersecting Indicators': 'EMA12/EMA26',
                 'Signal': 'Buy' if df['EMA_12'].loc[time] > df['EMA_26'].loc[time] else 'Sell',
                 'Price': df['close'].loc[time],
-                'interval': interval_option
+                'interval': interval
             } for time in ema_crossover_times)
 
     # WMA14 hesaplama ve grafiğe ekleme
     if "WMA14" in indicators:
-        df['WMA_14'] = df['close'].rolling(window=14).apply(lambda x: (x * range(1, 15)).sum() / sum(range(1, 15)))
-        fig.add_trace(go.Scatter(x=df.index, y=df['WMA_14'], mode='lines', name=f'{df.symbol[0]} WMA 14',
+        df['WMA_14'] = indicator_values['WMA_14']
+        fig.add_trace(go.Scatter(x=df.index, y=df['WMA_14'], mode='lines', name=f'{symbol} WMA 14',
             line=dict(color=get_next_color(colors, symbol_index + 5))))
 
     # WMA30 hesaplama ve grafiğe ekleme
     if "WMA30" in indicators:
-        df['WMA_30'] = df['close'].rolling(window=30).apply(lambda x: (x * range(1, 31)).sum() / sum(range(1, 31)))
-        fig.add_trace(go.Scatter(x=df.index, y=df['WMA_30'], mode='lines', name=f'{df.symbol[0]} WMA 30',
+        df['WMA_30'] = indicator_values['WMA_30']
+        fig.add_trace(go.Scatter(x=df.index, y=df['WMA_30'], mode='lines', name=f'{symbol} WMA 30',
             line=dict(color=get_next_color(colors, symbol_index + 6))))
 
         # WMA14 ve WMA30 crossover analizi
@@ -273,26 +241,25 @@ def plot_indicators(df, indicators, fig, symbol_index, colors):
                 y=df['WMA_14'].reindex(wma_crossover_times),
                 mode='markers',
                 marker=dict(symbol='x', color='purple', size=10),
-                name=f'{df.symbol[0]} WMA14/WMA30 Crossovers'
+                name=f'{symbol} WMA14/WMA30 Crossovers'
             ))
 
             crossover_dates.extend({
-                'Symbol': df.symbol[0],
+                'Symbol': symbol,
                 'Date': time,
                 'Intersecting Indicators': 'WMA14/WMA30',
                 'Signal': 'Buy' if df['WMA_14'].loc[time] > df['WMA_30'].loc[time] else 'Sell',
                 'Price': df['close'].loc[time],
-                'interval': interval_option
+                'interval': interval
             } for time in wma_crossover_times)
 
     # MACD hesaplama ve grafiğe ekleme
     if "MACD12" in indicators or "MACD26" in indicators:
-        short_ema = df['close'].ewm(span=12, adjust=False).mean()
-        df['MACD'] = short_ema - df['close'].ewm(span=26, adjust=False).mean()
-        df['Signal_Line'] = df['MACD'].ewm(span=9, adjust=False).mean()
-        fig.add_trace(go.Scatter(x=df.index, y=df['MACD'], mode='lines', name=f'{df.symbol[0]} MACD',
+        df['MACD'] = indicator_values['MACD']
+        df['Signal_Line'] = indicator_values['Signal_Line']
+        fig.add_trace(go.Scatter(x=df.index, y=df['MACD'], mode='lines', name=f'{symbol} MACD',
             line=dict(color=get_next_color(colors, symbol_index + 7))))
-        fig.add_trace(go.Scatter(x=df.index, y=df['Signal_Line'], mode='lines', name=f'{df.symbol[0]} Signal Line',
+        fig.add_trace(go.Scatter(x=df.index, y=df['Signal_Line'], mode='lines', name=f'{symbol} Signal Line',
             line=dict(color=get_next_color(colors, symbol_index + 8), dash='dash')))
 
         # MACD ve Signal Line crossover analizi
@@ -310,49 +277,45 @@ def plot_indicators(df, indicators, fig, symbol_index, colors):
                 y=df['MACD'].reindex(macd_crossover_times),
                 mode='markers',
                 marker=dict(symbol='x', color='red', size=10),
-                name=f'{df.symbol[0]} MACD/Signal Line Crossovers'
+                name=f'{symbol} MACD/Signal Line Crossovers'
             ))
 
             crossover_dates.extend({
-                'Symbol': df.symbol[0],
+                'Symbol': symbol,
                 'Date': time,
                 'Intersecting Indicators': 'MACD/Signal Line',
                 'Signal': 'Buy' if df['MACD'].loc[time] > df['Signal_Line'].loc[time] else 'Sell',
                 'Price': df['close'].loc[time],
-                'interval': interval_option
+                'interval': interval
             } for time in macd_crossover_times)
                 
     
     if "RSI" in indicators:
-        delta = df['close'].diff()
-        gain = delta.where(delta > 0, 0).rolling(window=14).mean()
-        loss = -delta.where(delta < 0, 0).rolling(window=14).mean()
-        rs = gain / loss
-        df['RSI'] = 100 - (100 / (1 + rs))
+        df['RSI'] = indicator_values['RSI']
 
-        fig.add_trace(go.Scatter(x=df.index, y=df['RSI'], mode='lines', name=f'{df.symbol[0]} RSI',
+        fig.add_trace(go.Scatter(x=df.index, y=df['RSI'], mode='lines', name=f'{symbol} RSI',
             line=dict(color=get_next_color(colors, symbol_index + 9))))
 
         # Identify signals
         
         for i in range(1, len(df)):
-            if df['RSI'][i-1] >= 30 and df['RSI'][i] < 30:
+            if df['RSI'].iloc[i-1] >= 30 and df['RSI'].iloc[i] < 30:
                 crossover_dates.append({
-                    'Symbol': df['symbol'][i],
+                    'Symbol': symbol,
                     'Date': df.index[i],
                     'Intersecting Indicators': 'RSI',
                     'Signal': 'Sell',
-                    'Price': df['close'][i],  # Use the index directly
-                    'interval': interval_option
+                    'Price': df['close'].iloc[i],  # Use the index directly
+                    'interval': interval
                 })
-            elif df['RSI'][i-1] <= 70 and df['RSI'][i] > 70:
+            elif df['RSI'].iloc[i-1] <= 70 and df['RSI'].iloc[i] > 70:
                 crossover_dates.append({
-                    'Symbol': df['symbol'][i],
+                    'Symbol': symbol,
                     'Date': df.index[i],
                     'Intersecting Indicators': 'RSI',
                     'Signal': 'Buy',
-                    'Price': df['close'][i],  # Use the index directly
-                    'interval': interval_option
+                    'Price': df['close'].iloc[i],  # Use the index directly
+                    'interval': interval
                 })
                 
   
@@ -377,13 +340,16 @@ def plot_indicators(df, indicators, fig, symbol_index, colors):
 
 def plot_candlestick_chart(df, fig, symbol_index, colors):
     """Mum grafiğini çizer ve grafik üzerine ekler."""
+    import plotly.graph_objs as go
+
+    symbol = df['symbol'].iloc[0]
     fig.add_trace(go.Candlestick(
         x=df.index,
         open=df['open'],
         high=df['high'],
         low=df['low'],
         close=df['close'],
-        name=f'{df.symbol[0]} Candlestick',
+        name=f'{symbol} Candlestick',
         increasing=dict(line=dict(color='green')),
         decreasing=dict(line=dict(color='red'))
         
@@ -403,25 +369,20 @@ selected_symbols = st.multiselect("Select the symbols:", symbols, default=symbol
 start_date = st.date_input("Enter the start date:", datetime(2024, 7, 27))
 end_date = st.date_input("Enter the end date:", datetime(2024, 7, 28))
 
-# Zaman dilimi seçenekleri
-intervals = {
-    "1 minute": mt5.TIMEFRAME_M1,
-    "5 minutes": mt5.TIMEFRAME_M5,
-    "15 minutes": mt5.TIMEFRAME_M15,
-    "30 minutes": mt5.TIMEFRAME_M30,
-    "1 hour": mt5.TIMEFRAME_H1,
-    "4 hours": mt5.TIMEFRAME_H4,
-    "1 day": mt5.TIMEFRAME_D1
-}
-
-interval_option = st.selectbox("Select the interval:", list(intervals.keys()))
-timeframe = intervals[interval_option]
+# Zaman dilimi seçenekleri (MT5 sabitleri bağlantı kurulunca çözülür)
+interval_option = st.selectbox("Select the interval:", list(TIMEFRAMES.keys()))
 
 # İndikatör seçimleri
 indicators = st.multiselect("Select the indicators to display:", [
     "MA20", "MA50", "MACD12", "MACD26", "RSI", "SMA30", "SMA50", "EMA12", "EMA26", "WMA14", "WMA30"], 
     default=["SMA30", "SMA50"])
 
+# Birden fazla sembol seçildiğinde çapraz sembol analizi için pencere uzunluğu
+correlation_window = st.slider("Correlation window (bars):", 20, 1000, 100) if len(selected_symbols) > 1 else None
+
+# Barları tiklerden oluşturursa upvolume/downvolume gerçek alış/satış hacmini gösterir
+use_ticks = st.checkbox("Build bars from ticks (real up/down volume)", value=False)
+
 # Renk paleti tanımla
 colors = [
     'blue', 'green', 'red', 'cyan', 'magenta', 'yellow', 'purple', 'orange', 'brown',
@@ -434,30 +395,102 @@ def get_next_color(colors, index):
     else:
         return colors[index % len(colors)]
 
-if st.button("Fetch Data"):
-    fig = go.Figure()
-    crossover_dates = []  # Crossover tarihlerini saklamak için bir liste
+# Uzun aralıkları parçalara bölüp kuyruğa ekle; işleri "python fetch_jobs.py work" çalıştıran worker'lar tamamlar
+if st.button("Queue Backfill"):
+    from fetch_jobs import enqueue_backfill, load_progress
 
-    for symbol_index, symbol in enumerate(selected_symbols):
+    added = enqueue_backfill(
+        selected_symbols, interval_option,
+        datetime.combine(start_date, datetime.min.time()),
+        datetime.combine(end_date, datetime.min.time())
+    )
+    st.success(f"{added} iş kuyruğa eklendi")
+    st.dataframe(load_progress())
+
+# DB'deki uzun geçmişte kesişimleri PostgreSQL içinde bul; barlar istemciye taşınmaz
+if st.button("Scan DB History (SQL pushdown)"):
+    import plotly.graph_objs as go
+    from pushdown import CROSSOVER_PAIRS, find_crossovers_sql, load_series_sql, to_crossover_records
+
+    pairs = [pair for pair, (fast, slow) in CROSSOVER_PAIRS.items()
+             if fast.replace('_', '') in indicators and slow.replace('_', '') in indicators]
+    columns = sorted({column for pair in pairs for column in CROSSOVER_PAIRS[pair]})
+    if not pairs:
+        st.warning("SQL pushdown MA20/MA50, SMA30/SMA50 veya WMA14/WMA30 çiftlerinden birini gerektirir")
+    else:
         utc_from = datetime.combine(start_date, datetime.min.time())
         utc_to = datetime.combine(end_date, datetime.min.time())
+        fig = go.Figure()
+        for symbol_index, symbol in enumerate(selected_symbols):
+            series = load_series_sql(symbol, interval_option, columns, utc_from, utc_to)
+            crossovers = find_crossovers_sql(symbol, interval_option, utc_from, utc_to, tuple(pairs))
+            fig.add_trace(go.Scatter(x=series.index, y=series['close'], mode='lines', name=f'{symbol} Close',
+                line=dict(color=get_next_color(colors, symbol_index))))
+            for column_index, column in enumerate(columns):
+                fig.add_trace(go.Scatter(x=series.index, y=series[column.lower()], mode='lines',
+                    name=f'{symbol} {column.replace("_", " ")}',
+                    line=dict(color=get_next_color(colors, symbol_index + column_index + 1))))
+            fig.add_trace(go.Scatter(x=crossovers.index, y=crossovers['price'], mode='markers',
+                marker=dict(symbol='x', color='black', size=8), name=f'{symbol} Crossovers'))
+            st.write(f"**{symbol}**: {len(crossovers)} kesişim")
+            st.dataframe(crossovers)
+            insert_crossover_dates(to_crossover_records(crossovers, symbol, interval_option))
+        st.plotly_chart(fig)
+
+if st.button("Fetch Data"):
+    import plotly.graph_objs as go
+    from coalesce import mt5_rates, coalescing_stats
+    from correlation import analyze
+    from indicator_store import update_indicators
+    from pipeline import FetchPipeline
+    from session_calendar import get_session_index, find_gaps
+    from ticks import DEFAULT_DIGITS, save_ticks, tick_interval, ticks_to_dataframe
+
+    # Süreç boyunca açık kalan MT5 bağlantısını al; koptuysa yeniden bağlanılır
+    try:
+        mt5 = get_mt5()
+    except ConnectionError as e:
+        st.error(str(e))
+        st.stop()
+    timeframe = getattr(mt5, TIMEFRAMES[interval_option])
 
-        rates = mt5.copy_rates_range(symbol, timeframe, utc_from, utc_to)
+    fig = go.Figure()
+    crossover_dates = []  # Crossover tarihlerini saklamak için bir liste
+
+    utc_from = datetime.combine(start_date, datetime.min.time())
+    utc_to = datetime.combine(end_date, datetime.min.time())
+
+    # Çekme, indikatör hesabı ve DB yazımı örtüşerek çalışır
+    if use_ticks:
+        def store_ticks(ticks, symbol, interval):
+            """Çekilen tikleri mt5_tick_blocks'a yazıp barlara çevirir."""
+            info = mt5.symbol_info(symbol)
+            save_ticks(symbol, ticks, utc_from, utc_to, info.digits if info is not None else DEFAULT_DIGITS)
+            return ticks_to_dataframe(ticks, symbol, interval)
+
+        # Tik kuralı barları MT5 barlarından ayrı bir interval etiketiyle saklanır
+        pipeline = FetchPipeline(
+            fetch=lambda symbol: mt5.copy_ticks_range(symbol, utc_from, utc_to, mt5.COPY_TICKS_ALL),
+            interval=tick_interval(interval_option),
+            transform=store_ticks
+        )
+    else:
+        pipeline = FetchPipeline(
+            fetch=lambda symbol: mt5_rates.get(mt5.copy_rates_range, symbol, timeframe, utc_from, utc_to),
+            interval=interval_option
+        )
 
-        if rates is None or len(rates) == 0:
+    for symbol_index, symbol, df in pipeline.run(selected_symbols):
+        if df is None:
             st.error(f"No data found for {symbol} with interval {interval_option}")
             continue
 
-        df = pd.DataFrame(rates)
-        df['time'] = pd.to_datetime(df['time'], unit='s')
-        df.set_index('time', inplace=True)
-        df = df[['open', 'high', 'low', 'close', 'tick_volume']]
-        df.rename(columns={'tick_volume': 'upvolume'}, inplace=True)
-        df['downvolume'] = df['upvolume'] - df['upvolume'].mean()
-        df['symbol'] = symbol
-        df['interval'] = interval_option
-
-        save_to_postgresql(df, interval_option, symbol, start_date, end_date)
+        # Seans içinde olup verisi gelmeyen barları bildir
+        calendar = get_session_index(symbol, interval_option, utc_from, utc_to)
+        gaps = find_gaps(df.index, calendar)
+        if gaps:
+            missing_bars = sum(count for _, _, count in gaps)
+            st.warning(f"{symbol} için {len(gaps)} veri boşluğu bulundu ({missing_bars} eksik bar), ilki: {gaps[0][0]} - {gaps[0][1]}")
 
         # Mum grafiğini çiz
         plot_candlestick_chart(df, fig, symbol_index, colors)
@@ -465,6 +498,20 @@ if st.button("Fetch Data"):
         # İndikatörleri hesapla ve grafiğe ekle
         crossover_dates.extend(plot_indicators(df, indicators, fig, symbol_index, colors))
 
+    for result in pipeline.store_results:
+        if result['existing']:
+            st.error(f"DB'de {result['symbol']} sembolü, {pipeline.interval} intervali ve {start_date} - {end_date} tarih aralığı için veri bulunuyor")
+        else:
+            st.success(f"DB'de {result['symbol']} sembolü, {pipeline.interval} intervali ve {start_date} - {end_date} tarih aralığı için veri bulunmuyor")
+    st.caption(pipeline.report())
+
+    # Gerçekten eklenen barlar için saklanan indikatörleri güncelle; geçmişe eklenen barlarda
+    # yalnızca etkilenen aralık yeniden hesaplanır
+    for result in pipeline.store_results:
+        if result['inserted'] is not None:
+            first, last = result['inserted']
+            update_indicators(result['symbol'], pipeline.interval, since=first, until=last)
+
     # Tüm grafiği göster
     st.plotly_chart(fig)
     
@@ -480,8 +527,46 @@ if st.button("Fetch Data"):
     st.subheader("Data from PostgreSQL")
     for symbol in selected_symbols:
         st.write(f"**{symbol}**")
-        df_from_db = load_from_postgresql(symbol, interval_option)  
+        df_from_db = load_from_postgresql(symbol, pipeline.interval)  
         st.dataframe(df_from_db)
 
-# Programın sonu
-mt5.shutdown()
+    # Seçilen semboller arasında kayan korelasyon, beta, spread z-skoru ve eşbütünleşme
+    if correlation_window:
+        st.subheader("Cross-Symbol Analytics")
+        try:
+            analytics = analyze(tuple(selected_symbols), interval_option, utc_from, utc_to, correlation_window)
+        except ValueError as e:
+            # Seçilen aralıkta pencereyi dolduracak kadar ortak bar yok
+            st.warning(f"Cross-symbol analytics skipped: {e}")
+            analytics = {'summary': []}
+        if len(analytics['summary']):
+            st.dataframe(analytics['summary'])
+
+            fig_heatmap = go.Figure(go.Heatmap(
+                z=analytics['rolling_correlation'].values,
+                x=analytics['rolling_correlation'].columns,
+                y=analytics['rolling_correlation'].index,
+                zmin=-1, zmax=1, colorscale='RdBu'
+            ))
+            fig_heatmap.update_layout(title=f"Correlation (last {correlation_window} bars)")
+            st.plotly_chart(fig_heatmap)
+
+            fig_pairs = go.Figure()
+            for pair_index, (pair, series) in enumerate(analytics['series'].items()):
+                fig_pairs.add_trace(go.Scatter(x=series.index, y=series['correlation'], mode='lines',
+                    name=f'{pair} Correlation', line=dict(color=get_next_color(colors, pair_index))))
+                fig_pairs.add_trace(go.Scatter(x=series.index, y=series['zscore'], mode='lines',
+                    name=f'{pair} Spread Z-Score', line=dict(color=get_next_color(colors, pair_index), dash='dot'),
+                    yaxis='y2'))
+            fig_pairs.update_layout(yaxis=dict(title='Correlation'),
+                yaxis2=dict(title='Z-Score', overlaying='y', side='right'))
+            st.plotly_chart(fig_pairs)
+
+    # Oturumlar arası birleştirilen ve gerçekten gönderilen istek sayıları
+    st.subheader("Request Coalescing")
+    st.dataframe(coalescing_stats())
+
+# Yeniden çalıştırma süresi; MT5 bağlantısı burada kapatılmaz, süreç sonunda MT5Session kapatır
+rerun_times = st.session_state.setdefault('rerun_times', [])
+rerun_times.append(perf_counter() - rerun_started)
+st.caption(f"Rerun: {rerun_times[-1] * 1000:.0f} ms (median of {len(rerun_times)}: {np.median(rerun_times) * 1000:.0f} ms)")
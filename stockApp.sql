@@ -25,3 +25,28 @@
 -- ADD CONSTRAINT crossover_dates_tb_pkey PRIMARY KEY (date, symbol);
 
 
+
+-- CREATE TABLE mt5_indicators (
+--     time TIMESTAMP NOT NULL,
+--     symbol VARCHAR(10) NOT NULL,
+--     interval VARCHAR(20) NOT NULL,
+--     ma_20 FLOAT, ma_50 FLOAT, sma_30 FLOAT, sma_50 FLOAT,
+--     ema_12 FLOAT, ema_26 FLOAT, wma_14 FLOAT, wma_30 FLOAT,
+--     macd FLOAT, signal_line FLOAT, rsi FLOAT,
+--     PRIMARY KEY (time, symbol, interval)
+-- );
+
+-- SELECT * FROM public.mt5_indicators
+
+-- Veri çekme iş kuyruğu: tablo ve mt5_fetch_progress görünümü fetch_jobs.py içinde oluşturulur
+-- SELECT * FROM mt5_fetch_progress
+
+-- SELECT * FROM mt5_fetch_jobs WHERE status = 'failed'
+
+-- UPDATE mt5_fetch_jobs SET status = 'pending', attempts = 0 WHERE status = 'failed';
+
+-- Sıkıştırılmış günlük tik blokları: tablo ticks.py içinde oluşturulur
+-- SELECT symbol, day, tick_count, octet_length(bid) + octet_length(time_msc) AS bytes FROM mt5_tick_blocks
+
+-- Okuma servisinin ETag sayaçları: tablo ve tetikleyiciler db.py (ensure_data_versions) içinde oluşturulur
+-- SELECT * FROM mt5_data_versions ORDER BY updated_at DESC
@@ -0,0 +1,57 @@
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+import db
+
+AppTest = pytest.importorskip("streamlit.testing.v1").AppTest
+
+APP = Path(__file__).resolve().parent.parent / "stockApp.py"
+
+
+@pytest.fixture
+def app(postgres, monkeypatch):
+    monkeypatch.setenv("MT5_BACKEND", "sim")
+    conn = db.get_db_connection()
+    conn.cursor().execute("""
+        CREATE TABLE crossover_dates_tb (
+            symbol VARCHAR(10), date TIMESTAMP, intersecting_indicators VARCHAR(20),
+            signal VARCHAR(10), price FLOAT, interval VARCHAR(20),
+            PRIMARY KEY (date, symbol)
+        )
+    """)
+    conn.commit()
+    conn.close()
+    app = AppTest.from_file(str(APP), default_timeout=120)
+    app.session_state["symbols"] = ["XAUUSD", "EURUSD"]
+    app.run()
+    assert not app.exception
+    return app
+
+
+def _click(app, label):
+    next(button for button in app.button if button.label == label).click()
+    app.run()
+    assert not app.exception, app.exception
+
+
+def test_fetch_data_stores_bars_and_signals(app):
+    app.multiselect[1].set_value(["MA20", "MA50", "MACD12", "MACD26", "RSI", "SMA30", "SMA50",
+                                  "EMA12", "EMA26", "WMA14", "WMA30"])
+    app.date_input[0].set_value(date(2024, 7, 29))
+    app.date_input[1].set_value(date(2024, 7, 31))
+    app.run()
+    _click(app, "Fetch Data")
+    assert not app.error and len(app.success) == 2
+
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT count(DISTINCT symbol) FROM mt5_db")
+    assert cursor.fetchone() == (2,)
+    cursor.execute("SELECT count(*) FROM crossover_dates_tb")
+    assert cursor.fetchone()[0] > 0
+    conn.close()
+
+    # SQL pushdown taraması Fetch Data'nın sakladığı barları okur
+    _click(app, "Scan DB History (SQL pushdown)")
@@ -0,0 +1,45 @@
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import db
+from bulk_io import BAR_COLUMNS, read_bars
+
+START = datetime(2024, 7, 1)
+
+
+def _insert_bars(rows):
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    cursor.executemany("""
+        INSERT INTO mt5_db (time, open, high, low, close, upvolume, downvolume, symbol, interval)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, 'XAUUSD', '1 minute')
+    """, rows)
+    conn.commit()
+    conn.close()
+
+
+def test_integer_and_null_columns(postgres):
+    # upvolume INTEGER; NULL değerler NaN olarak okunmalı
+    _insert_bars([
+        (START, 1.0, 2.0, 0.5, 1.5, 10, 2.5),
+        (START + timedelta(minutes=1), 1.5, 2.5, 1.0, 2.0, None, None),
+        (START + timedelta(minutes=2), 2.0, 3.0, 1.5, 2.5, 7, 0.0),
+    ])
+    binary = read_bars('XAUUSD', '1 minute')
+    csv = read_bars('XAUUSD', '1 minute', binary=False)
+
+    assert len(binary) == 3
+    assert binary['upvolume'].iloc[0] == 10
+    assert math.isnan(binary['upvolume'].iloc[1])
+    assert math.isnan(binary['downvolume'].iloc[1])
+    assert (binary.index == csv.index).all()
+    for column in BAR_COLUMNS:
+        np.testing.assert_array_equal(binary[column].to_numpy(), csv[column].to_numpy())
+
+
+def test_range_end_is_exclusive(postgres):
+    _insert_bars([(START + timedelta(minutes=i), 1.0, 1.0, 1.0, 1.0, i, 0.0) for i in range(5)])
+    df = read_bars('XAUUSD', '1 minute', START + timedelta(minutes=1), START + timedelta(minutes=3))
+    assert list(df['upvolume']) == [1.0, 2.0]
@@ -0,0 +1,165 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from coalesce import RangeCoalescer, SingleFlight, WriteGenerations, _epoch
+
+M1 = 1
+START = datetime(2024, 7, 1)
+
+
+class RecordingFetch:
+    """Her dakika için bir bar döndüren, çağrıları kaydeden copy_rates_range yerine geçen."""
+
+    def __init__(self, release=None, error=None):
+        self.calls = []
+        self.release = release
+        self.error = error
+
+    def __call__(self, symbol, timeframe, start, end):
+        self.calls.append((start, end))
+        if self.release is not None:
+            self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        first = -(-_epoch(start) // 60) * 60
+        rates = np.zeros(len(range(first, _epoch(end) + 1, 60)), dtype=[('time', '<i8'), ('close', '<f8')])
+        rates['time'] = np.arange(first, _epoch(end) + 1, 60)
+        return rates
+
+
+def _minutes(count):
+    return START + timedelta(minutes=count)
+
+
+def _run_threads(target, count):
+    results, threads = [None] * count, []
+    for index in range(count):
+        def run(index=index):
+            try:
+                results[index] = target()
+            except Exception as e:
+                results[index] = e
+        threads.append(threading.Thread(target=run))
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def _join(threads):
+    for thread in threads:
+        thread.join(5)
+        assert not thread.is_alive()
+
+
+def test_single_flight_dedups_concurrent_calls():
+    flight, release, calls = SingleFlight("test"), threading.Event(), []
+
+    def load():
+        calls.append(1)
+        release.wait(5)
+        return "bars"
+
+    threads, results = _run_threads(lambda: flight.do("key", load), 8)
+    time.sleep(0.1)
+    release.set()
+    _join(threads)
+    assert results == ["bars"] * 8 and len(calls) == 1
+    assert flight.counters == {'issued': 1, 'coalesced': 7}
+
+
+def test_single_flight_propagates_errors():
+    flight, release = SingleFlight("test"), threading.Event()
+
+    def load():
+        release.wait(5)
+        raise RuntimeError("db down")
+
+    threads, results = _run_threads(lambda: flight.do("key", load), 4)
+    time.sleep(0.1)
+    release.set()
+    _join(threads)
+    assert all(isinstance(result, RuntimeError) for result in results)
+    # Hata paylaşılır ama saklanmaz; sonraki çağrı yeniden çalışır
+    assert flight.do("key", lambda: "bars") == "bars"
+
+
+def test_write_generation_starts_new_flight():
+    flight, writes, release = SingleFlight("test"), WriteGenerations(), threading.Event()
+
+    def load(result):
+        release.wait(5)
+        return result
+
+    before, _ = _run_threads(lambda: flight.do(("XAUUSD", writes.get("XAUUSD", "1 minute")), load, "old"), 1)
+    time.sleep(0.1)
+    writes.bump("XAUUSD", "1 minute")
+    # Yazmadan sonra gelen okuma, yazmadan önce başlamış okumaya katılmaz
+    after, results = _run_threads(lambda: flight.do(("XAUUSD", writes.get("XAUUSD", "1 minute")), load, "new"), 1)
+    release.set()
+    _join(before + after)
+    assert results == ["new"] and flight.counters['issued'] == 2
+
+
+def test_range_coalescer_fetches_only_gaps():
+    coalescer, fetch = RangeCoalescer("test"), RecordingFetch()
+    first = coalescer.get(fetch, "XAUUSD", M1, _minutes(0), _minutes(100))
+    second = coalescer.get(fetch, "XAUUSD", M1, _minutes(50), _minutes(150))
+
+    assert fetch.calls == [(_minutes(0), _minutes(100)), (_minutes(100), _minutes(150))]
+    assert len(first) == 101 and len(second) == 101
+    np.testing.assert_array_equal(second['time'], np.arange(_epoch(_minutes(50)), _epoch(_minutes(150)) + 1, 60))
+    assert coalescer.get(fetch, "XAUUSD", M1, _minutes(10), _minutes(140)) is not None
+    assert len(fetch.calls) == 2 and coalescer.counters['cache_hits'] == 1
+
+
+def test_range_coalescer_shares_in_flight_fetch():
+    coalescer, release = RangeCoalescer("test"), threading.Event()
+    fetch = RecordingFetch(release=release)
+    threads, results = _run_threads(lambda: coalescer.get(fetch, "XAUUSD", M1, _minutes(0), _minutes(60)), 6)
+    time.sleep(0.1)
+    release.set()
+    _join(threads)
+    assert len(fetch.calls) == 1
+    assert all(len(result) == 61 for result in results)
+
+
+def test_range_coalescer_ttl_expiry():
+    coalescer, fetch = RangeCoalescer("test", ttl=0.05), RecordingFetch()
+    coalescer.get(fetch, "XAUUSD", M1, _minutes(0), _minutes(60))
+    coalescer.get(fetch, "XAUUSD", M1, _minutes(0), _minutes(60))
+    assert len(fetch.calls) == 1
+    time.sleep(0.1)
+    coalescer.get(fetch, "XAUUSD", M1, _minutes(0), _minutes(60))
+    assert len(fetch.calls) == 2
+
+
+def test_range_coalescer_propagates_errors():
+    coalescer, release = RangeCoalescer("test"), threading.Event()
+    fetch = RecordingFetch(release=release, error=ConnectionError("terminal gone"))
+    threads, results = _run_threads(lambda: coalescer.get(fetch, "XAUUSD", M1, _minutes(0), _minutes(60)), 4)
+    time.sleep(0.1)
+    release.set()
+    _join(threads)
+    assert len(fetch.calls) == 1
+    assert all(isinstance(result, ConnectionError) for result in results)
+
+    # Başarısız aralık önbellekte kalmaz
+    fetch.error = None
+    assert len(coalescer.get(fetch, "XAUUSD", M1, _minutes(0), _minutes(60))) == 61
+    assert len(fetch.calls) == 2
+
+
+def test_range_coalescer_does_not_cache_open_bar():
+    coalescer, fetch = RangeCoalescer("test"), RecordingFetch()
+    now = datetime.now(timezone.utc).replace(tzinfo=None, second=0, microsecond=0)
+    start = now - timedelta(days=2)
+    coalescer.get(fetch, "XAUUSD", M1, start, now)
+    coalescer.get(fetch, "XAUUSD", M1, start, now)
+
+    # Eski kısım önbellekten gelir, henüz oluşan bar olabilecek son kısım yeniden çekilir
+    assert len(fetch.calls) == 2
+    refetched_start, refetched_end = fetch.calls[1]
+    assert start < refetched_start < now and refetched_end == now
@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import db
+from correlation import analyze, analyze_prices, synthetic_log_prices
+
+
+@pytest.mark.parametrize("rows", [0, 50, 100])
+def test_window_longer_than_data(rows):
+    with pytest.raises(ValueError):
+        analyze_prices(synthetic_log_prices(2, rows), 100)
+
+
+def test_window_fills_exactly():
+    result = analyze_prices(synthetic_log_prices(3, 101), 100)
+    assert len(result['summary']) == 3
+    assert np.isfinite(result['summary']['rolling_corr']).all()
+
+
+def _insert_hours(hours):
+    rng = np.random.default_rng(len(hours))
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    for symbol in ['EURUSD', 'GBPUSD']:
+        cursor.executemany("""
+            INSERT INTO mt5_db (time, open, high, low, close, upvolume, downvolume, symbol, interval)
+            VALUES (%s, %s, %s, %s, %s, 1, 0, %s, '1 hour')
+        """, [(datetime(2024, 7, 2) + timedelta(hours=hour), *[1.1 + rng.normal(0, 1e-3)] * 4, symbol)
+              for hour in hours])
+    conn.commit()
+    conn.close()
+
+
+def test_cache_follows_stored_bars(postgres):
+    symbols, start, end = ('EURUSD', 'GBPUSD'), datetime(2024, 7, 2), datetime(2024, 7, 3)
+    _insert_hours(range(12, 24))
+    first = analyze(symbols, '1 hour', start, end, 5)
+    assert analyze(symbols, '1 hour', start, end, 5) is first
+
+    # Aralığın başına geriye dönük eklenen barlar önbelleği geçersiz kılar
+    _insert_hours(range(0, 12))
+    second = analyze(symbols, '1 hour', start, end, 5)
+    assert second is not first
+    series = next(iter(second['series'].values()))
+    assert series.index[0] == pd.Timestamp(2024, 7, 2, 1)
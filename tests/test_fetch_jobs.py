@@ -0,0 +1,179 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pytest
+
+import db
+import fetch_jobs
+from fetch_jobs import (
+    MAX_ATTEMPTS, LeaseHeartbeat, chunks_with_gaps, claim_job, complete_job, enqueue_backfill,
+    ensure_job_tables, fail_job, fetch_chunk, run_worker, split_range
+)
+from mt5_sim import SimulatedMT5
+from session_calendar import find_gaps, get_session_index
+
+# Pazartesi-Cuma; XAUUSD günlük bir saatlik ara dışında işlem görür
+START = datetime(2024, 7, 1)
+
+
+@pytest.fixture
+def conn(postgres):
+    conn = db.get_db_connection()
+    ensure_job_tables(conn)
+    yield conn
+    conn.close()
+
+
+def _query(conn, sql, params=()):
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    rows = cursor.fetchall() if cursor.description else None
+    conn.commit()
+    cursor.close()
+    return rows
+
+
+def _statuses(conn):
+    return dict(_query(conn, "SELECT chunk_start, status FROM mt5_fetch_jobs ORDER BY chunk_start"))
+
+
+def _connected_sim():
+    mt5 = SimulatedMT5()
+    mt5.initialize()
+    return mt5
+
+
+def test_backfill_plans_only_chunks_with_gaps():
+    calendar = get_session_index("EURUSD", "1 hour", "2024-07-01", "2024-07-15")
+    chunks = split_range(pd.Timestamp("2024-07-01"), pd.Timestamp("2024-07-15"))
+    # 3 Temmuz eksik, 10 Temmuz'da tek bar eksik; hafta sonu parçaları zaten beklenmiyor
+    stored = calendar[(calendar.normalize() != "2024-07-03") & (calendar != "2024-07-10 12:00")]
+    planned = chunks_with_gaps(chunks, find_gaps(stored, calendar))
+    assert [chunk_start.day for chunk_start, _ in planned] == [3, 10]
+    assert chunks_with_gaps(chunks, find_gaps(calendar, calendar)) == []
+
+
+
+def test_claim_and_complete(conn):
+    assert enqueue_backfill(["XAUUSD"], "1 hour", START, START + timedelta(days=2)) == 2
+    job = claim_job(conn, "w1")
+    assert job['chunk_start'] == START and job['attempts'] == 1 and job['worker'] == "w1"
+
+    df = fetch_chunk(_connected_sim(), job)
+    assert complete_job(conn, job, df)
+    assert _statuses(conn)[START] == 'done'
+    assert _query(conn, "SELECT count(*) FROM mt5_db")[0][0] == len(df)
+
+    # Bitmiş parça yeniden kuyruğa eklenmez
+    assert enqueue_backfill(["XAUUSD"], "1 hour", START, START + timedelta(days=2)) == 0
+
+
+def test_fail_with_backoff(conn):
+    enqueue_backfill(["XAUUSD"], "1 hour", START, START + timedelta(days=1))
+    job = claim_job(conn, "w1")
+    fail_job(conn, job, RuntimeError("timeout"))
+
+    (status, error, delay), = _query(conn, """
+        SELECT status, last_error, extract(epoch FROM next_attempt_at - now()) FROM mt5_fetch_jobs
+    """)
+    assert status == 'pending' and error == "timeout"
+    assert delay > fetch_jobs.BACKOFF_SECONDS / 2
+    assert claim_job(conn, "w1") is None
+
+    # Son deneme de başarısız olursa iş kalıcı olarak 'failed' olur
+    _query(conn, "UPDATE mt5_fetch_jobs SET attempts = %s, next_attempt_at = now()", (MAX_ATTEMPTS - 1,))
+    job = claim_job(conn, "w1")
+    assert job['attempts'] == MAX_ATTEMPTS
+    fail_job(conn, job, RuntimeError("timeout"))
+    assert _statuses(conn)[START] == 'failed'
+
+
+def test_lease_reclaim(conn):
+    enqueue_backfill(["XAUUSD"], "1 hour", START, START + timedelta(days=1))
+    stale = claim_job(conn, "w1")
+    expire = "UPDATE mt5_fetch_jobs SET updated_at = now() - %s * interval '1 second'"
+    _query(conn, expire, (fetch_jobs.LEASE_SECONDS + 1,))
+
+    job = claim_job(conn, "w2")
+    assert job['id'] == stale['id'] and job['attempts'] == 2
+
+    # Süresi dolan worker ne tamamlayabilir ne de hata yazabilir
+    df = fetch_chunk(_connected_sim(), stale)
+    assert not complete_job(conn, stale, df)
+    fail_job(conn, stale, RuntimeError("late"))
+    assert _query(conn, "SELECT status, worker, last_error FROM mt5_fetch_jobs") == [('running', 'w2', None)]
+    assert _query(conn, "SELECT count(*) FROM mt5_db")[0][0] == 0
+
+    # Deneme hakkı bitmiş işin süresi dolarsa yeniden alınmaz
+    _query(conn, "UPDATE mt5_fetch_jobs SET attempts = %s", (MAX_ATTEMPTS,))
+    _query(conn, expire, (fetch_jobs.LEASE_SECONDS + 1,))
+    assert claim_job(conn, "w3") is None
+    assert _query(conn, "SELECT status, last_error FROM mt5_fetch_jobs") == [('failed', 'lease expired')]
+
+
+def test_future_chunk_stays_pending(conn):
+    today = datetime.now(timezone.utc).replace(tzinfo=None, hour=0, minute=0, second=0, microsecond=0)
+    _query(conn, """
+        INSERT INTO mt5_fetch_jobs (symbol, interval, chunk_start, chunk_end)
+        VALUES ('XAUUSD', '1 hour', %s, %s)
+    """, (today, today + timedelta(days=1)))
+    job = claim_job(conn, "w1")
+    df = fetch_chunk(_connected_sim(), job)
+    assert complete_job(conn, job, df)
+
+    (status, attempts, wait), = _query(conn, """
+        SELECT status, attempts, extract(epoch FROM next_attempt_at - now()) FROM mt5_fetch_jobs
+    """)
+    assert status == 'pending' and attempts == 0 and wait > 0
+    assert claim_job(conn, "w1") is None
+
+
+def test_concurrent_workers(conn):
+    added = enqueue_backfill(["XAUUSD", "EURUSD"], "1 hour", START, START + timedelta(days=5))
+    processed = []
+
+    def work(worker_id):
+        processed.append(run_worker(worker_id, mt5=SimulatedMT5()))
+
+    threads = [threading.Thread(target=work, args=(f"w{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=60)
+
+    assert sum(processed) == added == 10
+    assert set(_statuses(conn).values()) == {'done'}
+    (rows, bars), = _query(conn, """
+        SELECT (SELECT sum(rows) FROM mt5_fetch_jobs), (SELECT count(*) FROM mt5_db)
+    """)
+    assert rows == bars > 0
+    indicators, = _query(conn, "SELECT count(*) FROM mt5_indicators")
+    assert indicators[0] == bars
+
+
+def test_heartbeat_keeps_lease(conn, monkeypatch):
+    monkeypatch.setattr(fetch_jobs, "HEARTBEAT_SECONDS", 0.05)
+    enqueue_backfill(["XAUUSD"], "1 hour", START, START + timedelta(days=1))
+    job = claim_job(conn, "w1")
+    expire = "UPDATE mt5_fetch_jobs SET updated_at = now() - %s * interval '1 second'"
+
+    # Uzun süren çekme boyunca süre dolmuş gibi görünse de worker işi yeniler
+    with LeaseHeartbeat(job):
+        _query(conn, expire, (fetch_jobs.LEASE_SECONDS + 1,))
+        time.sleep(0.3)
+        assert claim_job(conn, "w2") is None
+    assert complete_job(conn, job, fetch_chunk(_connected_sim(), job))
+
+
+def test_indicator_failure_does_not_stop_worker(conn, monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError("indicators down")
+
+    monkeypatch.setattr(fetch_jobs, "update_indicators", broken)
+    enqueue_backfill(["XAUUSD"], "1 hour", START, START + timedelta(days=2))
+    assert run_worker("w1", mt5=SimulatedMT5()) == 2
+    assert _query(conn, "SELECT status, last_error FROM mt5_fetch_jobs") == [
+        ('done', "indicators: indicators down")
+    ] * 2
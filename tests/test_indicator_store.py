@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import db
+from indicator_store import get_indicators, load_indicators, update_indicators
+from indicators import INDICATOR_COLUMNS, SETTLE_BARS, compute_indicators
+
+START = datetime(2024, 7, 1)
+CLOSE = 2400 + np.cumsum(np.random.default_rng(7).normal(0, 0.5, 1000))
+
+
+def _insert_bars(positions):
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    cursor.executemany("""
+        INSERT INTO mt5_db (time, open, high, low, close, upvolume, downvolume, symbol, interval)
+        VALUES (%s, %s, %s, %s, %s, 1, 0, 'XAUUSD', '1 minute')
+    """, [(START + timedelta(minutes=int(i)), *[float(CLOSE[i])] * 4) for i in positions])
+    conn.commit()
+    conn.close()
+
+
+def _frame(positions):
+    times = [START + timedelta(minutes=int(i)) for i in positions]
+    return pd.DataFrame({'close': CLOSE[list(positions)]}, index=pd.DatetimeIndex(times))
+
+
+def _assert_matches_full_recompute(positions):
+    times = [START + timedelta(minutes=int(i)) for i in sorted(positions)]
+    close = pd.Series(CLOSE[sorted(positions)], index=times)
+    expected = compute_indicators(close)
+    stored = load_indicators('XAUUSD', '1 minute')
+    assert list(stored.index) == times
+    np.testing.assert_allclose(stored[INDICATOR_COLUMNS].to_numpy(dtype=float),
+                               expected[INDICATOR_COLUMNS].to_numpy(dtype=float), rtol=1e-9)
+
+
+def test_appended_bars_continue_from_last_row(postgres):
+    _insert_bars(range(100, 200))
+    assert update_indicators('XAUUSD', '1 minute') == 100
+    _insert_bars(range(200, 250))
+    assert update_indicators('XAUUSD', '1 minute') == 50
+    _assert_matches_full_recompute(range(100, 250))
+
+
+def test_backfilled_bars_rebuild_from_earliest_new_bar(postgres):
+    stored = list(range(100, 150)) + list(range(180, 250))
+    _insert_bars(stored)
+    update_indicators('XAUUSD', '1 minute')
+
+    # Saklanan aralığın içine ve öncesine bar eklenir
+    _insert_bars(range(150, 180))
+    update_indicators('XAUUSD', '1 minute', since=START + timedelta(minutes=150), until=START + timedelta(minutes=179))
+    _assert_matches_full_recompute(range(100, 250))
+
+    _insert_bars(range(0, 100))
+    update_indicators('XAUUSD', '1 minute', since=START, until=START + timedelta(minutes=99))
+    _assert_matches_full_recompute(range(0, 250))
+
+
+def test_backfill_rebuild_stops_after_settle_window(postgres):
+    positions = list(range(0, 20)) + list(range(40, 1000))
+    _insert_bars(positions)
+    update_indicators('XAUUSD', '1 minute')
+
+    _insert_bars(range(20, 40))
+    written = update_indicators('XAUUSD', '1 minute', since=START + timedelta(minutes=20),
+                                until=START + timedelta(minutes=39))
+    # Eklenen 20 bar ve sonrasındaki SETTLE_BARS bar; daha sonraki satırlara dokunulmaz
+    assert written == 20 + SETTLE_BARS
+    _assert_matches_full_recompute(range(1000))
+
+
+def test_get_indicators_continues_stored_history(postgres):
+    _insert_bars(range(0, 200))
+    update_indicators('XAUUSD', '1 minute')
+    assert get_indicators(_frame(range(150, 200)), 'XAUUSD', '1 minute')[1] == "db"
+
+    # Henüz saklanmamış barlar, saklanan değerlerle aynı sonucu verecek şekilde hesaplanır
+    values, source = get_indicators(_frame(range(200, 260)), 'XAUUSD', '1 minute')
+    assert source == "computed"
+    close = pd.Series(CLOSE[:260], index=[START + timedelta(minutes=i) for i in range(260)])
+    expected = compute_indicators(close).iloc[200:]
+    np.testing.assert_allclose(values[INDICATOR_COLUMNS].to_numpy(dtype=float),
+                               expected[INDICATOR_COLUMNS].to_numpy(dtype=float), rtol=1e-9)
@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from mt5_sim import SimulatedMT5
+
+START = datetime(2024, 7, 1, 2)
+END = datetime(2024, 7, 2, 2)
+
+
+@pytest.fixture
+def sim():
+    sim = SimulatedMT5()
+    sim.initialize()
+    return sim
+
+
+@pytest.mark.parametrize("tz", [timezone.utc, timezone(timedelta(hours=3))])
+def test_tz_aware_ranges_match_naive_utc(sim, tz):
+    def aware(value):
+        return value.replace(tzinfo=timezone.utc).astimezone(tz)
+
+    naive = sim.copy_rates_range("XAUUSD", sim.TIMEFRAME_H1, START, END)
+    assert len(naive) > 0
+    np.testing.assert_array_equal(sim.copy_rates_range("XAUUSD", sim.TIMEFRAME_H1, aware(START), aware(END)), naive)
+
+    hour = START + timedelta(hours=1)
+    naive_ticks = sim.copy_ticks_range("XAUUSD", START, hour, sim.COPY_TICKS_ALL)
+    assert len(naive_ticks) > 0
+    np.testing.assert_array_equal(
+        sim.copy_ticks_range("XAUUSD", aware(START), aware(hour), sim.COPY_TICKS_ALL), naive_ticks
+    )
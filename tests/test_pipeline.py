@@ -0,0 +1,104 @@
+import sys
+import threading
+import types
+from contextlib import asynccontextmanager
+
+import numpy as np
+import pytest
+
+from pipeline import FetchPipeline
+
+RATES_DTYPE = np.dtype([
+    ('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+    ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8')
+])
+
+
+def _rates(count=5):
+    rates = np.zeros(count, dtype=RATES_DTYPE)
+    rates['time'] = 1719792000 + np.arange(count) * 60
+    rates['close'] = rates['open'] = rates['high'] = rates['low'] = 2400.0
+    rates['tick_volume'] = 10
+    return rates
+
+
+def _fake_asyncpg(fail_write):
+    """executemany'si isteğe bağlı hata veren asyncpg yerine geçen modül."""
+    class Connection:
+        @asynccontextmanager
+        async def transaction(self):
+            yield
+
+        async def fetch(self, *args):
+            return []
+
+        async def executemany(self, *args):
+            if fail_write:
+                raise RuntimeError("yazma hatası")
+
+    class Pool:
+        @asynccontextmanager
+        async def acquire(self):
+            yield Connection()
+
+    @asynccontextmanager
+    async def create_pool(*args, **kwargs):
+        yield Pool()
+
+    module = types.ModuleType("asyncpg")
+    module.create_pool = create_pool
+    return module
+
+
+def _run_with_timeout(pipeline, symbols, timeout=10):
+    result = {}
+
+    def target():
+        try:
+            result['items'] = list(pipeline.run(symbols))
+        except Exception as e:
+            result['error'] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "FetchPipeline.run takıldı"
+    return result
+
+
+def test_store_results(monkeypatch):
+    monkeypatch.setitem(sys.modules, "asyncpg", _fake_asyncpg(fail_write=False))
+    pipeline = FetchPipeline(fetch=lambda symbol: _rates(), interval="1 minute", dsn="fake")
+    result = _run_with_timeout(pipeline, ["AAA", "BBB", "CCC"])
+    assert 'error' not in result
+    assert [symbol for _, symbol, _ in result['items']] == ["AAA", "BBB", "CCC"]
+    assert sorted(r['symbol'] for r in pipeline.store_results) == ["AAA", "BBB", "CCC"]
+    first, last = _rates()['time'][[0, -1]].astype('datetime64[s]').tolist()
+    assert all(r['existing'] == 0 and r['inserted'] == (first, last) for r in pipeline.store_results)
+
+
+def test_write_error_is_raised(monkeypatch):
+    monkeypatch.setitem(sys.modules, "asyncpg", _fake_asyncpg(fail_write=True))
+    pipeline = FetchPipeline(fetch=lambda symbol: _rates(), interval="1 minute", dsn="fake")
+    result = _run_with_timeout(pipeline, ["DDD", "EEE", "FFF", "GGG"])
+    assert isinstance(result.get('error'), RuntimeError)
+
+
+def test_pool_error_is_raised(monkeypatch):
+    module = types.ModuleType("asyncpg")
+
+    def create_pool(*args, **kwargs):
+        raise ConnectionError("bağlantı yok")
+
+    module.create_pool = create_pool
+    monkeypatch.setitem(sys.modules, "asyncpg", module)
+    pipeline = FetchPipeline(fetch=lambda symbol: _rates(), interval="1 minute", dsn="fake")
+    result = _run_with_timeout(pipeline, ["HHH", "III", "JJJ", "KKK"])
+    assert isinstance(result.get('error'), ConnectionError)
+
+
+def test_empty_fetch_yields_none(monkeypatch):
+    monkeypatch.setitem(sys.modules, "asyncpg", _fake_asyncpg(fail_write=False))
+    pipeline = FetchPipeline(fetch=lambda symbol: None, interval="1 minute", dsn="fake")
+    result = _run_with_timeout(pipeline, ["LLL"])
+    assert result['items'] == [(0, "LLL", None)]
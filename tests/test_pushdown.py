@@ -0,0 +1,50 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+import db
+from indicators import wma
+from pushdown import client_crossovers, find_crossovers_sql, load_series_sql
+
+ROWS = 20_000
+
+
+def _load_bars(rows):
+    close = 2000 + np.cumsum(np.random.default_rng(5).normal(0, 0.5, rows))
+    bars = pd.DataFrame({
+        'time': pd.date_range("2024-01-01", periods=rows, freq="1min"),
+        'open': close, 'high': close, 'low': close, 'close': close,
+        'upvolume': 1, 'downvolume': 0.0, 'symbol': 'XAUUSD', 'interval': '1 minute'
+    })
+    buffer = io.StringIO()
+    bars.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    conn = db.get_db_connection()
+    conn.cursor().copy_expert(
+        "COPY mt5_db (time, open, high, low, close, upvolume, downvolume, symbol, interval) FROM STDIN WITH CSV",
+        buffer
+    )
+    conn.commit()
+    conn.close()
+    return bars.set_index('time')
+
+
+def test_wma_matches_client_over_long_history(postgres):
+    bars = _load_bars(ROWS)
+    series = load_series_sql('XAUUSD', '1 minute', ['WMA_14', 'WMA_30'], max_points=ROWS)
+    assert len(series) == ROWS
+    for column, window in (('wma_14', 14), ('wma_30', 30)):
+        expected = wma(bars['close'], window).to_numpy()
+        np.testing.assert_allclose(series[column].to_numpy(dtype=float), expected, rtol=1e-12)
+
+
+def test_crossovers_match_client(postgres):
+    bars = _load_bars(ROWS)
+    pushed = find_crossovers_sql('XAUUSD', '1 minute')
+    client = client_crossovers(bars)
+    assert len(pushed) > 0
+
+    def rows(df):
+        return set(zip(df.index, df['intersecting_indicators'], df['signal']))
+    assert rows(pushed) == rows(client)
@@ -0,0 +1,152 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+
+import db
+import read_api
+from indicator_store import load_indicators, update_indicators
+
+START = datetime(2024, 7, 1)
+
+
+def _execute(sql, params=()):
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    rows = cursor.fetchall() if cursor.description else None
+    conn.commit()
+    conn.close()
+    return rows
+
+
+def _insert_bars(minutes):
+    for minute in minutes:
+        _execute("""
+            INSERT INTO mt5_db (time, open, high, low, close, upvolume, downvolume, symbol, interval)
+            VALUES (%s, 1, 1, 1, %s, 1, 0, 'XAUUSD', '1 minute')
+        """, (START + timedelta(minutes=minute), 2400.0 + minute % 7))
+
+
+@pytest.fixture
+def service(postgres, monkeypatch):
+    monkeypatch.setattr(read_api, "VERSION_TTL", 0.0)
+    service = read_api.ReadService(pool_size=2)
+    yield service
+    service.pool.closeall()
+
+
+def _etag(service, kind, start, end):
+    return service.describe(kind, "XAUUSD", "1 minute", start, end)[1]
+
+
+def test_etag_follows_writes_to_symbol(service):
+    _insert_bars(range(0, 60, 2))
+    early = (START, START + timedelta(minutes=30))
+    early_etag = _etag(service, "bars", *early)
+    assert _etag(service, "bars", *early) == early_etag
+
+    # Aralığın içine geriye dönük eklenen bar son zamanı değiştirmese de ETag'i değiştirir
+    _insert_bars([5])
+    assert _etag(service, "bars", *early) != early_etag
+
+    # Başka bir sembole yazmak ETag'i değiştirmez
+    early_etag = _etag(service, "bars", *early)
+    _execute("""
+        INSERT INTO mt5_db (time, open, high, low, close, upvolume, downvolume, symbol, interval)
+        VALUES (%s, 1, 1, 1, 1, 1, 0, 'EURUSD', '1 minute')
+    """, (START,))
+    assert _etag(service, "bars", *early) == early_etag
+
+
+def test_etag_changes_when_rows_are_rewritten(service):
+    _insert_bars(range(100))
+    update_indicators("XAUUSD", "1 minute")
+    etag = _etag(service, "indicators", None, None)
+
+    # Aynı satırlar silinip yeniden yazılınca son zaman ve satır sayısı aynı kalır
+    _execute("DELETE FROM mt5_indicators WHERE time >= %s", (START + timedelta(minutes=90),))
+    update_indicators("XAUUSD", "1 minute")
+    assert _etag(service, "indicators", None, None) != etag
+
+
+def test_etag_uses_endpoint_table(service):
+    _insert_bars(range(100))
+    bars_etag, indicators_etag = _etag(service, "bars", None, None), _etag(service, "indicators", None, None)
+
+    update_indicators("XAUUSD", "1 minute")
+    assert _etag(service, "bars", None, None) == bars_etag
+    assert _etag(service, "indicators", None, None) != indicators_etag
+
+    # Servisten sonra oluşturulan tablolar yeniden başlatmada izlenmeye başlar
+    _execute("""
+        CREATE TABLE crossover_dates_tb (
+            symbol VARCHAR(10), date TIMESTAMP, intersecting_indicators VARCHAR(20),
+            signal VARCHAR(10), price FLOAT, interval VARCHAR(20)
+        )
+    """)
+    restarted = read_api.ReadService(pool_size=1)
+    signals_etag = _etag(restarted, "signals", None, None)
+    _execute("INSERT INTO crossover_dates_tb VALUES ('XAUUSD', %s, 'MA20/MA50', 'Buy', 2400, '1 minute')", (START,))
+    assert _etag(restarted, "signals", None, None) != signals_etag
+    assert _etag(restarted, "bars", None, None) == bars_etag
+    restarted.pool.closeall()
+
+
+def test_read_path_does_not_create_tables(service):
+    service.describe("indicators", "XAUUSD", "1 minute")
+    assert _execute("SELECT to_regclass('mt5_indicators')") == [(None,)]
+
+
+def test_indicators_end_is_exclusive(service):
+    _insert_bars(range(10))
+    update_indicators("XAUUSD", "1 minute")
+    end = START + timedelta(minutes=5)
+    for df in (load_indicators("XAUUSD", "1 minute", START, end),
+               service.query("indicators", "XAUUSD", "1 minute", START, end),
+               service.query("bars", "XAUUSD", "1 minute", START, end)):
+        assert list(df.index) == [START + timedelta(minutes=minute) for minute in range(5)]
+
+
+def test_pool_waits_instead_of_failing(service):
+    _insert_bars(range(10))
+    # Havuzdan (2 bağlantı) fazla eşzamanlı istek PoolError yerine sıra bekler
+    with ThreadPoolExecutor(8) as executor:
+        frames = list(executor.map(lambda _: service.query("bars", "XAUUSD", "1 minute", None, None), range(32)))
+    assert all(len(df) == 10 for df in frames)
+
+
+@pytest.fixture
+def server(service):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), read_api.make_handler(service))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def _get(url, headers=None):
+    try:
+        with urlopen(Request(url, headers=headers or {})) as response:
+            return response.status, response.headers, response.read()
+    except HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def test_http_validates_range_and_varies_on_encoding(server):
+    _insert_bars(range(10))
+    status, _, body = _get(f"{server}/bars?symbol=XAUUSD&interval=1+minute&start=yesterdayish")
+    assert status == 400 and b"ISO" in body
+
+    url = f"{server}/bars?symbol=XAUUSD&interval=1+minute&start=2024-07-01T00:05:00Z"
+    status, headers, body = _get(url)
+    assert status == 200 and headers["Vary"] == "Accept-Encoding"
+    assert len(json.loads(body)['data']) == 5
+
+    status, headers, _ = _get(url, {"If-None-Match": headers["ETag"]})
+    assert status == 304 and headers["Vary"] == "Accept-Encoding"
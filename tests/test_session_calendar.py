@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from session_calendar import align_symbols, find_gaps, get_session_index
+
+
+def test_calendar_skips_weekend_and_break():
+    calendar = get_session_index("XAUUSD", "1 hour", "2024-07-05", "2024-07-09")
+    assert not (calendar.dayofweek >= 5).any()
+    # XAUUSD için 00:00-01:00 arası bar oluşmaz
+    assert not ((calendar.hour == 0) & (calendar.dayofweek < 5)).any()
+    assert calendar[0] == pd.Timestamp("2024-07-05 01:00")
+
+
+def test_calendar_bounds():
+    # Dışlayıcı bitiş takvimden ince çözünürlükte verilebilir
+    end = pd.Timestamp("2024-07-01 05:00") + pd.Timedelta(1, "ns")
+    calendar = get_session_index("EURUSD", "1 hour", "2024-07-01", end)
+    assert calendar[-1] == pd.Timestamp("2024-07-01 05:00") and len(calendar) == 6
+    assert len(get_session_index("EURUSD", "1 hour", "2024-07-01", "2024-07-01")) == 0
+    with pytest.raises(ValueError):
+        get_session_index("EURUSD", "1 hour", "2024-07-02", "2024-07-01")
+
+
+def test_find_gaps_reports_missing_runs():
+    calendar = get_session_index("EURUSD", "1 hour", "2024-07-01", "2024-07-02")
+    index = calendar.delete([3, 4, 5, 10])
+    assert find_gaps(index, calendar) == [
+        (calendar[3], calendar[5], 3),
+        (calendar[10], calendar[10], 1),
+    ]
+    assert find_gaps(calendar, calendar) == []
+
+
+def test_align_symbols_keeps_missing_bars_as_nan():
+    calendar = get_session_index("EURUSD", "1 day", "2024-07-01", "2024-07-13")
+    frames = {
+        "AAA": pd.DataFrame({'close': np.arange(len(calendar), dtype=float)}, index=calendar),
+        # BBB'nin hafta sonu barı takvim dışında kalır, 3 Temmuz barı eksik
+        "BBB": pd.DataFrame({'close': [1.0, 2.0, 4.0, 9.0]},
+                            index=pd.DatetimeIndex(["2024-07-01", "2024-07-02", "2024-07-04", "2024-07-06"])),
+    }
+    aligned = align_symbols(frames, calendar)
+    assert aligned.index.equals(calendar)
+    assert aligned.loc["2024-07-04", "BBB"] == 4.0
+    assert np.isnan(aligned.loc["2024-07-03", "BBB"])
+    assert pd.Timestamp("2024-07-06") not in aligned.index
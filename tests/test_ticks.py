@@ -0,0 +1,89 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from session_calendar import INTERVAL_FREQ
+from ticks import (
+    TICK_DTYPE, aggregate_ticks, decode_ticks, encode_ticks, load_ticks, save_ticks,
+    synthetic_ticks, ticks_to_dataframe
+)
+
+
+def _loop_volumes(ticks, freq_ms, volume):
+    """Tik kuralının döngüyle yazılmış referansı."""
+    up, down = {}, {}
+    direction = 0
+    for i, tick in enumerate(ticks):
+        if i and tick['bid'] != ticks[i - 1]['bid']:
+            direction = 1 if tick['bid'] > ticks[i - 1]['bid'] else -1
+        bucket = int(tick['time_msc']) // freq_ms
+        up[bucket] = up.get(bucket, 0.0) + (volume[i] if direction > 0 else 0.0)
+        down[bucket] = down.get(bucket, 0.0) + (volume[i] if direction < 0 else 0.0)
+    return list(up.values()), list(down.values())
+
+
+@pytest.mark.parametrize("interval", ["1 minute", "5 minutes", "1 hour"])
+def test_aggregate_matches_resample(interval):
+    ticks = synthetic_ticks(20_000, seed=3)
+    bars = aggregate_ticks(ticks, interval)
+
+    price = pd.Series(ticks['bid'], index=pd.to_datetime(ticks['time_msc'], unit='ms'))
+    expected = price.resample(INTERVAL_FREQ[interval]).ohlc().dropna()
+    assert (bars.index == expected.index).all()
+    for column in ['open', 'high', 'low', 'close']:
+        np.testing.assert_array_equal(bars[column].to_numpy(), expected[column].to_numpy())
+
+
+@pytest.mark.parametrize("forex", [False, True])
+def test_tick_rule_volumes_match_loop(forex):
+    ticks = synthetic_ticks(3_000, seed=5)
+    if forex:
+        ticks['volume_real'] = 0
+    bars = aggregate_ticks(ticks, "1 minute")
+
+    volume = np.ones(len(ticks)) if forex else ticks['volume_real']
+    up, down = _loop_volumes(ticks, 60_000, volume)
+    np.testing.assert_allclose(bars['upvolume'].to_numpy(), up)
+    np.testing.assert_allclose(bars['downvolume'].to_numpy(), down)
+
+
+def test_encode_decode_round_trip():
+    ticks = synthetic_ticks(10_000, digits=2, seed=7)
+    ticks['last'] = ticks['bid']
+    ticks['flags'] = np.random.default_rng(1).integers(0, 64, len(ticks))
+    # volume ve volume_real bağımsız saklanmalı
+    ticks['volume'] = np.random.default_rng(2).integers(0, 1000, len(ticks))
+    ticks['volume_real'] = np.random.default_rng(3).random(len(ticks)) * 10
+
+    decoded = decode_ticks(encode_ticks(ticks, digits=2))
+    assert decoded.dtype == TICK_DTYPE
+    for field in ['time', 'time_msc', 'volume', 'volume_real', 'flags']:
+        np.testing.assert_array_equal(decoded[field], ticks[field])
+    for field in ['bid', 'ask', 'last']:
+        np.testing.assert_allclose(decoded[field], ticks[field], atol=1e-9)
+
+
+def test_tick_bars_use_separate_interval():
+    df = ticks_to_dataframe(synthetic_ticks(1_000), "XAUUSD", "1 minute")
+    assert set(df['interval']) == {"1 minute (ticks)"}
+    assert ticks_to_dataframe(synthetic_ticks(1_000), "XAUUSD", "1 minute (ticks)").equals(df)
+
+
+def test_save_and_load_ticks(postgres):
+    import db
+
+    # 2024-07-01 00:00'dan ~2,5 gün; aralık 1 Temmuz'u yarım kapsadığından yalnızca 2 Temmuz yazılır
+    ticks = synthetic_ticks(200_000, start="2024-07-01", mean_gap_ms=1_000, digits=2)
+    conn = db.get_db_connection()
+    saved = save_ticks("XAUUSD", ticks, datetime(2024, 7, 1, 12), datetime(2024, 7, 3), digits=2, conn=conn)
+
+    time_msc = pd.to_datetime(ticks['time_msc'], unit='ms')
+    in_range = ticks[(time_msc >= datetime(2024, 7, 2)) & (time_msc < datetime(2024, 7, 3))]
+    assert saved == len(in_range) > 0
+    loaded = load_ticks(conn, "XAUUSD", datetime(2024, 7, 1), datetime(2024, 7, 5))
+    conn.close()
+    np.testing.assert_array_equal(loaded['time_msc'], in_range['time_msc'])
+    np.testing.assert_array_equal(loaded['volume'], in_range['volume'])
+    np.testing.assert_allclose(loaded['bid'], in_range['bid'], atol=1e-9)
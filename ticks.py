@@ -0,0 +1,341 @@
+import argparse
+import time
+import zlib
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from session_calendar import INTERVAL_FREQ
+
+# MT5 copy_ticks_range ile aynı alanlar
+TICK_DTYPE = np.dtype([
+    ('time', '<i8'), ('bid', '<f8'), ('ask', '<f8'), ('last', '<f8'),
+    ('volume', '<u8'), ('time_msc', '<i8'), ('flags', '<u4'), ('volume_real', '<f8')
+])
+
+PRICE_FIELDS = ['bid', 'ask', 'last']
+DEFAULT_DIGITS = 5
+COMPRESS_LEVEL = 6
+
+CREATE_TICK_TABLE = """
+    CREATE TABLE IF NOT EXISTS mt5_tick_blocks (
+        symbol VARCHAR(10) NOT NULL,
+        day DATE NOT NULL,
+        tick_count INTEGER NOT NULL,
+        digits SMALLINT NOT NULL,
+        first_time_msc BIGINT NOT NULL,
+        time_msc BYTEA NOT NULL,
+        bid BYTEA NOT NULL,
+        ask BYTEA NOT NULL,
+        last BYTEA NOT NULL,
+        volume BYTEA NOT NULL,
+        flags BYTEA NOT NULL,
+        volume_real BYTEA NOT NULL,
+        PRIMARY KEY (symbol, day)
+    );
+"""
+
+BLOCK_FIELDS = ['time_msc', 'bid', 'ask', 'last', 'volume', 'flags', 'volume_real']
+
+# Tiklerden tik kuralıyla oluşturulan barlar mt5_db'de bu son ekli interval etiketiyle saklanır.
+# MT5 barlarında upvolume tick_volume'den gelir; iki kaynağın satırları aynı anahtarda karışmaz.
+TICK_INTERVAL_SUFFIX = " (ticks)"
+
+
+def tick_interval(interval):
+    """Tiklerden oluşturulan barların mt5_db'deki interval etiketi (ör. '1 minute (ticks)')."""
+    return base_interval(interval) + TICK_INTERVAL_SUFFIX
+
+
+def base_interval(interval):
+    """tick_interval etiketinden bar uzunluğunu veren interval adını döndürür."""
+    return interval.removesuffix(TICK_INTERVAL_SUFFIX)
+
+
+# Sıkıştırılmış tamsayı bloklarının ilk baytı eleman genişliğini (bayt) tutar
+_INT_TYPES = {1: '<i1', 2: '<i2', 4: '<i4', 8: '<i8'}
+
+
+def _pack(values):
+    """Tamsayı dizisini sığabildiği en küçük tipe indirip zlib ile sıkıştırır."""
+    for width, dtype in _INT_TYPES.items():
+        info = np.iinfo(dtype)
+        if len(values) == 0 or (values.min() >= info.min and values.max() <= info.max):
+            break
+    return bytes([width]) + zlib.compress(values.astype(dtype).tobytes(), COMPRESS_LEVEL)
+
+
+def _unpack(blob):
+    dtype = _INT_TYPES[blob[0]]
+    return np.frombuffer(zlib.decompress(blob[1:]), dtype=dtype).astype(np.int64)
+
+
+def encode_ticks(ticks, digits=DEFAULT_DIGITS):
+    """
+    Tikleri kolon bazında sıkıştırır. Zaman damgaları ve fiyatlar (puan cinsinden
+    tamsayıya çevrilerek) fark kodlanır; ardışık tikler arasındaki farklar küçük
+    olduğu için dar tiplere sığar ve iyi sıkışır.
+    """
+    time_msc = ticks['time_msc'].astype(np.int64)
+    block = {
+        'tick_count': len(ticks),
+        'digits': digits,
+        'first_time_msc': int(time_msc[0]) if len(ticks) else 0,
+        'time_msc': _pack(np.diff(time_msc, prepend=time_msc[:1])),
+        'flags': zlib.compress(ticks['flags'].astype(np.uint32).tobytes(), COMPRESS_LEVEL),
+        'volume': _pack(ticks['volume'].astype(np.int64)),
+        'volume_real': zlib.compress(ticks['volume_real'].astype(np.float64).tobytes(), COMPRESS_LEVEL),
+    }
+    scale = 10 ** digits
+    for field in PRICE_FIELDS:
+        points = np.rint(ticks[field] * scale).astype(np.int64)
+        block[field] = _pack(np.diff(points, prepend=0))
+    return block
+
+
+def decode_ticks(block):
+    """encode_ticks çıktısını TICK_DTYPE dizisine geri çevirir."""
+    ticks = np.zeros(block['tick_count'], dtype=TICK_DTYPE)
+    time_msc = block['first_time_msc'] + np.cumsum(_unpack(bytes(block['time_msc'])))
+    ticks['time_msc'] = time_msc
+    ticks['time'] = time_msc // 1000
+    scale = 10 ** block['digits']
+    for field in PRICE_FIELDS:
+        ticks[field] = np.cumsum(_unpack(bytes(block[field]))) / scale
+    ticks['flags'] = np.frombuffer(zlib.decompress(bytes(block['flags'])), dtype=np.uint32)
+    ticks['volume'] = _unpack(bytes(block['volume']))
+    ticks['volume_real'] = np.frombuffer(zlib.decompress(bytes(block['volume_real'])), dtype=np.float64)
+    return ticks
+
+
+def ensure_tick_table(conn):
+    """mt5_tick_blocks tablosu yoksa oluşturur."""
+    cursor = conn.cursor()
+    cursor.execute(CREATE_TICK_TABLE)
+    conn.commit()
+    cursor.close()
+
+
+def save_tick_block(conn, symbol, day, ticks, digits):
+    """Bir günün tiklerini sıkıştırılmış blok olarak yazar; gün daha önce yazıldıysa değiştirir."""
+    import psycopg2
+
+    block = encode_ticks(ticks, digits)
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO mt5_tick_blocks (symbol, day, tick_count, digits, first_time_msc,
+                                     time_msc, bid, ask, last, volume, flags, volume_real)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (symbol, day) DO UPDATE SET
+            tick_count = EXCLUDED.tick_count, digits = EXCLUDED.digits,
+            first_time_msc = EXCLUDED.first_time_msc, time_msc = EXCLUDED.time_msc,
+            bid = EXCLUDED.bid, ask = EXCLUDED.ask, last = EXCLUDED.last,
+            volume = EXCLUDED.volume, flags = EXCLUDED.flags, volume_real = EXCLUDED.volume_real;
+    """, (symbol, day, block['tick_count'], digits, block['first_time_msc'],
+          *[psycopg2.Binary(block[field]) for field in BLOCK_FIELDS]))
+    conn.commit()
+    cursor.close()
+
+
+def save_ticks(symbol, ticks, start, end, digits=DEFAULT_DIGITS, conn=None):
+    """
+    [start, end) aralığı için çekilmiş tikleri gün gün mt5_tick_blocks'a yazar. Bloklar
+    günün tamamını tuttuğundan aralığın yalnızca bir kısmını kapsadığı günler yazılmaz.
+    Yazılan tik sayısını döndürür.
+    """
+    from db import get_db_connection
+
+    own_conn = conn is None
+    conn = conn or get_db_connection()
+    total = 0
+    try:
+        ensure_tick_table(conn)
+        # Tikler zamana göre sıralı geldiğinden her gün ardışık bir dilimdir
+        days = ticks['time_msc'] // 86_400_000
+        firsts = np.flatnonzero(np.diff(days, prepend=-1))
+        for first, last in zip(firsts, np.append(firsts[1:], len(ticks))):
+            day = pd.Timestamp(int(days[first]) * 86_400_000, unit='ms')
+            if day < pd.Timestamp(start) or day + pd.Timedelta(days=1) > pd.Timestamp(end):
+                continue
+            save_tick_block(conn, symbol, day.date(), ticks[first:last], digits)
+            total += int(last - first)
+    finally:
+        if own_conn:
+            conn.close()
+    return total
+
+
+def load_ticks(conn, symbol, start, end):
+    """[start, end) aralığındaki günlük blokları okuyup tek bir tik dizisinde birleştirir."""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT tick_count, digits, first_time_msc, time_msc, bid, ask, last, volume, flags, volume_real
+        FROM mt5_tick_blocks
+        WHERE symbol = %s AND day >= %s::date AND day <= %s::date
+        ORDER BY day ASC;
+    """, (symbol, start, end))
+    columns = ['tick_count', 'digits', 'first_time_msc'] + BLOCK_FIELDS
+    blocks = [decode_ticks(dict(zip(columns, row))) for row in cursor.fetchall()]
+    cursor.close()
+    if not blocks:
+        return np.zeros(0, dtype=TICK_DTYPE)
+    ticks = np.concatenate(blocks)
+    start_msc = int(pd.Timestamp(start).timestamp() * 1000)
+    end_msc = int(pd.Timestamp(end).timestamp() * 1000)
+    return ticks[(ticks['time_msc'] >= start_msc) & (ticks['time_msc'] < end_msc)]
+
+
+def ingest_ticks(mt5, symbol, start, end, conn=None):
+    """
+    [start, end) aralığındaki tikleri gün gün copy_ticks_range ile çekip saklar.
+    Her gün tamamıyla yeniden yazıldığı için yarım kalan günler sonradan güncellenebilir.
+    Yazılan tik sayısını döndürür.
+    """
+    from db import get_db_connection
+
+    own_conn = conn is None
+    conn = conn or get_db_connection()
+    ensure_tick_table(conn)
+    info = mt5.symbol_info(symbol)
+    digits = info.digits if info is not None else DEFAULT_DIGITS
+    total = 0
+    day = datetime.combine(pd.Timestamp(start).date(), datetime.min.time())
+    try:
+        while day < end:
+            ticks = mt5.copy_ticks_range(symbol, day, day + timedelta(days=1), mt5.COPY_TICKS_ALL)
+            if ticks is None:
+                raise RuntimeError(f"copy_ticks_range başarısız: {mt5.last_error()}")
+            if len(ticks):
+                save_tick_block(conn, symbol, day.date(), ticks, digits)
+                total += len(ticks)
+            day += timedelta(days=1)
+    finally:
+        if own_conn:
+            conn.close()
+    return total
+
+
+def aggregate_ticks(ticks, interval, price_field='bid'):
+    """
+    Tikleri vektörel olarak istenen interval'in barlarına çevirir.
+
+    upvolume/downvolume tik kuralıyla hesaplanır: fiyatı artıran tik alış, düşüren tik
+    satış tarafına sayılır, değişmeyen tik bir önceki yönü korur. Tik hacmi yoksa
+    (forex) her tik 1 birim sayılır. Sonuç rates_to_dataframe ile aynı kolonlara sahiptir.
+    """
+    columns = ['open', 'high', 'low', 'close', 'upvolume', 'downvolume']
+    if len(ticks) == 0:
+        return pd.DataFrame(columns=columns, index=pd.DatetimeIndex([], name='time'))
+
+    price = ticks[price_field].astype(np.float64)
+    time_msc = ticks['time_msc'].astype(np.int64)
+    volume = ticks['volume_real'].astype(np.float64)
+    if not volume.any():
+        volume = np.ones(len(ticks))
+
+    freq_ms = int(pd.Timedelta(INTERVAL_FREQ[interval]).total_seconds() * 1000)
+    bucket = time_msc // freq_ms
+    starts = np.flatnonzero(np.diff(bucket, prepend=bucket[0] - 1))
+    ends = np.append(starts[1:], len(ticks)) - 1
+
+    # Tik kuralı: sıfır değişimler bir önceki yönü taşır
+    direction = np.sign(np.diff(price, prepend=price[0]))
+    last_move = np.maximum.accumulate(np.where(direction != 0, np.arange(len(direction)), 0))
+    direction = direction[last_move]
+
+    bars = pd.DataFrame({
+        'open': price[starts],
+        'high': np.maximum.reduceat(price, starts),
+        'low': np.minimum.reduceat(price, starts),
+        'close': price[ends],
+        'upvolume': np.add.reduceat(np.where(direction > 0, volume, 0), starts),
+        'downvolume': np.add.reduceat(np.where(direction < 0, volume, 0), starts),
+    }, index=pd.DatetimeIndex(pd.to_datetime(bucket[starts] * freq_ms, unit='ms'), name='time'))
+    return bars[columns]
+
+
+def ticks_to_dataframe(ticks, symbol, interval):
+    """
+    Tiklerden oluşturulan barları uygulamanın DataFrame biçimine çevirir. interval kolonu
+    her zaman tick_interval etiketidir; böylece tik kuralı hacimli barlar MT5 barlarıyla
+    aynı (time, symbol, interval) anahtarına yazılamaz.
+    """
+    df = aggregate_ticks(ticks, base_interval(interval))
+    df['symbol'] = symbol
+    df['interval'] = tick_interval(interval)
+    return df
+
+
+def synthetic_ticks(count, start="2024-07-01", mean_gap_ms=150, digits=2, seed=0):
+    """Ölçüm ve denemeler için rastgele yürüyüşlü sentetik tik dizisi üretir."""
+    rng = np.random.default_rng(seed)
+    ticks = np.zeros(count, dtype=TICK_DTYPE)
+    time_msc = int(pd.Timestamp(start).timestamp() * 1000) + np.cumsum(rng.exponential(mean_gap_ms, count).astype(np.int64))
+    bid = np.round(2400 + np.cumsum(rng.choice([-1, 0, 1], count) * 10 ** -digits), digits)
+    ticks['time_msc'] = time_msc
+    ticks['time'] = time_msc // 1000
+    ticks['bid'] = bid
+    ticks['ask'] = np.round(bid + rng.integers(10, 40, count) * 10 ** -digits, digits)
+    ticks['volume_real'] = rng.integers(1, 10, count)
+    ticks['volume'] = ticks['volume_real']
+    return ticks
+
+
+def benchmark(count=5_000_000, interval="1 minute"):
+    """Sentetik tiklerle toplama hızını ve sıkıştırma oranını ölçer."""
+    ticks = synthetic_ticks(count)
+
+    started = time.perf_counter()
+    bars = aggregate_ticks(ticks, interval)
+    aggregate_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    block = encode_ticks(ticks, digits=2)
+    encode_seconds = time.perf_counter() - started
+    encoded_size = sum(len(block[field]) for field in BLOCK_FIELDS)
+
+    decoded = decode_ticks(block)
+    assert np.array_equal(decoded['time_msc'], ticks['time_msc'])
+    assert np.allclose(decoded['bid'], ticks['bid'])
+
+    return {
+        'ticks': count,
+        'bars': len(bars),
+        'aggregate_ticks_per_sec': count / aggregate_seconds,
+        'encode_ticks_per_sec': count / encode_seconds,
+        'raw_mb': ticks.nbytes / 1e6,
+        'encoded_mb': encoded_size / 1e6,
+        'compression_ratio': ticks.nbytes / encoded_size,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MT5 tik verisi araçları")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = commands.add_parser("ingest", help="Tikleri MT5'ten çekip sıkıştırılmış olarak sakla")
+    ingest_parser.add_argument("--symbols", nargs="+", required=True)
+    ingest_parser.add_argument("--start", required=True, help="YYYY-MM-DD")
+    ingest_parser.add_argument("--end", required=True, help="YYYY-MM-DD")
+
+    bench_parser = commands.add_parser("bench", help="Sentetik tiklerle toplama hızını ölç")
+    bench_parser.add_argument("--ticks", type=int, default=5_000_000)
+    bench_parser.add_argument("--interval", choices=list(INTERVAL_FREQ), default="1 minute")
+
+    args = parser.parse_args()
+    if args.command == "ingest":
+        from mt5_session import load_backend
+
+        mt5 = load_backend()
+        if not mt5.initialize():
+            print("MetaTrader 5 initialization failed")
+            exit()
+        start = datetime.strptime(args.start, '%Y-%m-%d')
+        end = datetime.strptime(args.end, '%Y-%m-%d')
+        for symbol in args.symbols:
+            print(f"{symbol}: {ingest_ticks(mt5, symbol, start, end):,} tik kaydedildi")
+        mt5.shutdown()
+    else:
+        for key, value in benchmark(args.ticks, args.interval).items():
+            print(f"{key}: {value:,.2f}" if isinstance(value, float) else f"{key}: {value:,}")